@@ -15,11 +15,17 @@ TICK是真实世界的时间刻度，而年月日是人为制定的历法。TICK
 import re
 import sys
 import math
+import bisect
 import datetime
 import traceback
 import typing
 from typing import Tuple
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 try:
     from Utility.to_arab import *
     from Utility.history_public import *
@@ -122,6 +128,21 @@ PREFIX_BCE = [
 
 SUPPORT_DATE_TIME_STR_FORMAT = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d', '%H:%M:%S', '%Y%m%d']
 
+# The regex of each SUPPORT_DATE_TIME_STR_FORMAT, the same as what datetime.strptime() uses.
+# Except that the year of '%Y-%m-%d' can be negative (BCE) and longer than 4 digits.
+__YEAR = r'(?P<Y>\d\d\d\d)'
+__SIGNED_YEAR = r'(?P<Y>-?\d\d\d\d+)'
+__MONTH = r'(?P<m>1[0-2]|0[1-9]|[1-9])'
+__DAY = r'(?P<d>3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])'
+__TIME = r'(?P<H>2[0-3]|[0-1]\d|\d):(?P<M>[0-5]\d|\d):(?P<S>6[0-1]|[0-5]\d|\d)'
+
+SUPPORT_DATE_TIME_STR_PATTERN = [
+    re.compile(__SIGNED_YEAR + '-' + __MONTH + '-' + __DAY + r'\s+' + __TIME, re.IGNORECASE),
+    re.compile(__SIGNED_YEAR + '-' + __MONTH + '-' + __DAY, re.IGNORECASE),
+    re.compile(__TIME, re.IGNORECASE),
+    re.compile(__YEAR + __MONTH + __DAY, re.IGNORECASE),
+]
+
 
 def now_tick() -> TICK:
     """
@@ -131,6 +152,20 @@ def now_tick() -> TICK:
     return datetime_to_tick(datetime.datetime.now())
 
 
+TIME_TEXT_CACHE = LruCache(4096)
+
+
+def set_time_text_cache_size(max_size: int):
+    """
+    Set the max item count of the time text cache. 0 to disable the cache.
+    """
+    TIME_TEXT_CACHE.resize(max_size)
+
+
+def get_time_text_cache() -> LruCache:
+    return TIME_TEXT_CACHE
+
+
 def time_text_to_ticks(time_text: str):
     """
     *** All you need is this function ***
@@ -138,20 +173,26 @@ def time_text_to_ticks(time_text: str):
     Convert time text to TICK. The time string can contain multiple sub time string which split by SEPARATOR.
     Note that the text in '[]' will not be split. The standard datetime string has to be surrounded by '[]'.
     It will try to convert each sub string by standard datetime format first, then try to convert as natural language.
+    The result is cached by the raw text in TIME_TEXT_CACHE.
     :param time_text: Any time text
     :return: The list of TICK
     """
+    time_ticks = TIME_TEXT_CACHE.get(time_text)
+    if time_ticks is None:
+        time_ticks = tuple(__time_text_to_ticks(time_text))
+        TIME_TEXT_CACHE.put(time_text, time_ticks)
+    return list(time_ticks)
+
+
+def __time_text_to_ticks(time_text: str):
     time_ticks = []
-    sub_time_texts = __split_natural_language_time_text(time_text)
+    sub_time_texts = split_time_text(time_text)
 
     # print('------------------------------------------')
     for sub_time_text in sub_time_texts:
-        # Try to convert to datetime
-        dt = time_str_to_datetime(sub_time_text)
-        if dt is not None:
-            tick = datetime_to_tick(dt)
-            # print(f'{sub_time_text} (datetime) -> {tick}')
-        else:
+        # Try to convert as standard datetime format
+        tick = time_str_to_tick(sub_time_text)
+        if tick is None:
             tick = __single_natural_language_time_to_tick(sub_time_text)
             # print(f'{sub_time_text} -> {tick}')
         if tick is not None:
@@ -171,13 +212,45 @@ def time_str_to_datetime(text: str) -> datetime.datetime or None:
     """
     if isinstance(text, datetime.datetime):
         return text
-    for f in SUPPORT_DATE_TIME_STR_FORMAT:
-        try:
-            return datetime.datetime.strptime(text, f)
-        except Exception:
-            pass
-        finally:
-            pass
+    date_time = __match_date_time_str(text, False)
+    if date_time is None or date_time[0] < datetime.MINYEAR:
+        return None
+    return datetime.datetime(*date_time)
+
+
+def time_str_to_tick(text: str) -> TICK or None:
+    """
+    The same as time_str_to_datetime() but returns TICK directly. So the year is not limited by python datetime.
+    :param text:The data time text.
+    :return: TICK if text format is valid else None
+    """
+    date_time = __match_date_time_str(text, True)
+    return None if date_time is None else date_time_data_to_tick(*date_time)
+
+
+def __match_date_time_str(text: str, extended_year: bool) -> Tuple[int, int, int, int, int, int] or None:
+    """
+    Match text with SUPPORT_DATE_TIME_STR_PATTERN in order, the same as trying datetime.strptime() without exception.
+    :param extended_year: Accept the negative year and the year longer than 4 digits if True.
+    :return: Tuple of (year, month, day, hour, minute, second) or None if text is not a valid standard time format.
+    """
+    # Every supported format starts with a digit or the sign of year
+    if len(text) == 0 or not (text[0].isdigit() or text[0] == '-'):
+        return None
+    for pattern in SUPPORT_DATE_TIME_STR_PATTERN:
+        match = pattern.match(text)
+        if match is None or match.end() != len(text):
+            continue
+        fields = match.groupdict()
+        if not extended_year and len(fields.get('Y', '1900')) != 4:
+            continue
+        year = int(fields.get('Y', 1900))
+        month = int(fields.get('m', 1))
+        day = int(fields.get('d', 1))
+        second = int(fields.get('S', 0))
+        if year == 0 or day > month_days(month, is_leap_year(year)) or second > 59:
+            continue
+        return year, month, day, int(fields.get('H', 0)), int(fields.get('M', 0)), second
     return None
 
 
@@ -245,6 +318,71 @@ def datetime_to_date_time_data(dt: datetime.datetime) -> Tuple[int, int, int, in
 # -------------------------------------------- Text Analysis and Parse ---------------------------------------------
 # ------------------------------------------------------------------------------------------------------------------
 
+def __build_time_text_normalizer() -> (dict, re.Pattern, dict, re.Pattern, re.Pattern, re.Pattern):
+    """
+    Build the single pass normalizer of split_time_text() from SPACE_CHAR, REPLACE_CHAR and SEPARATOR.
+    :return: Tuple of (
+                The str.translate() table that removes SPACE_CHAR,
+                The regex that matches REPLACE_CHAR,
+                The replacement of each REPLACE_CHAR: (text, True if it's a '[]' surrounded text else False),
+                The regex that matches SEPARATOR,
+                The regex that matches anything needs to be normalized before split,
+                The regex that matches what the normalizer cannot handle. The text goes the legacy way.)
+    """
+    def alternation(keys) -> str:
+        return '|'.join(re.escape(key) for key in sorted(keys, key=lambda key: len(key), reverse=True))
+
+    table = {}
+    replacements = {}
+    legacy_keys = ['[', ']']
+    for space in SPACE_CHAR:
+        if len(space) == 1:
+            table[ord(space)] = None
+        else:
+            legacy_keys.append(space)
+    for old_char, new_char in REPLACE_CHAR:
+        if re.fullmatch(r'\[[^\[\]]*\]', new_char) is not None:
+            replacements[old_char] = (new_char, True)
+        elif '[' in new_char or ']' in new_char:
+            legacy_keys.append(old_char)
+        else:
+            replacements[old_char] = (new_char, False)
+
+    return table, re.compile(alternation(replacements.keys())), replacements, re.compile(alternation(SEPARATOR)), \
+        re.compile(alternation(SPACE_CHAR + list(replacements.keys()) + legacy_keys)), \
+        re.compile(alternation(legacy_keys))
+
+
+TIME_TEXT_SPACE_TABLE, TIME_TEXT_REPLACE_PATTERN, TIME_TEXT_REPLACEMENTS, TIME_TEXT_SEPARATOR_PATTERN, \
+    TIME_TEXT_SPECIAL_PATTERN, TIME_TEXT_LEGACY_PATTERN = __build_time_text_normalizer()
+
+
+def split_time_text(text: str) -> [str]:
+    """
+    Split multiple natural language time text in one sentence to single time text array.
+    The same as __split_natural_language_time_text() but normalizes and splits the text in one pass.
+    The text with '[]' still goes the legacy way.
+    :param text: The natural language time text
+    :return: The list of single time text.
+    """
+    bracket_content = []
+    if TIME_TEXT_SPECIAL_PATTERN.search(text) is not None:
+        if TIME_TEXT_LEGACY_PATTERN.search(text) is not None:
+            return __split_natural_language_time_text(text)
+
+        def replace(match) -> str:
+            new_char, bracket = TIME_TEXT_REPLACEMENTS[match.group(0)]
+            if bracket:
+                bracket_content.append(new_char.strip('[]').strip())
+                return ''
+            return new_char
+
+        text = TIME_TEXT_REPLACE_PATTERN.sub(replace, text.translate(TIME_TEXT_SPACE_TABLE))
+
+    time_str_list = (time_str.strip() for time_str in TIME_TEXT_SEPARATOR_PATTERN.split(text))
+    return [time_str for time_str in bracket_content if time_str] + [time_str for time_str in time_str_list if time_str]
+
+
 def __split_natural_language_time_text(text: str) -> [str]:
     """
     Split multiple natural language time text in one sentence to single time text array.
@@ -526,8 +664,9 @@ def days_to_years(days: int) -> (int, int):
     years_400 = (abs(days) - 1) // DAYS_PER_400_YEARS
     remainder = (abs(days) - 1) % DAYS_PER_400_YEARS
 
-    years_100 = remainder // DAYS_PER_100_YEARS
-    remainder = remainder % DAYS_PER_100_YEARS
+    # The last day of a 400 years cycle belongs to the 400th year. It's the same to the 4 years cycle below.
+    years_100 = min(remainder // DAYS_PER_100_YEARS, 3)
+    remainder = remainder - years_100 * DAYS_PER_100_YEARS
 
     years_4 = remainder // DAYS_PER_4_YEARS
     remainder = remainder % DAYS_PER_4_YEARS
@@ -551,10 +690,9 @@ def days_to_months(days: int, leap_year: bool) -> (int, int):
     """
     assert days > 0
     month_days_sum = MONTH_DAYS_SUM_LEAP_YEAR if leap_year else MONTH_DAYS_SUM
-    for month in range(len(month_days_sum)):
-        if month_days_sum[month] > days - 1:
-            return month, days - month_days_sum[month - 1]
-    assert False
+    month = bisect.bisect_right(month_days_sum, days - 1)
+    assert month < len(month_days_sum)
+    return month, days - month_days_sum[month - 1]
 
 
 def days_to_date(days: int) -> (int, int, int):
@@ -573,6 +711,45 @@ def days_to_date(days: int) -> (int, int, int):
 
 # -------------------------------------- TICK --------------------------------------
 
+# ------------------ Year Start Table ------------------
+
+# The optional table of the start TICK of years [YEAR_START_TABLE_SINCE, YEAR_START_TABLE_UNTIL].
+# years_to_tick() and tick_to_years() look it up if the year is in this range, else they do the calculation.
+# Build it by build_year_start_table().
+
+YEAR_START_TABLE_SINCE = 0
+YEAR_START_TABLE_UNTIL = -1
+YEAR_START_YEARS = []           # The years in table, without 0. Plus the year after YEAR_START_TABLE_UNTIL.
+YEAR_START_TICKS = []           # The start TICK of YEAR_START_YEARS, ascending.
+
+
+def build_year_start_table(since_year: int = -10000, until_year: int = 3000):
+    """
+    Build the year start table for years [since_year, until_year].
+    :param since_year: The first year in table. Cannot be 0
+    :param until_year: The last year in table. Cannot be 0
+    """
+    global YEAR_START_TABLE_SINCE, YEAR_START_TABLE_UNTIL, YEAR_START_YEARS, YEAR_START_TICKS
+    assert since_year != 0 and until_year != 0 and since_year <= until_year
+
+    clear_year_start_table()
+    years = [year for year in range(since_year, until_year + 2 if until_year != -1 else 2) if year != 0]
+    ticks = [years_to_tick(year) for year in years]
+    YEAR_START_YEARS, YEAR_START_TICKS = years, ticks
+    YEAR_START_TABLE_SINCE, YEAR_START_TABLE_UNTIL = since_year, until_year
+
+
+def clear_year_start_table():
+    global YEAR_START_TABLE_SINCE, YEAR_START_TABLE_UNTIL, YEAR_START_YEARS, YEAR_START_TICKS
+    YEAR_START_TABLE_SINCE, YEAR_START_TABLE_UNTIL = 0, -1
+    YEAR_START_YEARS, YEAR_START_TICKS = [], []
+
+
+def __year_start_table_index(year: int) -> int:
+    index = year - YEAR_START_TABLE_SINCE
+    return index - 1 if YEAR_START_TABLE_SINCE < 0 < year else index
+
+
 # -------------------- xxx -> TICK --------------------
 
 
@@ -604,6 +781,8 @@ def years_to_tick(year: int) -> int:
     :param year: Start from 0001 CE or 0001 BCE. Cannot be 0
     :return: The seconds of the years. The sign is the same to the year.
     """
+    if YEAR_START_TABLE_SINCE <= year <= YEAR_START_TABLE_UNTIL and len(YEAR_START_TICKS) > 0:
+        return YEAR_START_TICKS[__year_start_table_index(year)]
     year_days = years_to_days(year)
     sign = 1 if year_days >= 0 else -1
     return sign * days_to_tick(abs(year_days) + 1)
@@ -657,9 +836,10 @@ def tick_to_month(tick: int, leap_year: bool) -> (int, int):
                 Remainder of Seconds)
     """
     assert tick >= 0
-    days, remainder_sec = tick_to_days(tick)
-    months, remainder_days = days_to_months(days, leap_year)
-    return months, remainder_sec + days_to_tick(remainder_days)
+    month_sec = MONTH_SEC_LEAP_YEAR if leap_year else MONTH_SEC
+    month = bisect.bisect_right(month_sec, tick)
+    assert month < len(month_sec)
+    return month, tick - month_sec[month - 1]
 
 
 def tick_to_years(tick: int) -> (int, int):
@@ -670,6 +850,9 @@ def tick_to_years(tick: int) -> (int, int):
                 Year - Since 0001 CE if sec >= 0 else Since 0001 BCE if sec < 0
                 Remainder - Remainder of Seconds that less than a year)
     """
+    if len(YEAR_START_TICKS) > 0 and YEAR_START_TICKS[0] <= tick < YEAR_START_TICKS[-1]:
+        index = bisect.bisect_right(YEAR_START_TICKS, tick) - 1
+        return YEAR_START_YEARS[index], tick - YEAR_START_TICKS[index]
     days, remainder_sec = tick_to_days(abs(tick))
     years, remainder_day = days_to_years(days)
     remainder_sec += (remainder_day - 1) * TICK_DAY
@@ -728,6 +911,102 @@ def tick_to_date_time_data(tick: int) -> (int, int, int, int, int, int):
     return year, month, days, hour, minute, second
 
 
+# -------------------- Array --------------------
+
+def ticks_to_dates(ticks) -> tuple:
+    """
+    The array version of tick_to_date_time_data(). Requires numpy.
+    :param ticks: Array like of TICK. CE if sec >= 0 else BCE.
+    :return: Tuple of int64 arrays (year, month, days, hour, minute, second) with the same shape of ticks.
+    """
+    if np is None:
+        raise ImportError('ticks_to_dates() requires numpy.')
+    ticks = np.asarray(ticks, dtype=np.int64)
+
+    # ------------ tick_to_years() ------------
+
+    abs_ticks = np.abs(ticks)
+    days = abs_ticks // TICK_DAY + 1
+    remainder_sec = abs_ticks % TICK_DAY
+
+    # days_to_years()
+    remainder = days - 1
+    years_400, remainder = np.divmod(remainder, DAYS_PER_400_YEARS)
+    years_100 = np.minimum(remainder // DAYS_PER_100_YEARS, 3)
+    remainder = remainder - years_100 * DAYS_PER_100_YEARS
+    years_4, remainder = np.divmod(remainder, DAYS_PER_4_YEARS)
+    last_day = remainder == DAYS_PER_4_YEARS - 1
+    years_1 = np.where(last_day, 3, remainder // YEAR_DAYS)
+    remainder = np.where(last_day, YEAR_DAYS, remainder % YEAR_DAYS)
+    years = years_400 * 400 + years_100 * 100 + years_4 * 4 + years_1 + 1
+
+    remainder_sec = remainder_sec + remainder * TICK_DAY
+
+    # Because the 0 second is assigned to CE. So the BCE should offset 1 second
+    bce = ticks < 0
+    bce_head = bce & (remainder_sec == 0)
+    bce_tail = bce & (remainder_sec != 0)
+    year_sec = np.where(__is_leap_years(years), TICK_LEAP_YEAR, TICK_YEAR)
+    remainder_sec = np.where(bce_tail, year_sec - remainder_sec, remainder_sec)
+    years = np.where(bce_head, 1 - years, np.where(bce_tail, -years, years))
+
+    # ------------ tick_to_month() ------------
+
+    days, remainder_sec = np.divmod(remainder_sec, TICK_DAY)
+    month_days_sum = np.where(__is_leap_years(years)[..., np.newaxis],
+                              np.asarray(MONTH_DAYS_SUM_LEAP_YEAR, dtype=np.int64),
+                              np.asarray(MONTH_DAYS_SUM, dtype=np.int64))
+    months = np.sum(month_days_sum <= days[..., np.newaxis], axis=-1)
+    days = days + 1 - np.take_along_axis(month_days_sum, (months - 1)[..., np.newaxis], axis=-1)[..., 0]
+
+    # ------------ tick_to_time_data() ------------
+
+    hours, remainder_sec = np.divmod(remainder_sec, TICK_HOUR)
+    minutes, seconds = np.divmod(remainder_sec, TICK_MIN)
+
+    return years, months, days, hours, minutes, seconds
+
+
+def dates_to_ticks(years, months, days, hours=0, minutes=0, seconds=0):
+    """
+    The array version of date_time_data_to_tick(). Requires numpy. The parameters are broadcast together.
+    :param years: Array like of year since 0001 CE or 0001 BCE. Cannot be 0
+    :param months: Array like of month, 1 - 12
+    :param days: Array like of day, start from 1
+    :param hours: Array like of hour or scalar
+    :param minutes: Array like of minute or scalar
+    :param seconds: Array like of second or scalar
+    :return: The int64 array of TICK
+    """
+    if np is None:
+        raise ImportError('dates_to_ticks() requires numpy.')
+    years = np.asarray(years, dtype=np.int64)
+    months = np.asarray(months, dtype=np.int64)
+    days = np.asarray(days, dtype=np.int64)
+    assert np.all(years != 0)
+    assert np.all((months >= 1) & (months <= 12))
+    assert np.all(days > 0)
+
+    # years_to_days()
+    abs_years = np.where(years > 0, years - 1, -years)
+    year_days = np.sign(years) * (365 * abs_years + abs_years // 4 - abs_years // 100 + abs_years // 400)
+
+    # months_to_days()
+    month_days = np.where(__is_leap_years(years),
+                          np.asarray(MONTH_DAYS_SUM_LEAP_YEAR, dtype=np.int64)[months - 1],
+                          np.asarray(MONTH_DAYS_SUM, dtype=np.int64)[months - 1])
+
+    return (year_days + month_days + days - 1) * TICK_DAY + \
+        np.asarray(hours, dtype=np.int64) * TICK_HOUR + \
+        np.asarray(minutes, dtype=np.int64) * TICK_MIN + \
+        np.asarray(seconds, dtype=np.int64)
+
+
+def __is_leap_years(years):
+    years = np.abs(years)
+    return ((years % 4 == 0) & (years % 100 != 0)) | (years % 400 == 0)
+
+
 # -------------------------------------- Time Delta --------------------------------------
 
 def offset_ad_second(tick: TICK, offset: Tuple[int, int, int, int, int, int]) -> TICK:
@@ -793,3 +1072,130 @@ def offset_date_time(origin: Tuple[int, int, int, int, int, int],
     days = date_to_days(offset_datetime[0], offset_datetime[1], offset_datetime[2])
     year, month, day = days_to_date(days)
     return year, month, day, offset_datetime[3], offset_datetime[4], offset_datetime[5]
+
+
+# ----------------------------------------------------- Test Code ------------------------------------------------------
+
+def test_array_tick_conversion():
+    import random
+
+    random.seed(0)
+    ticks = [0, 1, -1, TICK_DAY, -TICK_DAY, TICK_YEAR, -TICK_YEAR, TICK_LEAP_YEAR, -TICK_LEAP_YEAR]
+    for year in [1, 4, 100, 400, 1600, 2000, -1, -4, -100, -400, -401, -2000]:
+        ticks.append(date_time_data_to_tick(year, 12, 31))
+        ticks.append(date_time_data_to_tick(year, 1, 1))
+        ticks.append(date_time_data_to_tick(year, 2, 29 if is_leap_year(year) else 28, 23, 59, 59))
+    for limit in [TICK_YEAR * 10, TICK_YEAR * 3000, TICK_YEAR * 100000, TICK_YEAR * 100000000]:
+        ticks.extend(random.randint(-limit, limit) for _ in range(5000))
+
+    expects = [tick_to_date_time_data(tick) for tick in ticks]
+    results = ticks_to_dates(np.array(ticks, dtype=np.int64))
+    assert [tuple(int(column[i]) for column in results) for i in range(len(ticks))] == expects
+
+    date_times = []
+    for _ in range(20000):
+        year = random.choice([1, -1]) * random.randint(1, random.choice([10, 3000, 100000, 100000000]))
+        month = random.randint(1, 12)
+        date_times.append((year, month, random.randint(1, month_days(month, is_leap_year(year))),
+                           random.randint(0, 23), random.randint(0, 59), random.randint(0, 59)))
+
+    expects = [date_time_data_to_tick(*date_time) for date_time in date_times]
+    results = dates_to_ticks(*[np.array(column, dtype=np.int64) for column in zip(*date_times)])
+    assert [int(tick) for tick in results] == expects
+    assert int(dates_to_ticks(2000, 1, 1)) == date_time_data_to_tick(2000, 1, 1)
+
+
+def test_time_text_cache():
+    texts = ['公元前221年', 'BC3000', '1900年5月3日, 1911年', '[2000-01-01 12:00:00]', 'no time']
+    set_time_text_cache_size(0)
+    expects = [time_text_to_ticks(text) for text in texts]
+    set_time_text_cache_size(4096)
+    TIME_TEXT_CACHE.clear()
+    for _ in range(3):
+        assert [time_text_to_ticks(text) for text in texts] == expects
+    stats = TIME_TEXT_CACHE.stats()
+    assert stats['misses'] == len(texts) and stats['hits'] == len(texts) * 2
+
+    # The caller can modify the result without polluting the cache
+    time_text_to_ticks(texts[0]).append(0)
+    assert time_text_to_ticks(texts[0]) == expects[0]
+
+
+def test_split_time_text():
+    import random
+
+    random.seed(0)
+    pieces = SEPARATOR + SPACE_CHAR + [old_char for old_char, _ in REPLACE_CHAR] + \
+        ['公元前', '前', '年', '月', '日', 'BC', ' ', '1', '23', '世', '纪', '今', '元', '正', '[', ']', '[2000-01-01]']
+    for _ in range(20000):
+        text = ''.join(random.choice(pieces) for _ in range(random.randint(0, 12)))
+        assert split_time_text(text) == __split_natural_language_time_text(text)
+
+
+def test_time_str_to_tick():
+    import random
+
+    def strptime(text: str) -> datetime.datetime or None:
+        for f in SUPPORT_DATE_TIME_STR_FORMAT:
+            try:
+                return datetime.datetime.strptime(text, f)
+            except Exception:
+                pass
+        return None
+
+    random.seed(0)
+    pieces = ['1', '2', '0', '9', '3', '12', '31', '29', '60', '2000', '1900', '0000', '-', ':', ' ', '  ', '年', '２']
+    texts = ['2000-01-01', '2000-1- 1', '2000-01-01 \t1:2:3', '2000-02-30', '1999-02-29', '23:59:60', '20001231',
+             '2000111', '0000-01-01', '476', '1453年', '']
+    texts.extend(''.join(random.choice(pieces) for _ in range(random.randint(1, 8))) for _ in range(50000))
+    for text in texts:
+        expect = strptime(text)
+        assert time_str_to_datetime(text) == expect
+        if expect is not None:
+            assert time_str_to_tick(text) == datetime_to_tick(expect)
+
+    assert time_str_to_datetime('-0500-03-01') is None and time_str_to_datetime('01999-01-01') is None
+    assert time_str_to_tick('-0500-03-01') == date_time_data_to_tick(-500, 3, 1)
+    assert time_str_to_tick('12345-03-01 12:00:00') == date_time_data_to_tick(12345, 3, 1, 12)
+    assert time_text_to_ticks('[-0500-03-01]') == [date_time_data_to_tick(-500, 3, 1)]
+
+
+def test_year_start_table():
+    import random
+
+    random.seed(0)
+    ticks = [random.randint(-TICK_YEAR * 12000, TICK_YEAR * 4000) for _ in range(20000)]
+    ticks.extend(years_to_tick(year) + offset for year in [-10000, -1, 1, 3000, 3001] for offset in [-1, 0, 1])
+    years = [year for year in range(-10100, 3100) if year != 0]
+
+    clear_year_start_table()
+    expects = [tick_to_years(tick) for tick in ticks], [years_to_tick(year) for year in years]
+    offsets = [offset_ad_second(tick, (1, 2, 3, 4, 5, 6)) for tick in ticks]
+    build_year_start_table(-10000, 3000)
+    try:
+        assert len(YEAR_START_TICKS) == 13001
+        assert ([tick_to_years(tick) for tick in ticks], [years_to_tick(year) for year in years]) == expects
+        assert [offset_ad_second(tick, (1, 2, 3, 4, 5, 6)) for tick in ticks] == offsets
+        build_year_start_table(5, 10)
+        assert ([tick_to_years(tick) for tick in ticks], [years_to_tick(year) for year in years]) == expects
+        build_year_start_table(-10, -1)
+        assert ([tick_to_years(tick) for tick in ticks], [years_to_tick(year) for year in years]) == expects
+    finally:
+        clear_year_start_table()
+
+
+# ----------------------------------------------------- File Entry -----------------------------------------------------
+
+def main():
+    test_array_tick_conversion()
+    test_time_text_cache()
+    test_split_time_text()
+    test_time_str_to_tick()
+    test_year_start_table()
+    print('All test passed.')
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+if __name__ == '__main__':
+    main()
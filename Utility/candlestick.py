@@ -4,7 +4,7 @@ import random
 import numpy as np
 import pandas as pd
 import traceback, math
-from PyQt5.QtCore import QRect, QPoint, QSize
+from PyQt5.QtCore import QRect, QPoint, QSize, QLine
 from PyQt5.QtGui import QPainter, QColor, QFont, QPen, QPolygon, QFontMetrics
 
 from os import sys, path
@@ -99,15 +99,282 @@ class Candlestick(AxisItem):
         pass
 
 
-def build_candle_stick(df: pd.DataFrame,
-                       open_field: str = 'open', close_field: str = 'close',
-                       high_field: str = 'high', low_field: str = 'low',
-                       time_field: str = 'trade_date') -> [Candlestick]:
-    # lower = np.nanmin(df[low_field])
-    upper = np.nanmax(df[high_field])
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                class CandlestickLevel
+# ----------------------------------------------------------------------------------------------------------------------
+
+class CandlestickLevel:
+    """
+    The OHLC bars of one level of detail. Bar i covers [sinces[i], untils[i]], the bars are sorted and not overlapped.
+    The nominal_ticks is the typical ticks of one bar, which is used to select level by the display scale.
+    """
+
+    def __init__(self, sinces: np.ndarray, untils: np.ndarray,
+                 opens: np.ndarray, closes: np.ndarray, highs: np.ndarray, lows: np.ndarray,
+                 nominal_ticks: HistoryTime.TICK):
+        self.sinces = sinces
+        self.untils = untils
+        self.opens = opens
+        self.closes = closes
+        self.highs = highs
+        self.lows = lows
+        self.nominal_ticks = nominal_ticks
+
+    def __len__(self):
+        return len(self.sinces)
+
+    def bar_range_of(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> (int, int):
+        """
+        :return: The bars that overlap [since, until] are [lower, upper).
+        """
+        lower = int(np.searchsorted(self.untils, since, side='left'))
+        upper = int(np.searchsorted(self.sinces, until, side='right'))
+        return lower, upper
+
+    def aggregate(self, keys: np.ndarray, sinces: np.ndarray, untils: np.ndarray,
+                  nominal_ticks: HistoryTime.TICK):
+        """
+        Merge the continuous bars with the same key: open = first, close = last, high = max, low = min.
+        :param keys: The non-decreasing group key of each bar
+        :param sinces: The since of each bar's group
+        :param untils: The until of each bar's group
+        :return: The aggregated CandlestickLevel
+        """
+        if len(keys) == 0:
+            return CandlestickLevel(self.sinces, self.untils, self.opens, self.closes, self.highs, self.lows,
+                                    nominal_ticks)
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        ends = np.concatenate((starts[1:], [len(keys)])) - 1
+        return CandlestickLevel(sinces[starts], untils[starts], self.opens[starts], self.closes[ends],
+                                np.maximum.reduceat(self.highs, starts), np.minimum.reduceat(self.lows, starts),
+                                nominal_ticks)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                               class CandlestickSeries
+# ----------------------------------------------------------------------------------------------------------------------
+
+class CandlestickSeries(AxisItem):
+    """
+    The whole candlestick series as one axis item. The bars are stored in NumPy columns and sorted by date.
+    Only the bars in the display range are painted, and the bars of the same color are painted in one batch.
+        Columns:
+            dates: The start tick of each bar, int64.
+            opens / closes / highs / lows: The prices of each bar, float64.
+        The bar_ticks is the ticks of one bar. It's inferred from dates if not specified.
+
+    The weekly, monthly and yearly CandlestickLevel are aggregated from the bars when first used (see get_levels()).
+    It paints the finest level that a bar is not narrower than MIN_BAR_PIXEL, so the painted bars are bounded by pixels.
+    """
+
+    MIN_BAR_PIXEL = 3
+
+    TICK_WEEK = HistoryTime.TICK_DAY * 7
+    WEEK_ORIGIN = HistoryTime.date_time_data_to_tick(2024, 1, 1)      # A Monday
+
+    def __init__(self, dates, opens, closes, highs, lows,
+                 bar_ticks: HistoryTime.TICK = None, lower_limit: float = 0, upper_limit: float = None):
+        super(CandlestickSeries, self).__init__(None, {})
+        dates = np.asarray(dates, dtype=np.int64)
+        order = np.argsort(dates, kind='stable')
+        self.dates = dates[order]
+        self.opens = np.asarray(opens, dtype=np.float64)[order]
+        self.closes = np.asarray(closes, dtype=np.float64)[order]
+        self.highs = np.asarray(highs, dtype=np.float64)[order]
+        self.lows = np.asarray(lows, dtype=np.float64)[order]
+
+        self.__bar_ticks = CandlestickSeries.infer_bar_ticks(self.dates) if bar_ticks is None else bar_ticks
+        if upper_limit is None:
+            upper_limit = candlestick_upper_limit(self.highs)
+        self.__lower_limit = min(lower_limit, upper_limit)
+        self.__upper_limit = max(lower_limit, upper_limit)
+        self.__levels = None
+
+        if len(self.dates) > 0:
+            self.get_item_metrics().set_scale_range(self.dates[0], self.dates[-1] + self.__bar_ticks - 1)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @staticmethod
+    def infer_bar_ticks(dates: np.ndarray) -> HistoryTime.TICK:
+        """
+        The minimal interval of dates, but not longer than one day (daily bars skip the weekends and holidays).
+        """
+        intervals = np.diff(dates)
+        intervals = intervals[intervals > 0]
+        return HistoryTime.TICK_DAY if len(intervals) == 0 else int(min(intervals.min(), HistoryTime.TICK_DAY))
+
+    @staticmethod
+    def from_csv(file: str, chunk_size: int = 100000,
+                 open_field: str = 'open', close_field: str = 'close',
+                 high_field: str = 'high', low_field: str = 'low',
+                 time_field: str = 'trade_date', **kwargs):
+        """
+        Read the csv file by chunks and only the used columns. Each chunk is converted to columns in bulk.
+        :param kwargs: The parameters of CandlestickSeries
+        """
+        fields = [time_field, open_field, close_field, high_field, low_field]
+        columns = [[] for _ in fields]
+        for chunk in pd.read_csv(file, usecols=fields, chunksize=chunk_size):
+            columns[0].append(time_series_to_ticks(chunk[time_field]))
+            for column, field in zip(columns[1:], fields[1:]):
+                column.append(chunk[field].to_numpy(dtype=np.float64))
+        columns = [np.concatenate(column) if len(column) > 0 else np.zeros(0) for column in columns]
+        return CandlestickSeries(*columns, **kwargs)
+
+    # ---------------------------------------------------------
+
+    def get_bar_ticks(self) -> HistoryTime.TICK:
+        return self.__bar_ticks
+
+    def get_limit(self) -> (float, float):
+        return self.__lower_limit, self.__upper_limit
+
+    def get_levels(self) -> [CandlestickLevel]:
+        """
+        :return: The levels from fine to coarse. The first one is the original bars.
+        """
+        if self.__levels is None:
+            self.__levels = self.__build_levels()
+        return self.__levels
+
+    def select_level(self, since: HistoryTime.TICK, until: HistoryTime.TICK, pixels: int) -> CandlestickLevel:
+        """
+        Select the finest level that a bar is not narrower than MIN_BAR_PIXEL when [since, until] is paint in pixels.
+        Or the coarsest level.
+        """
+        levels = self.get_levels()
+        min_bar_ticks = (until - since) * CandlestickSeries.MIN_BAR_PIXEL / max(pixels, 1)
+        for level in levels:
+            if level.nominal_ticks >= min_bar_ticks:
+                return level
+        return levels[-1]
+
+    def bar_index_at(self, tick: HistoryTime.TICK) -> int:
+        """
+        :return: The index of bar that covers tick. -1 if no bar covers it.
+        """
+        index = int(np.searchsorted(self.dates, tick, side='right')) - 1
+        return index if index >= 0 and tick < self.dates[index] + self.__bar_ticks else -1
+
+    def bar_range_of(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> (int, int):
+        """
+        :return: The bars that overlap [since, until] are [lower, upper).
+        """
+        lower = int(np.searchsorted(self.dates, since - self.__bar_ticks, side='right'))
+        upper = int(np.searchsorted(self.dates, until, side='right'))
+        return lower, upper
+
+    def get_tip_text(self, on_tick: float) -> str:
+        index = self.bar_index_at(on_tick)
+        if index < 0:
+            return ''
+        return 'Open %0.2f; Close: %0.2f; High: %0.2f; Low: %0.2f' % \
+               (self.opens[index], self.closes[index], self.highs[index], self.lows[index])
+
+    def arrange_item(self, outer_metrics: AxisMetrics):
+        super(CandlestickSeries, self).arrange_item(outer_metrics)
+        if len(self.dates) == 0:
+            return
+
+        since, until = self.dates[0], self.dates[-1] + self.__bar_ticks - 1
+        since_pixel = outer_metrics.value_to_pixel(since)
+        until_pixel = outer_metrics.value_to_pixel(until)
+        outer_since, outer_until = outer_metrics.get_longitudinal_range()
+        self.item_metrics.set_scale_range(since, until)
+        self.item_metrics.set_longitudinal_range(max(since_pixel, outer_since), min(until_pixel, outer_until))
+
+    def paint(self, qp: QPainter):
+        if self.get_outer_metrics().get_layout() == LAYOUT_HORIZON:
+            self.__paint_horizon(qp)
+        elif self.get_outer_metrics().get_layout() == LAYOUT_VERTICAL:
+            self.__paint_vertical(qp)
+
+    def __paint_horizon(self, qp: QPainter):
+        outer_metrics = self.get_outer_metrics()
+        scale_since, scale_until = outer_metrics.get_scale_range()
+        if len(self.dates) == 0:
+            return
+        level = self.select_level(scale_since, scale_until, outer_metrics.get_longitudinal_length())
+        lower, upper = level.bar_range_of(scale_since, scale_until)
+        if lower >= upper:
+            return
+
+        outer_rect = outer_metrics.rect()
+        value_x_mapping = AxisMapping(scale_since, scale_until, *outer_metrics.get_longitudinal_range())
+        value_y_mapping = AxisMapping(self.__lower_limit, self.__upper_limit, outer_rect.bottom(), outer_rect.top())
+
+        since_x = value_x_mapping.a_to_b(level.sinces[lower:upper]).astype(np.int64)
+        until_x = value_x_mapping.a_to_b(level.untils[lower:upper]).astype(np.int64)
+        mid_x = (since_x + until_x) // 2
+        open_y = value_y_mapping.a_to_b(level.opens[lower:upper]).astype(np.int64)
+        close_y = value_y_mapping.a_to_b(level.closes[lower:upper]).astype(np.int64)
+        high_y = value_y_mapping.a_to_b(level.highs[lower:upper]).astype(np.int64)
+        low_y = value_y_mapping.a_to_b(level.lows[lower:upper]).astype(np.int64)
+        increase = level.closes[lower:upper] > level.opens[lower:upper]
+
+        for mask, color in [(increase, Candlestick.COLOR_INCREASE), (~increase, Candlestick.COLOR_DECREASE)]:
+            indexes = np.flatnonzero(mask).tolist()
+            if len(indexes) == 0:
+                continue
+            qp.setPen(color)
+            qp.setBrush(color)
+            qp.drawLines([QLine(mid_x[i], high_y[i], mid_x[i], low_y[i]) for i in indexes])
+            qp.drawRects([QRect(QPoint(since_x[i], open_y[i]), QPoint(until_x[i], close_y[i])).normalized()
+                          for i in indexes])
+
+    def __paint_vertical(self, qp: QPainter):
+        pass
+
+    # ---------------------------------------------------------
+
+    def __build_levels(self) -> [CandlestickLevel]:
+        bar = CandlestickLevel(self.dates, self.dates + self.__bar_ticks - 1,
+                               self.opens, self.closes, self.highs, self.lows, self.__bar_ticks)
+        years, months, _, _, _, _ = HistoryTime.ticks_to_dates(self.dates)
+        next_years = np.where(years == -1, 1, years + 1)        # There's no year 0
+
+        week_keys = (self.dates - CandlestickSeries.WEEK_ORIGIN) // CandlestickSeries.TICK_WEEK
+        week_sinces = CandlestickSeries.WEEK_ORIGIN + week_keys * CandlestickSeries.TICK_WEEK
+        month_sinces = HistoryTime.dates_to_ticks(years, months, 1)
+        month_untils = HistoryTime.dates_to_ticks(np.where(months == 12, next_years, years), months % 12 + 1, 1) - 1
+        year_sinces = HistoryTime.dates_to_ticks(years, 1, 1)
+        year_untils = HistoryTime.dates_to_ticks(next_years, 1, 1) - 1
+
+        levels = [bar]
+        for keys, sinces, untils, nominal_ticks in [
+                (week_keys, week_sinces, week_sinces + CandlestickSeries.TICK_WEEK - 1, CandlestickSeries.TICK_WEEK),
+                (month_sinces, month_sinces, month_untils, HistoryTime.TICK_YEAR // 12),
+                (years, year_sinces, year_untils, HistoryTime.TICK_YEAR)]:
+            if nominal_ticks > self.__bar_ticks:
+                levels.append(bar.aggregate(keys, sinces, untils, nominal_ticks))
+        return levels
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def time_series_to_ticks(times: pd.Series) -> np.ndarray:
+    """
+    Convert the date time column (text like '1990-12-19 09:30:00' or number like 19901219) to TICK in bulk.
+    The pandas datetime is in seconds since 1970-01-01 (proleptic Gregorian), so it's an offset of TICK.
+    """
+    if pd.api.types.is_numeric_dtype(times):
+        date_times = pd.to_datetime(times.astype(np.int64).astype(str), format='%Y%m%d')
+    else:
+        date_times = pd.to_datetime(times, format='ISO8601')
+    seconds = date_times.to_numpy().astype('datetime64[s]').astype(np.int64)
+    return seconds + HistoryTime.date_time_data_to_tick(1970, 1, 1)
 
-    # lower = -(-lower // 1)
-    upper = -(-upper // 1)
+
+def candlestick_upper_limit(highs) -> float:
+    """
+    Round the max high up to a readable upper limit of price axis.
+    """
+    highs = np.asarray(highs, dtype=np.float64)
+    if len(highs) == 0 or np.all(np.isnan(highs)):
+        return 100.0
+    upper = np.ceil(np.nanmax(highs))
 
     if upper < 100:
         upper = round(upper + 5, -1)
@@ -115,32 +382,120 @@ def build_candle_stick(df: pd.DataFrame,
         upper = round(upper + 50, -2)
     else:
         upper = round(upper + 500, -3)
+    return float(upper)
+
+
+def build_candlestick_series(df: pd.DataFrame,
+                             open_field: str = 'open', close_field: str = 'close',
+                             high_field: str = 'high', low_field: str = 'low',
+                             time_field: str = 'trade_date', **kwargs) -> CandlestickSeries:
+    return CandlestickSeries(time_series_to_ticks(df[time_field]),
+                             df[open_field].to_numpy(dtype=np.float64), df[close_field].to_numpy(dtype=np.float64),
+                             df[high_field].to_numpy(dtype=np.float64), df[low_field].to_numpy(dtype=np.float64),
+                             **kwargs)
+
 
-    candle_sticks = []
-    for index, row in df.iterrows():
-        time_data = row[time_field]
-        time_tick = HistoryTime.time_text_to_ticks(time_data)
-        candle_stick = Candlestick(0, upper, time_tick,
-                                   row[open_field], row[close_field],
-                                   row[high_field], row[low_field])
-        candle_sticks.append(candle_stick)
-    return candle_sticks
+def build_candle_stick(df: pd.DataFrame,
+                       open_field: str = 'open', close_field: str = 'close',
+                       high_field: str = 'high', low_field: str = 'low',
+                       time_field: str = 'trade_date') -> [Candlestick]:
+    """
+    Build one Candlestick item for each row. Prefer build_candlestick_series() for large data.
+    """
+    upper = candlestick_upper_limit(df[high_field])
+    ticks = time_series_to_ticks(df[time_field]).tolist()
+    return [Candlestick(0, upper, tick, _open, close, high, low) for tick, _open, close, high, low in
+            zip(ticks, df[open_field].tolist(), df[close_field].tolist(),
+                df[high_field].tolist(), df[low_field].tolist())]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def test_candlestick_series():
+    df = pd.read_csv(path.join(root_path, 'res', '000001.SSE.CSV'))
+    series = build_candlestick_series(df)
+    assert len(series) == len(df)
+    assert series.get_bar_ticks() == HistoryTime.TICK_DAY
+    assert series.get_limit() == (0, candlestick_upper_limit(df['high']))
+    for row in [0, 1, len(df) // 2, len(df) - 1]:
+        tick = HistoryTime.time_str_to_tick(df['trade_date'][row])
+        index = series.bar_index_at(tick + HistoryTime.TICK_HOUR)
+        assert series.dates[index] == tick and series.closes[index] == df['close'][row]
+    assert series.bar_index_at(series.dates[0] - 1) == -1
+
+    candle_sticks = build_candle_stick(df)
+    assert [c.get_item_metrics().get_scale_range()[0] for c in candle_sticks] == series.dates.tolist()
+
+    # Numeric date and minute bars, streaming by chunks
+    import tempfile
+    minutes = pd.date_range('2020-01-01 09:30', periods=500, freq='min')
+    minute_df = pd.DataFrame({'trade_date': minutes.strftime('%Y-%m-%d %H:%M:%S'),
+                              'open': np.arange(500.0), 'close': np.arange(500.0) + 1,
+                              'high': np.arange(500.0) + 2, 'low': np.arange(500.0) - 1})
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file = path.join(temp_dir, 'minutes.csv')
+        minute_df.iloc[::-1].to_csv(file, index=False)
+        minute_series = CandlestickSeries.from_csv(file, chunk_size=64)
+    assert minute_series.get_bar_ticks() == HistoryTime.TICK_MIN
+    assert minute_series.dates[0] == HistoryTime.time_str_to_tick('2020-01-01 09:30:00')
+    assert minute_series.opens.tolist() == list(np.arange(500.0))
+    assert minute_series.bar_range_of(minute_series.dates[10] + 1, minute_series.dates[20]) == (10, 21)
+    assert minute_series.get_limit() == (0, 600.0)
+
+    numeric_ticks = time_series_to_ticks(pd.Series([19901219, 20200102]))
+    assert numeric_ticks.tolist() == [HistoryTime.time_str_to_tick('1990-12-19'),
+                                      HistoryTime.time_str_to_tick('2020-01-02')]
+
+
+def test_candlestick_levels():
+    df = pd.read_csv(path.join(root_path, 'res', '000001.SSE.CSV'))
+    series = build_candlestick_series(df)
+    levels = series.get_levels()
+    assert [level.nominal_ticks for level in levels] == \
+           [HistoryTime.TICK_DAY, HistoryTime.TICK_DAY * 7, HistoryTime.TICK_YEAR // 12, HistoryTime.TICK_YEAR]
+    assert len(levels[0]) == len(series) > len(levels[1]) > len(levels[2]) > len(levels[3])
+
+    for level in levels[1:]:
+        assert np.all(level.sinces[1:] > level.untils[:-1])
+        total = 0
+        for i in range(len(level)):
+            lower = np.searchsorted(series.dates, level.sinces[i], side='left')
+            upper = np.searchsorted(series.dates, level.untils[i], side='right')
+            total += upper - lower
+            assert upper > lower
+            assert level.opens[i] == series.opens[lower] and level.closes[i] == series.closes[upper - 1]
+            assert level.highs[i] == series.highs[lower:upper].max()
+            assert level.lows[i] == series.lows[lower:upper].min()
+        assert total == len(series)
+
+    year = HistoryTime.years_to_tick(2000)
+    year_level = levels[3]
+    index = year_level.bar_range_of(year, year)[0]
+    assert (year_level.sinces[index], year_level.untils[index]) == \
+           (HistoryTime.years_to_tick(2000), HistoryTime.years_to_tick(2001) - 1)
+    assert HistoryTime.tick_to_date_time_data(levels[1].sinces[0])[:3] == (1990, 12, 17)        # Monday
+
+    assert series.select_level(year, year + HistoryTime.TICK_YEAR // 2, 1000) is levels[0]
+    assert series.select_level(year, year + HistoryTime.TICK_YEAR, 1000) is levels[1]
+    assert series.select_level(year, year + HistoryTime.TICK_YEAR * 10, 1000) is levels[2]
+    assert series.select_level(year, year + HistoryTime.TICK_YEAR * 30, 1000) is levels[3]
+    assert series.select_level(year, year + HistoryTime.TICK_YEAR * 10000, 1000) is levels[3]
 
 
 # ----------------------------------------------------- File Entry -----------------------------------------------------
 
 def main():
+    test_candlestick_series()
+    test_candlestick_levels()
+
     app = QApplication(sys.argv)
 
     # Threads
     thread = TimeThreadBase()
     thread.set_thread_color(THREAD_BACKGROUND_COLORS[0])
 
-    df = pd.read_csv(path.join(root_path, 'res', '000001.SSE.CSV'))
-    candle_sticks = build_candle_stick(df)
-
-    for candle_stick in candle_sticks:
-        thread.add_axis_items(candle_stick)
+    series = CandlestickSeries.from_csv(path.join(root_path, 'res', '000001.SSE.CSV'))
+    thread.add_axis_items(series)
 
     # # CandleSticks
     # date = HistoryTime.now_tick() - HistoryTime.TICK_YEAR
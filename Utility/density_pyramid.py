@@ -0,0 +1,140 @@
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                 class DensityPyramid
+# ----------------------------------------------------------------------------------------------------------------------
+
+class DensityPyramid:
+    """
+    The multi-resolution histogram of periods: the count of periods that overlap each time bucket, at each level.
+    The bucket size of level 0 is base_bucket, and each level is factor times of the previous level.
+
+    The bucket i of a level is [i * bucket_size, (i + 1) * bucket_size). Only the non-empty buckets are kept.
+    Adding or removing a period updates the buckets of every level, so build it once and keep it updated.
+    Querying a range walks the buckets in it, so the query cost is bounded by the bucket count but not period count.
+    The max bucket count of a level is a stable reference to normalize the counts, it does not depend on the range.
+    """
+
+    def __init__(self, base_bucket: int, factor: int = 10, levels: int = 6):
+        self.__bucket_sizes = [base_bucket * factor ** level for level in range(levels)]
+        self.__buckets = [{} for _ in range(levels)]        # [{bucket index: count}] of each level
+        self.__max_counts = [None] * levels                 # The max bucket count of each level, None if not known
+        self.__count = 0
+
+    def __len__(self):
+        return self.__count
+
+    def level_count(self) -> int:
+        return len(self.__bucket_sizes)
+
+    def bucket_size(self, level: int) -> int:
+        return self.__bucket_sizes[level]
+
+    def select_level(self, min_bucket_size) -> int:
+        """
+        :return: The finest level that bucket size is not less than min_bucket_size. Or the coarsest level.
+        """
+        for level in range(len(self.__bucket_sizes)):
+            if self.__bucket_sizes[level] >= min_bucket_size:
+                return level
+        return len(self.__bucket_sizes) - 1
+
+    def max_count(self, level: int) -> int:
+        """
+        :return: The max bucket count of level over all periods. 0 if no period.
+        """
+        if self.__max_counts[level] is None:
+            self.__max_counts[level] = max(self.__buckets[level].values(), default=0)
+        return self.__max_counts[level]
+
+    def add(self, since, until):
+        self.__update(since, until, 1)
+        self.__count += 1
+
+    def remove(self, since, until):
+        """
+        Remove a period that added before. The since and until should be the same as adding.
+        """
+        self.__update(since, until, -1)
+        self.__count -= 1
+
+    def clear(self):
+        for buckets in self.__buckets:
+            buckets.clear()
+        self.__max_counts = [None] * len(self.__buckets)
+        self.__count = 0
+
+    def query(self, level: int, since, until) -> [(int, int, int)]:
+        """
+        Get the non-empty buckets of level that overlap [since, until].
+        :return: The list of (bucket since, bucket until (exclusive), count), sorted by bucket since.
+        """
+        bucket_size = self.__bucket_sizes[level]
+        buckets = self.__buckets[level]
+        first, last = since // bucket_size, until // bucket_size
+        if last - first + 1 > len(buckets):
+            bucket_indexes = sorted(index for index in buckets.keys() if first <= index <= last)
+        else:
+            bucket_indexes = [index for index in range(first, last + 1) if index in buckets]
+        return [(index * bucket_size, (index + 1) * bucket_size, buckets[index]) for index in bucket_indexes]
+
+    # ------------------------------------------------------------------------------------------
+
+    def __update(self, since, until, delta: int):
+        self.__max_counts = [None] * len(self.__buckets)
+        for bucket_size, buckets in zip(self.__bucket_sizes, self.__buckets):
+            for index in range(since // bucket_size, until // bucket_size + 1):
+                count = buckets.get(index, 0) + delta
+                if count != 0:
+                    buckets[index] = count
+                else:
+                    del buckets[index]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def test_density_pyramid():
+    import random
+
+    random.seed(0)
+    periods = []
+    for _ in range(1000):
+        since = random.randint(-5000, 5000)
+        periods.append((since, since + random.choice([0, 0, random.randint(0, 100), random.randint(0, 3000)])))
+
+    pyramid = DensityPyramid(10, 10, 4)
+    for period in periods:
+        pyramid.add(*period)
+    for period in periods[:300]:
+        pyramid.remove(*period)
+    periods = periods[300:]
+    assert len(pyramid) == len(periods)
+
+    for level in range(pyramid.level_count()):
+        size = pyramid.bucket_size(level)
+        for since, until in [(-6000, 6000), (-123, 456), (0, 0), (7000, 8000)]:
+            expects = []
+            for index in range(since // size, until // size + 1):
+                count = sum(1 for s, u in periods if s < (index + 1) * size and u >= index * size)
+                if count > 0:
+                    expects.append((index * size, (index + 1) * size, count))
+            assert pyramid.query(level, since, until) == expects
+
+    for level in range(pyramid.level_count()):
+        expect = max((count for _, _, count in pyramid.query(level, -6000, 6000)), default=0)
+        assert pyramid.max_count(level) == expect
+    pyramid.add(0, 0)
+    assert pyramid.max_count(0) == max(count for _, _, count in pyramid.query(0, -6000, 6000))
+    pyramid.remove(0, 0)
+
+    assert pyramid.select_level(1) == 0 and pyramid.select_level(11) == 1 and pyramid.select_level(100000) == 3
+
+    pyramid.clear()
+    assert len(pyramid) == 0 and pyramid.query(0, -6000, 6000) == [] and pyramid.max_count(0) == 0
+
+
+def main():
+    test_density_pyramid()
+    print('All test passed.')
+
+
+if __name__ == '__main__':
+    main()
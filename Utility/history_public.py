@@ -1,7 +1,9 @@
 import io
 import sys
 import math
+import threading
 import traceback
+from collections import OrderedDict
 
 
 # ----------------------------------------------------- Functions ------------------------------------------------------
@@ -17,6 +19,7 @@ def suppress_print(func):
         return result
     return wrapper
 
+
 def str_to_int(text: str, default: int = 0):
     try:
         return int(text)
@@ -34,7 +37,8 @@ def str_includes(text: str, includes: [str]) -> bool:
 
 
 def list_unique(list1: list) -> list:
-    return list(set(list1))
+    # Keep the order of first occurrence, so the result is the same in every process.
+    return list(dict.fromkeys(list1))
 
 
 def list_union_unique(list1: list, list2: list) -> list:
@@ -126,6 +130,78 @@ def scale_round(num: float, scale: float):
     return (round(num / scale) + 1) * scale
 
 
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                     class LruCache
+# ----------------------------------------------------------------------------------------------------------------------
+
+class LruCache:
+    """
+    A bounded LRU cache with hit / miss statistics. It's thread safe.
+    The cache is not shared between processes. Each worker process has its own copy and warms it up by itself.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        """
+        :param max_size: The max item count. 0 to disable the cache.
+        """
+        self.__lock = threading.Lock()
+        self.__items = OrderedDict()
+        self.__max_size = max(0, max_size)
+        self.__hits = 0
+        self.__misses = 0
+
+    def __len__(self):
+        return len(self.__items)
+
+    def get(self, key, default=None):
+        with self.__lock:
+            value = self.__items.get(key, self)
+            if value is self:
+                self.__misses += 1
+                return default
+            self.__items.move_to_end(key)
+            self.__hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.__lock:
+            if self.__max_size == 0:
+                return
+            self.__items[key] = value
+            self.__items.move_to_end(key)
+            self.__shrink()
+
+    def clear(self):
+        with self.__lock:
+            self.__items.clear()
+            self.__hits = 0
+            self.__misses = 0
+
+    def resize(self, max_size: int):
+        with self.__lock:
+            self.__max_size = max(0, max_size)
+            self.__shrink()
+
+    def max_size(self) -> int:
+        return self.__max_size
+
+    def stats(self) -> dict:
+        """
+        :return: { 'hits': int, 'misses': int, 'size': int, 'max_size': int }
+        """
+        with self.__lock:
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'size': len(self.__items),
+                'max_size': self.__max_size,
+            }
+
+    def __shrink(self):
+        while len(self.__items) > self.__max_size:
+            self.__items.popitem(last=False)
+
+
 # ----------------------------------------------------- Test Code ------------------------------------------------------
 
 def test_upper_rough():
@@ -164,11 +240,32 @@ def test_lower_rough():
     # assert math.isclose(upper_rough(-0.07), 0.07)
 
 
+def test_lru_cache():
+    cache = LruCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'size': 2, 'max_size': 2}
+
+    cache.resize(1)
+    assert len(cache) == 1 and cache.get('c') == 3
+    cache.resize(0)
+    cache.put('d', 4)
+    assert len(cache) == 0 and cache.get('d', 0) == 0
+
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'size': 0, 'max_size': 0}
+
+
 # ----------------------------------------------------- File Entry -----------------------------------------------------
 
 def main():
     test_upper_rough()
     test_lower_rough()
+    test_lru_cache()
     print('All test passed.')
 
 
@@ -0,0 +1,182 @@
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                  class IntervalIndex
+# ----------------------------------------------------------------------------------------------------------------------
+
+class IntervalIndex:
+    """
+    A static interval tree for the query: which items overlap the range [since, until] (both inclusive).
+
+    The intervals are sorted by their start, and the sorted array is treated as an implicit balanced binary search tree
+    (the middle of a range is the root of it). Each node keeps the max end of its subtree, so a query can skip a
+    subtree whose max end is before the range, and stop at the node whose start is after the range.
+    The query is O(log N + K), where K is the count of the overlapped items.
+
+    The tree is built lazily on the first query after add() or clear(). So add items in bulk and query many times.
+    The query result keeps the order of add().
+
+    A few add() and remove() after the tree built do not rebuild it: The added intervals are pending and scanned
+    by each query, and the removed intervals are skipped. The tree is rebuilt when there're too many of them.
+    """
+
+    def __init__(self):
+        self.__intervals = []           # [(since, until, item)] in the order of add()
+        self.__item_orders = None       # { item: order } for remove(). Built on the first remove().
+        self.__removed = set()          # The orders of removed intervals
+
+        self.__built_count = 0          # The intervals[:built_count] are in the tree, the rest are pending
+        self.__starts = []              # The starts of intervals, sorted
+        self.__ends = []                # The ends of intervals, in the order of starts
+        self.__orders = []              # The add() order of intervals, in the order of starts
+        self.__max_ends = []            # The max end of the subtree which root is this node
+
+    def __len__(self):
+        return len(self.__intervals) - len(self.__removed)
+
+    def add(self, since, until, item):
+        if self.__item_orders is not None:
+            self.__item_orders[item] = len(self.__intervals)
+        self.__intervals.append((since, until, item))
+
+    def remove(self, item) -> bool:
+        """
+        Remove the interval of item (the last one if the item is added multiple times). The item should be hashable.
+        :return: False if item is not found
+        """
+        if self.__item_orders is None:
+            self.__item_orders = {self.__intervals[order][2]: order for order in range(len(self.__intervals))
+                                  if order not in self.__removed}
+        order = self.__item_orders.pop(item, None)
+        if order is None:
+            return False
+        self.__removed.add(order)
+        return True
+
+    def clear(self):
+        self.__intervals.clear()
+        self.__item_orders = None
+        self.__removed.clear()
+        self.__built_count = 0
+        self.__starts, self.__ends, self.__orders, self.__max_ends = [], [], [], []
+
+    def query(self, since, until) -> list:
+        """
+        Get the items that (item_since <= until) and (item_until >= since).
+        :return: The list of items in the order of add()
+        """
+        if len(self.__intervals) - self.__built_count + len(self.__removed) > 32 + self.__built_count // 8:
+            self.__build()
+        intervals = self.__intervals
+        orders = self.__query_orders(since, until)
+        orders.sort()
+        orders.extend(order for order in range(self.__built_count, len(intervals))
+                      if intervals[order][0] <= until and intervals[order][1] >= since)
+        if len(self.__removed) > 0:
+            orders = [order for order in orders if order not in self.__removed]
+        return [intervals[order][2] for order in orders]
+
+    # ------------------------------------------------------------------------------------------
+
+    def __build(self):
+        if len(self.__removed) > 0:
+            # Drop the removed intervals. The orders are renumbered but their sequence is kept.
+            self.__intervals = [self.__intervals[order] for order in range(len(self.__intervals))
+                                if order not in self.__removed]
+            self.__item_orders = None
+            self.__removed.clear()
+        self.__built_count = len(self.__intervals)
+        sorted_orders = sorted(range(len(self.__intervals)), key=lambda order: self.__intervals[order][0])
+        self.__orders = sorted_orders
+        self.__starts = [self.__intervals[order][0] for order in sorted_orders]
+        self.__ends = [self.__intervals[order][1] for order in sorted_orders]
+        self.__max_ends = list(self.__ends)
+        self.__build_max_end(0, len(sorted_orders))
+
+    def __build_max_end(self, lo: int, hi: int):
+        # Post-order: the children of node [lo, hi) are [lo, mid) and [mid + 1, hi)
+        stack = [(lo, hi, False)]
+        max_ends = self.__max_ends
+        while len(stack) > 0:
+            lo, hi, visited = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if not visited:
+                stack.append((lo, hi, True))
+                stack.append((lo, mid, False))
+                stack.append((mid + 1, hi, False))
+            else:
+                if lo < mid:
+                    max_ends[mid] = max(max_ends[mid], max_ends[(lo + mid) // 2])
+                if mid + 1 < hi:
+                    max_ends[mid] = max(max_ends[mid], max_ends[(mid + 1 + hi) // 2])
+
+    def __query_orders(self, since, until) -> [int]:
+        starts, ends, max_ends, orders = self.__starts, self.__ends, self.__max_ends, self.__orders
+        result = []
+        stack = [(0, len(starts))]
+        while len(stack) > 0:
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if max_ends[mid] < since:
+                # No interval in this subtree reaches the range
+                continue
+            stack.append((lo, mid))
+            if starts[mid] <= until:
+                if ends[mid] >= since:
+                    result.append(orders[mid])
+                stack.append((mid + 1, hi))
+        return result
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def test_interval_index():
+    import random
+
+    random.seed(0)
+    intervals = []
+    for i in range(2000):
+        since = random.randint(-1000, 1000)
+        intervals.append((since, since + random.choice([0, 0, random.randint(0, 50), random.randint(0, 500)])))
+
+    index = IntervalIndex()
+    for i in range(len(intervals)):
+        index.add(intervals[i][0], intervals[i][1], i)
+
+    for _ in range(500):
+        since = random.randint(-1200, 1200)
+        until = since + random.randint(0, 300)
+        expects = [i for i in range(len(intervals)) if intervals[i][0] <= until and intervals[i][1] >= since]
+        assert index.query(since, until) == expects
+
+    # Update after built
+    alive = list(range(len(intervals)))
+    for i in range(300):
+        if random.random() < 0.5:
+            since = random.randint(-1000, 1000)
+            intervals.append((since, since + random.randint(0, 100)))
+            index.add(intervals[-1][0], intervals[-1][1], len(intervals) - 1)
+            alive.append(len(intervals) - 1)
+        else:
+            removed = alive.pop(random.randrange(len(alive)))
+            assert index.remove(removed)
+            assert not index.remove(removed)
+        since = random.randint(-1200, 1200)
+        until = since + random.randint(0, 300)
+        expects = [i for i in alive if intervals[i][0] <= until and intervals[i][1] >= since]
+        assert index.query(since, until) == expects
+        assert len(index) == len(alive)
+
+    index.clear()
+    assert index.query(-1000, 1000) == [] and len(index) == 0
+
+
+def main():
+    test_interval_index()
+    print('All test passed.')
+
+
+if __name__ == '__main__':
+    main()
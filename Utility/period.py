@@ -0,0 +1,277 @@
+"""
+Period algebra of history time. A period is [since, until] in TICK, both inclusive. The same as period_adapt().
+
+    Period: An immutable single period.
+    The period_*() functions: The bulk operations over the array of periods.
+        The periods are given by two arrays (sinces, untils) and the results are the same. Use NumPy.
+        Input periods can be in any order and can overlap. The output periods are sorted by since.
+"""
+
+import sys
+import traceback
+import numpy as np
+from typing import NamedTuple
+
+try:
+    from Utility import HistoryTime
+except Exception as e:
+    from os import path
+
+    root_path = path.dirname(path.dirname(path.abspath(__file__)))
+    sys.path.append(root_path)
+    from Utility import HistoryTime
+finally:
+    pass
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                     class Period
+# ----------------------------------------------------------------------------------------------------------------------
+
+class Period(NamedTuple):
+    since: HistoryTime.TICK
+    until: HistoryTime.TICK
+
+    def length(self) -> HistoryTime.TICK:
+        return self.until - self.since + 1
+
+    def contains(self, tick: HistoryTime.TICK) -> bool:
+        return self.since <= tick <= self.until
+
+    def overlaps(self, rhs) -> bool:
+        return self.since <= rhs.until and self.until >= rhs.since
+
+    def intersect(self, rhs):
+        """
+        :return: The intersection Period or None if not overlap
+        """
+        since, until = max(self.since, rhs.since), min(self.until, rhs.until)
+        return Period(since, until) if since <= until else None
+
+    def span(self, rhs):
+        """
+        :return: The smallest Period that covers both
+        """
+        return Period(min(self.since, rhs.since), max(self.until, rhs.until))
+
+    def shift(self, offset: HistoryTime.TICK):
+        return Period(self.since + offset, self.until + offset)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                   Bulk Operations
+# ----------------------------------------------------------------------------------------------------------------------
+
+def to_period_arrays(periods: [Period]) -> (np.ndarray, np.ndarray):
+    sinces = np.fromiter((period[0] for period in periods), dtype=np.int64, count=len(periods))
+    untils = np.fromiter((period[1] for period in periods), dtype=np.int64, count=len(periods))
+    return sinces, untils
+
+
+def from_period_arrays(sinces: np.ndarray, untils: np.ndarray) -> [Period]:
+    return [Period(int(since), int(until)) for since, until in zip(sinces, untils)]
+
+
+def period_union(sinces, untils) -> (np.ndarray, np.ndarray):
+    """
+    Merge the overlapped and adjacent periods.
+    :return: The disjoint periods that cover the same ticks, sorted by since. There's a gap between each two of them.
+    """
+    sinces, untils = __sorted_periods(sinces, untils)
+    if len(sinces) == 0:
+        return sinces, untils
+    # A new period starts if there's a gap between it and every period before it
+    reach = np.maximum.accumulate(untils)
+    starts = np.flatnonzero(np.concatenate(([True], sinces[1:] > reach[:-1] + 1)))
+    return sinces[starts], np.maximum.reduceat(untils, starts)
+
+
+def period_intersection(a_sinces, a_untils, b_sinces, b_untils) -> (np.ndarray, np.ndarray):
+    """
+    :return: The disjoint periods that covered by both a and b, sorted by since.
+    """
+    a_sinces, a_untils = period_union(a_sinces, a_untils)
+    b_sinces, b_untils = period_union(b_sinces, b_untils)
+
+    # The b periods that overlap a[i] are b[lower[i]:upper[i]]
+    lower = np.searchsorted(b_untils, a_sinces, side='left')
+    upper = np.searchsorted(b_sinces, a_untils, side='right')
+    counts = np.maximum(upper - lower, 0)
+    a_index = np.repeat(np.arange(len(a_sinces)), counts)
+    b_index = np.repeat(lower, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+    return np.maximum(a_sinces[a_index], b_sinces[b_index]), np.minimum(a_untils[a_index], b_untils[b_index])
+
+
+def period_gaps(sinces, untils, since: HistoryTime.TICK = None,
+                until: HistoryTime.TICK = None) -> (np.ndarray, np.ndarray):
+    """
+    Find the ticks that not covered by any period.
+    :param since: The start of the range to find gaps. None for the start of periods.
+    :param until: The end of the range to find gaps. None for the end of periods.
+    :return: The gap periods, sorted by since.
+    """
+    sinces, untils = period_union(sinces, untils)
+    if len(sinces) == 0 and (since is None or until is None):
+        return sinces, untils
+    lower = sinces[0] if since is None else since
+    upper = untils[-1] if until is None else until
+
+    gap_sinces = np.concatenate(([lower], untils + 1))
+    gap_untils = np.concatenate((sinces - 1, [upper]))
+    gap_sinces, gap_untils = np.maximum(gap_sinces, lower), np.minimum(gap_untils, upper)
+    valid = gap_sinces <= gap_untils
+    return gap_sinces[valid], gap_untils[valid]
+
+
+def period_overlap_counts(sinces, untils) -> np.ndarray:
+    """
+    Count the other periods that overlap each period, by sweep line. O(N log N).
+    :return: The count of each period, in the order of input.
+    """
+    sinces = np.asarray(sinces, dtype=np.int64)
+    untils = np.asarray(untils, dtype=np.int64)
+    sorted_sinces = np.sort(sinces)
+    sorted_untils = np.sort(untils)
+    # Overlapped: (other since <= until) and (other until >= since). Remove itself.
+    started = np.searchsorted(sorted_sinces, untils, side='right')
+    finished = np.searchsorted(sorted_untils, sinces, side='left')
+    return started - finished - 1
+
+
+def period_concurrency(sinces, untils) -> (np.ndarray, np.ndarray):
+    """
+    The count of concurrent periods over time, by sweep line.
+    :return: (ticks, counts). The count of concurrent periods is counts[i] in [ticks[i], ticks[i + 1]).
+             And it's 0 before ticks[0] and since ticks[-1].
+    """
+    sinces = np.asarray(sinces, dtype=np.int64)
+    untils = np.asarray(untils, dtype=np.int64)
+    events = np.concatenate((sinces, untils + 1))
+    deltas = np.concatenate((np.ones(len(sinces), dtype=np.int64), -np.ones(len(untils), dtype=np.int64)))
+    ticks, inverse = np.unique(events, return_inverse=True)
+    return ticks, np.cumsum(np.bincount(inverse, weights=deltas, minlength=len(ticks)).astype(np.int64))
+
+
+def period_coverage(sinces, untils, bucket_since: HistoryTime.TICK, bucket_size: HistoryTime.TICK,
+                    bucket_count: int) -> np.ndarray:
+    """
+    The ticks covered by the periods in each bucket. The overlapped part is counted once.
+    :param bucket_since: The start tick of the first bucket.
+    :param bucket_size: The ticks of a bucket. The bucket i is [bucket_since + i * size, bucket_since + (i + 1) * size)
+    :param bucket_count: The count of buckets
+    :return: The covered ticks of each bucket.
+    """
+    sinces, untils = period_union(sinces, untils)
+    edges = bucket_since + np.arange(bucket_count + 1, dtype=np.int64) * bucket_size
+    return np.diff(__covered_before(sinces, untils, edges))
+
+
+def __covered_before(sinces: np.ndarray, untils: np.ndarray, ticks: np.ndarray) -> np.ndarray:
+    """
+    The ticks that covered by the disjoint sorted periods and less than each tick.
+    """
+    if len(sinces) == 0:
+        return np.zeros(len(ticks), dtype=np.int64)
+    lengths = untils - sinces + 1
+    covered = np.concatenate(([0], np.cumsum(lengths)))
+    # The periods that start before tick are [0, index). The last one of them may be partial.
+    index = np.searchsorted(sinces, ticks, side='left')
+    last = np.maximum(index - 1, 0)
+    partial = np.where(index > 0, np.minimum(ticks - sinces[last], lengths[last]), 0)
+    return covered[last] + partial
+
+
+def __sorted_periods(sinces, untils) -> (np.ndarray, np.ndarray):
+    sinces = np.asarray(sinces, dtype=np.int64)
+    untils = np.asarray(untils, dtype=np.int64)
+    order = np.argsort(sinces, kind='stable')
+    return sinces[order], untils[order]
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def test_period():
+    a, b = Period(0, 10), Period(5, 20)
+    assert a.length() == 11 and a.contains(10) and not a.contains(11)
+    assert a.overlaps(b) and not a.overlaps(Period(11, 12)) and a.overlaps(Period(10, 12))
+    assert a.intersect(b) == Period(5, 10) and a.intersect(Period(11, 12)) is None
+    assert a.span(b) == Period(0, 20) and a.shift(5) == Period(5, 15)
+
+
+def test_period_bulk_operations():
+    import random
+
+    random.seed(0)
+    for _ in range(200):
+        periods = []
+        for _ in range(random.randint(0, 30)):
+            since = random.randint(0, 200)
+            periods.append(Period(since, since + random.randint(0, 30)))
+        others = []
+        for _ in range(random.randint(0, 30)):
+            since = random.randint(0, 200)
+            others.append(Period(since, since + random.randint(0, 30)))
+        sinces, untils = to_period_arrays(periods)
+
+        covered = {tick for period in periods for tick in range(period.since, period.until + 1)}
+        other_covered = {tick for period in others for tick in range(period.since, period.until + 1)}
+
+        def ticks_of(result) -> [int]:
+            ticks = [tick for period in from_period_arrays(*result) for tick in range(period.since, period.until + 1)]
+            assert ticks == sorted(set(ticks))
+            return ticks
+
+        union = from_period_arrays(*period_union(sinces, untils))
+        assert ticks_of(period_union(sinces, untils)) == sorted(covered)
+        assert all(union[i].until + 1 < union[i + 1].since for i in range(len(union) - 1))
+        assert ticks_of(period_intersection(sinces, untils, *to_period_arrays(others))) == \
+               sorted(covered & other_covered)
+        for since, until in [(None, None), (-10, None), (None, 250), (-10, 250), (50, 60)]:
+            if len(covered) == 0 and (since is None or until is None):
+                assert len(period_gaps(sinces, untils, since, until)[0]) == 0
+                continue
+            lower = min(covered, default=0) if since is None else since
+            upper = max(covered, default=-1) if until is None else until
+            assert ticks_of(period_gaps(sinces, untils, since, until)) == \
+                   [tick for tick in range(lower, upper + 1) if tick not in covered]
+
+        assert list(period_overlap_counts(sinces, untils)) == \
+               [sum(1 for rhs in periods if rhs.overlaps(lhs)) - 1 for lhs in periods]
+        ticks, counts = period_concurrency(sinces, untils)
+        for tick in range(-1, 240):
+            index = np.searchsorted(ticks, tick, side='right') - 1
+            assert (counts[index] if index >= 0 else 0) == sum(1 for period in periods if period.contains(tick))
+        assert list(period_coverage(sinces, untils, -7, 13, 20)) == \
+               [len([tick for tick in range(-7 + i * 13, -7 + (i + 1) * 13) if tick in covered]) for i in range(20)]
+
+
+# ----------------------------------------------------- File Entry -----------------------------------------------------
+
+def main():
+    test_period()
+    test_period_bulk_operations()
+    print('All test passed.')
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def exception_hook(type, value, tback):
+    # log the exception here
+    print('Exception hook triggered.')
+    print(type)
+    print(value)
+    print(tback)
+    # then call the default handler
+    sys.__excepthook__(type, value, tback)
+
+
+if __name__ == "__main__":
+    sys.excepthook = exception_hook
+    try:
+        main()
+    except Exception as e:
+        print('Error =>', e)
+        print('Error =>', traceback.format_exc())
+        exit()
+    finally:
+        pass
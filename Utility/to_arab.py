@@ -1,6 +1,7 @@
 import re
 import sys
 import traceback
+from functools import lru_cache
 
 CN_NUM = {
     '0': 0,
@@ -56,6 +57,7 @@ CN_UNIT_L2 = {
 }
 
 
+@lru_cache(maxsize=4096)
 def cn_num_to_digit(cn_num: str):
     """
     Algorithm:
@@ -77,10 +79,8 @@ def cn_num_to_digit(cn_num: str):
     unit_l2 = 1
     unit_l2_max = 0
     digit_missing = False
-    num_chars = list(cn_num)
 
-    while num_chars:
-        num_char = num_chars.pop()
+    for num_char in reversed(cn_num):
         if num_char in CN_UNIT_L1:
             unit_l1 = CN_UNIT_L1.get(num_char)
             digit_missing = True
@@ -111,13 +111,23 @@ def cn_num_to_digit(cn_num: str):
 pattern = re.compile(r'([0123456789〇一二三四五六七八九零壹贰叁肆伍陆柒捌玖貮两十拾百佰千仟万萬亿億兆]+)')
 
 
+def __cn_num_match_to_arab(match) -> str:
+    return str(cn_num_to_digit(match.group(0)))
+
+
 def text_cn_num_to_arab(text: str) -> str:
-    match_text = pattern.findall(text)
-    match_text = list(set(match_text))
-    match_text.sort(key=lambda x: len(x), reverse=True)
-    for cn_num in match_text:
-        text = text.replace(cn_num, str(cn_num_to_digit(cn_num)))
-    return text
+    """
+    Replace each cn number in text with arab number in one pass.
+    """
+    return pattern.sub(__cn_num_match_to_arab, text)
+
+
+def texts_cn_num_to_arab(texts: [str]) -> [str]:
+    """
+    The batch version of text_cn_num_to_arab().
+    """
+    sub = pattern.sub
+    return [sub(__cn_num_match_to_arab, text) for text in texts]
 
 
 # ----------------------------------------------------- Test Code ------------------------------------------------------
@@ -168,6 +178,11 @@ def test_cn_time_to_digit():
     assert cn_num_to_digit('五万四千三百二十一万亿四千三百二十一万四千三百二十一') == 54321000043214321
     assert cn_num_to_digit('九千八百七十六万一千二百三十四亿五千四百三十二万一千两百三十四') == 9876123454321234
 
+    assert text_cn_num_to_arab('公元前二百二十一年五月') == '公元前221年5月'
+    assert text_cn_num_to_arab('一百零一 01') == '101 1'
+    assert text_cn_num_to_arab('五万四千三百二十一万亿年') == '54321000000000000年'
+    assert texts_cn_num_to_arab(['一九四九年十月一日', '', '无']) == ['1949年10月1日', '', '无']
+
     print(text_cn_num_to_arab('''
     基本数字有：一，二或两，三，四及五，六，七和八，以及九共十个数字
     支持的位数包括：最简单的十，大一点的百，还有千，更大的万和最终的亿共五个进位
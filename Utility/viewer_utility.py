@@ -270,6 +270,7 @@ class TrackContext:
     def __init__(self):
         self.__metrics = None
         self.__layout_bars = []
+        self.__layout_bar_set = set()
 
     def get_metrics(self) -> AxisMetrics:
         return self.__metrics
@@ -289,7 +290,17 @@ class TrackContext:
         return True
 
     def take_space_for(self, bar):
-        if bar in self.__layout_bars:
+        if bar in self.__layout_bar_set:
             self.__layout_bars.remove(bar)
         self.__layout_bars.append(bar)
+        self.__layout_bar_set.add(bar)
+
+    def remove_bar(self, bar):
+        if bar in self.__layout_bar_set:
+            self.__layout_bars.remove(bar)
+            self.__layout_bar_set.discard(bar)
+
+    def clear(self):
+        self.__layout_bars.clear()
+        self.__layout_bar_set.clear()
 
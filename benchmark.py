@@ -0,0 +1,849 @@
+import os
+import sys
+import time
+import random
+import datetime
+import tempfile
+import tracemalloc
+import traceback
+
+from core import *
+
+
+# ----------------------------------------------------- Assistance -----------------------------------------------------
+
+def depot_files() -> [str]:
+    depot_root = HistoryRecordLoader.get_local_depot_root()
+    return HistoryRecordLoader.enumerate_local_path(depot_root, ['.his'])
+
+
+def depot_texts() -> [str]:
+    texts = []
+    for file in depot_files():
+        with open(file, 'rt', encoding='utf-8') as f:
+            texts.append(f.read())
+    return texts
+
+
+def time_it(func, repeat: int = 1) -> float:
+    """
+    Run func for repeat times and return the best elapsed seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def peak_memory(func) -> int:
+    """
+    Run func and return the peak of traced memory in bytes.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def retained_memory(func) -> int:
+    """
+    Run func and return the traced memory that is still allocated by its result.
+    """
+    tracemalloc.start()
+    try:
+        result = func()
+        current = tracemalloc.get_traced_memory()[0]
+        del result
+        return current
+    finally:
+        tracemalloc.stop()
+
+
+def print_compare(title: str, before: float, after: float):
+    print('%-40s before: %8.2fms, after: %8.2fms, speed up: %6.2fx' %
+          (title, before * 1000, after * 1000, before / after if after > 0 else float('inf')))
+
+
+# ----------------------------------------------------- Benchmark ------------------------------------------------------
+
+def benchmark_tokenizer():
+    texts = depot_texts()
+    total_chars = sum(len(text) for text in texts)
+
+    def tokenize_all(parser_class):
+        for text in texts:
+            parser = parser_class()
+            parser.config(LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
+            parser.reset()
+            parser.attach(text)
+            while not parser.reaches_end():
+                parser.next_token()
+
+    before = time_it(lambda: tokenize_all(TokenParser), 3)
+    after = time_it(lambda: tokenize_all(CompiledTokenParser), 3)
+    print_compare('Tokenizer (%d files, %d chars)' % (len(texts), total_chars), before, after)
+    print('%-40s before: %8.2fMB/s, after: %8.2fMB/s' %
+          ('Tokenizer throughput', total_chars / before / 1e6, total_chars / after / 1e6))
+
+
+def benchmark_parse_diagnostics():
+    texts = depot_texts()
+
+    @suppress_print
+    def parse_all_print_suppressed():
+        # The old way: print every token and swallow the output by redirecting stdout.
+        for text in texts:
+            diagnostics = ParseDiagnostics(ParseDiagnostics.LEVEL_TRACE, ParseDiagnostics.print_handler)
+            LabelTagParser(diagnostics=diagnostics).parse(text)
+
+    def parse_all():
+        for text in texts:
+            LabelTagParser().parse(text)
+
+    before = time_it(parse_all_print_suppressed, 3)
+    after = time_it(parse_all, 3)
+    print_compare('LabelTagParser.parse (suppress_print)', before, after)
+
+
+def benchmark_iter_file():
+    # Join all depot files several times to get a big file
+    fd, file = tempfile.mkstemp(suffix='.his')
+    with os.fdopen(fd, 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(depot_texts() * 10))
+
+    @suppress_print
+    def load_all():
+        return len(HistoryRecordLoader.from_file(file)[file])
+
+    def iterate_all():
+        count = 0
+        for _ in HistoryRecordLoader.iter_file(file):
+            count += 1
+        return count
+
+    try:
+        assert load_all() == iterate_all()
+        before = time_it(load_all, 3)
+        after = time_it(iterate_all, 3)
+        print_compare('Load file (%d KB)' % (os.path.getsize(file) // 1024), before, after)
+        print('%-40s before: %8.2fMB, after: %8.2fMB' %
+              ('Load file peak memory', peak_memory(load_all) / 1e6, peak_memory(iterate_all) / 1e6))
+    finally:
+        os.remove(file)
+
+
+def benchmark_parallel_loading():
+    files = []
+    for depot in ['World_CN', 'China_CN']:
+        depot_path = HistoryRecordLoader.join_local_depot_path(depot)
+        files.extend(HistoryRecordLoader.enumerate_local_path(depot_path))
+
+    @suppress_print
+    def load_serial():
+        return HistoryRecordLoader.from_files(files)
+
+    @suppress_print
+    def load_parallel():
+        return HistoryRecordLoader.from_files(files, workers=0)
+
+    before = time_it(load_serial, 3)
+    after = time_it(load_parallel, 3)
+    print_compare('Load World_CN + China_CN (%d cpu)' % (os.cpu_count() or 1), before, after)
+
+
+def benchmark_record_cache():
+    files = depot_files()
+    cache_dir = tempfile.mkdtemp()
+    cache = HistoryRecordCache(cache_dir)
+
+    @suppress_print
+    def load_all():
+        return HistoryRecordLoader.from_files(files)
+
+    try:
+        before = time_it(load_all, 3)
+        HistoryRecordLoader.set_record_cache(cache)
+        load_all()
+        after = time_it(load_all, 3)
+        print_compare('Load depot files (warm record cache)', before, after)
+    finally:
+        HistoryRecordLoader.set_record_cache(None)
+        cache.clear()
+        os.rmdir(cache_dir)
+
+
+def synthetic_records(count: int, prefix: str = '') -> [HistoryRecord]:
+    records = []
+    for i in range(count):
+        record = HistoryRecord()
+        record.set_label_tags('uuid', '%s%08d' % (prefix, i))
+        record.set_label_tags('title', 'Record %d' % i)
+        records.append(record)
+    return records
+
+
+def synthetic_thread(count: int, fixed_metrics: bool = False):
+    """
+    Build a HistoryIndexTrack of random events and periods. With fixed metrics it can be laid out without TimeAxis.
+    """
+    # Import here because the viewer requires PyQt5
+    from viewer_ex import HistoryIndexTrack, THREAD_BACKGROUND_COLORS, \
+        prepare_test_application, build_random_records, build_test_track
+
+    prepare_test_application()
+    records = build_random_records(count)
+    if fixed_metrics:
+        return build_test_track(records)
+    thread = HistoryIndexTrack()
+    thread.set_thread_color(THREAD_BACKGROUND_COLORS[0])
+    thread.set_thread_event_indexes({'source': records})
+    return thread
+
+
+def benchmark_uuid_index():
+    history = History()
+    for source in range(10):
+        suppress_print(history.upsert_records)('source_%d' % source, synthetic_records(10000, 's%d_' % source))
+    uuids = [r.uuid() for r in history.select_records()][::1000]
+
+    def lookup_by_scan():
+        for _uuid in uuids:
+            # The former History.get_record_by_uuid()
+            collection = history.filter(lambda _, r: r.uuid() == _uuid)
+            assert len(collection) == 1
+
+    def lookup_by_index():
+        for _uuid in uuids:
+            assert history.get_record_by_uuid(_uuid) is not None
+
+    before = time_it(lookup_by_scan, 1)
+    after = time_it(lookup_by_index, 3)
+    print_compare('Lookup %d uuid in 100k records' % len(uuids), before, after)
+
+    # The former upsert: a full pop() scan for each record. It's too slow to run all, so only a part of them.
+    updates = synthetic_records(5000, 's5_')
+    part = 50
+
+    table = {source: list(history.get_record_by_source(source)) for source in history.get_source_list()}
+
+    def upsert_by_scan():
+        # The former History.pop() on a copy of the records table
+        for record in updates[:part]:
+            for records in table.values():
+                i = 0
+                while i < len(records):
+                    if records[i].uuid() == record.uuid():
+                        records.pop(i)
+                    else:
+                        i += 1
+            table['source_5'].append(record)
+
+    @suppress_print
+    def upsert_by_index():
+        history.upsert_records('source_5', updates)
+
+    before = time_it(upsert_by_scan, 1) * len(updates) / part
+    after = time_it(upsert_by_index, 3)
+    print_compare('Upsert %d records to 100k records' % len(updates), before, after)
+
+
+def benchmark_label_tag_index():
+    history = History()
+    records = synthetic_records(100000)
+    for i in range(len(records)):
+        records[i].set_label_tags('people', ['people_%d' % (i % 5000), 'people_%d' % (i % 777)])
+        records[i].set_label_tags('location', 'location_%d' % (i % 300))
+    suppress_print(history.upsert_records)('source', records)
+
+    include_label_tags = {'people': ['people_12', 'people_345'], 'location': ['location_7']}
+    exclude_label_tags = {'location': ['location_45']}
+
+    def select_by_scan():
+        # The former History.select_records()
+        collection = history.filter(lambda _, r: r.filter(include_label_tags, False, exclude_label_tags, True))
+        return [item for sublist in collection.values() for item in sublist]
+
+    def select_by_index():
+        return history.select_records(include_label_tags=include_label_tags, include_all=False,
+                                      exclude_label_tags=exclude_label_tags, exclude_any=True)
+
+    assert select_by_scan() == select_by_index()
+    before = time_it(select_by_scan, 3)
+    after = time_it(select_by_index, 3)
+    print_compare('Select by label tags in 100k records', before, after)
+
+
+def benchmark_scroll_selection():
+    # Import here because viewer requires Qt
+    from viewer_ex import AxisItem, TimeThreadBase
+
+    random.seed(0)
+    periods = []
+    for _ in range(200000):
+        since = random.randint(-3000, 2000)
+        periods.append((since, since + random.choice([0, 0, 0, random.randint(1, 100)])))
+    windows = [(year * HistoryTime.TICK_YEAR, (year + 20) * HistoryTime.TICK_YEAR) for year in range(-3000, 2000, 25)]
+
+    thread = TimeThreadBase()
+    for since, until in periods:
+        item = AxisItem(None, {})
+        item.get_item_metrics().set_scale_range(since * HistoryTime.TICK_YEAR, until * HistoryTime.TICK_YEAR)
+        thread.add_axis_items(item)
+
+    def select_by_scan():
+        # The former TimeThreadBase.refresh()
+        for since, until in windows:
+            paint_items = []
+            for item in thread.get_axis_items():
+                item_since, item_until = item.get_item_metrics().get_scale_range()
+                if (item_since <= until) and (item_until >= since):
+                    paint_items.append(item)
+
+    def select_by_index():
+        for since, until in windows:
+            thread.select_axis_items(since, until)
+
+    thread.select_axis_items(0, 0)
+    before = time_it(select_by_scan, 1)
+    after = time_it(select_by_index, 3)
+    print_compare('Scroll %d steps over 200k items' % len(windows), before, after)
+
+    records = [HistoryRecord.from_payload(('%08d' % i, periods[i][0] * HistoryTime.TICK_YEAR,
+                                           periods[i][1] * HistoryTime.TICK_YEAR, 'event', 'source', ()))
+               for i in range(len(periods))]
+    history = History()
+    suppress_print(history.upsert_records)('source', records)
+    history.select_in_range(0, 0)
+
+    def history_by_scan():
+        for since, until in windows:
+            history.filter(lambda _, r: r.period_adapt(since, until))
+
+    def history_by_index():
+        for since, until in windows:
+            history.select_in_range(since, until)
+
+    before = time_it(history_by_scan, 1)
+    after = time_it(history_by_index, 3)
+    print_compare('History.select_in_range on 200k records', before, after)
+
+
+def benchmark_record_table():
+    # Import here because the record table requires numpy
+    from record_table import RecordTable
+
+    random.seed(0)
+    history = History()
+    for source in range(10):
+        records = []
+        for i in range(10000):
+            since = random.randint(-3000, 2000) * HistoryTime.TICK_YEAR
+            until = since + random.choice([0, random.randint(1, 100)]) * HistoryTime.TICK_YEAR
+            label_tags = (('people', ('people_%d' % (i % 5000),)), ('location', ('location_%d' % (i % 300),)))
+            records.append(HistoryRecord.from_payload(('%d_%08d' % (source, i), since, until, 'event',
+                                                       'source_%d' % source, label_tags)))
+        suppress_print(history.upsert_records)('source_%d' % source, records)
+
+    table = RecordTable.from_history(history)
+    century = HistoryTime.TICK_YEAR * 100
+
+    def report_by_loop():
+        counts = {}
+        ranges = {}
+        history.map(lambda s, r: counts.__setitem__(r.since() // century, counts.get(r.since() // century, 0) + 1))
+        for source in history.get_source_list():
+            records = history.get_record_by_source(source)
+            ranges[source] = (min(r.since() for r in records), max(r.until() for r in records))
+        collection = history.filter(lambda _, r: r.period_adapt(0, century) and
+                                    r.includes({'location': ['location_7', 'location_8']}))
+        return counts, ranges, collection
+
+    def report_by_table():
+        mask = table.select_in_range(0, century) & table.select_label_tags({'location': ['location_7', 'location_8']})
+        return table.count_by_period(century), table.time_range_by_source(), table.uuids_of(mask)
+
+    before = time_it(report_by_loop, 3)
+    after = time_it(report_by_table, 3)
+    print_compare('Report on 100k records (RecordTable)', before, after)
+
+
+def benchmark_compact_record():
+    files = depot_files()
+    repeat = 100
+
+    @suppress_print
+    def load_records() -> list:
+        records = []
+        for _ in range(repeat):
+            for source_records in HistoryRecordLoader.from_files(files).values():
+                records.extend(source_records)
+        return records
+
+    @suppress_print
+    def load_compact_records() -> list:
+        records = []
+        for _ in range(repeat):
+            for source_records in HistoryRecordLoader.from_files(files).values():
+                records.extend(CompactHistoryRecord.from_record(record, True) for record in source_records)
+        return records
+
+    before = retained_memory(load_records)
+    after = retained_memory(load_compact_records)
+    print('%-40s before: %8.2fMB, after: %8.2fMB, saved: %6.2f%%' %
+          ('Memory of depots x %d (compact record)' % repeat, before / 1e6, after / 1e6, 100 - after * 100 / before))
+
+
+def benchmark_time_text_cache():
+    files = depot_files()
+    cache = HistoryTime.get_time_text_cache()
+    max_size = cache.max_size()
+
+    @suppress_print
+    def load_all():
+        return HistoryRecordLoader.from_files(files)
+
+    try:
+        HistoryTime.set_time_text_cache_size(0)
+        before = time_it(load_all, 3)
+        HistoryTime.set_time_text_cache_size(max_size)
+        cache.clear()
+        after = time_it(load_all, 3)
+        stats = cache.stats()
+        print_compare('Load depot files (time text cache)', before, after)
+        print('%-40s hits: %d, misses: %d, size: %d' % ('', stats['hits'], stats['misses'], stats['size']))
+    finally:
+        HistoryTime.set_time_text_cache_size(max_size)
+
+
+def depot_time_texts() -> [str]:
+    time_texts = []
+    for text in depot_texts():
+        parser = LabelTagParser()
+        parser.parse(text)
+        time_texts.extend(','.join(tags) for label, tags in parser.get_label_tags() if label == 'time')
+    return time_texts
+
+
+def benchmark_split_time_text():
+    time_texts = depot_time_texts()
+    legacy_split = getattr(HistoryTime, '__split_natural_language_time_text')
+
+    before = time_it(lambda: [legacy_split(text) for text in time_texts for _ in range(20)], 3)
+    after = time_it(lambda: [HistoryTime.split_time_text(text) for text in time_texts for _ in range(20)], 3)
+    print_compare('Split %d depot time texts x 20' % len(time_texts), before, after)
+
+
+def benchmark_time_str_recognizer():
+    sub_time_texts = [sub_text for text in depot_time_texts() for sub_text in HistoryTime.split_time_text(text)]
+
+    def strptime(text: str):
+        for f in HistoryTime.SUPPORT_DATE_TIME_STR_FORMAT:
+            try:
+                return datetime.datetime.strptime(text, f)
+            except Exception:
+                pass
+        return None
+
+    before = time_it(lambda: [strptime(text) for text in sub_time_texts for _ in range(20)], 3)
+    after = time_it(lambda: [HistoryTime.time_str_to_tick(text) for text in sub_time_texts for _ in range(20)], 3)
+    print_compare('Recognize %d depot time texts x 20' % len(sub_time_texts), before, after)
+
+
+def benchmark_year_start_table():
+    # Import here because the viewer requires PyQt5
+    from viewer_ex import TimeAxis, generate_scale_marks
+
+    scales = [TimeAxis.Scale((1000, 0, 0, 0, 0, 0), (100, 0, 0, 0, 0, 0), 0),
+              TimeAxis.Scale((100, 0, 0, 0, 0, 0), (10, 0, 0, 0, 0, 0), 0),
+              TimeAxis.Scale((10, 0, 0, 0, 0, 0), (1, 0, 0, 0, 0, 0), 0),
+              TimeAxis.Scale((1, 0, 0, 0, 0, 0), (0, 1, 0, 0, 0, 0), 0)]
+    since, until = HistoryTime.years_to_tick(-5000), HistoryTime.years_to_tick(2500)
+
+    def iterate_scales():
+        # The same as TimeAxis.paint_scale() except painting
+        for scale in scales:
+            paint_tick = scale.estimate_closest_scale(since)
+            while paint_tick < until:
+                next_paint_tick = scale.next_main_scale(paint_tick)
+                while paint_tick < next_paint_tick:
+                    paint_tick = scale.next_sub_scale(paint_tick)
+
+    try:
+        HistoryTime.clear_year_start_table()
+        before = time_it(iterate_scales, 3)
+        HistoryTime.build_year_start_table()
+        after = time_it(iterate_scales, 3)
+        print_compare('Iterate scales in 7500 years', before, after)
+    finally:
+        HistoryTime.clear_year_start_table()
+
+
+def benchmark_cn_num_to_arab():
+    from Utility import to_arab
+
+    sub_time_texts = [sub_text for text in depot_time_texts() for sub_text in HistoryTime.split_time_text(text)]
+    sub_time_texts = sub_time_texts * 20
+
+    def cn_num_to_digit(cn_num: str):
+        # The original implementation without cache
+        sum_num, unit_l1, unit_l2, unit_l2_max, digit_missing = 0, 1, 1, 0, False
+        num_chars = list(cn_num)
+        while num_chars:
+            num_char = num_chars.pop()
+            if num_char in to_arab.CN_UNIT_L1:
+                unit_l1 = to_arab.CN_UNIT_L1.get(num_char)
+                digit_missing = True
+            elif num_char in to_arab.CN_UNIT_L2:
+                unit = to_arab.CN_UNIT_L2.get(num_char)
+                if unit > unit_l2_max:
+                    unit_l2_max = unit
+                    unit_l2 = unit
+                else:
+                    unit_l2 *= unit
+                unit_l1 = 1
+                digit_missing = True
+            elif num_char in to_arab.CN_NUM:
+                sum_num += to_arab.CN_NUM.get(num_char) * unit_l1 * unit_l2
+                unit_l1 *= 10
+                digit_missing = False
+        if digit_missing:
+            sum_num += unit_l1 * unit_l2
+        return sum_num
+
+    def text_cn_num_to_arab(text: str) -> str:
+        match_text = list(set(to_arab.pattern.findall(text)))
+        match_text.sort(key=lambda x: len(x), reverse=True)
+        for cn_num in match_text:
+            text = text.replace(cn_num, str(cn_num_to_digit(cn_num)))
+        return text
+
+    before = time_it(lambda: [text_cn_num_to_arab(text) for text in sub_time_texts], 3)
+    after = time_it(lambda: to_arab.texts_cn_num_to_arab(sub_time_texts), 3)
+    print_compare('Arabize %d depot time texts' % len(sub_time_texts), before, after)
+
+
+def benchmark_period_overlap():
+    # Import here because the period algebra requires numpy
+    from Utility.period import Period, to_period_arrays, period_overlap_counts
+
+    random.seed(0)
+    periods = []
+    for _ in range(3000):
+        since = random.randint(-3000, 2000) * HistoryTime.TICK_YEAR
+        periods.append(Period(since, since + random.randint(0, 100) * HistoryTime.TICK_YEAR))
+
+    def count_by_pairs():
+        return [sum(1 for rhs in periods if rhs.overlaps(lhs)) - 1 for lhs in periods]
+
+    def count_by_sweep():
+        return period_overlap_counts(*to_period_arrays(periods))
+
+    before = time_it(count_by_pairs, 1)
+    after = time_it(count_by_sweep, 3)
+    print_compare('Count overlaps of 3000 periods', before, after)
+
+
+def benchmark_density_pyramid():
+    # Import here because viewer requires Qt
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtWidgets import QApplication
+    from viewer_ex import HistoryIndexTrack, AxisMetrics, LAYOUT_VERTICAL, ALIGN_RIGHT
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    random.seed(0)
+    records = []
+    for i in range(20000):
+        since = random.randint(-30000, 2000) * HistoryTime.TICK_YEAR
+        until = since + random.choice([0, 0, 0, random.randint(1, 300)]) * HistoryTime.TICK_YEAR
+        records.append(HistoryRecord.from_payload(('%08d' % i, since, until, 'event', 'source', ())))
+
+    track = HistoryIndexTrack()
+    track.set_thread_event_indexes({'source': records})
+    metrics = AxisMetrics()
+    metrics.set_layout(LAYOUT_VERTICAL)
+    metrics.set_align(ALIGN_RIGHT)
+    metrics.set_transverse_limit(0, 300)
+    metrics.set_longitudinal_range(0, 800)
+    metrics.set_scale_range(-40000 * HistoryTime.TICK_YEAR, 10000 * HistoryTime.TICK_YEAR)
+    track.set_thread_metrics(metrics)
+    image = QImage(300, 800, QImage.Format_RGB32)
+
+    def refresh_and_paint():
+        track.refresh()
+        qp = QPainter(image)
+        track.paint(qp)
+        qp.end()
+
+    density_scale_span = HistoryIndexTrack.DENSITY_SCALE_SPAN
+    try:
+        HistoryIndexTrack.DENSITY_SCALE_SPAN = HistoryTime.TICK_YEAR * 10000000
+        # The first refresh lays out all items. Exclude it.
+        track.refresh()
+        before = time_it(refresh_and_paint, 1)
+        HistoryIndexTrack.DENSITY_SCALE_SPAN = density_scale_span
+        after = time_it(refresh_and_paint, 3)
+        print_compare('Paint 20k records in 50000 years', before, after)
+    finally:
+        HistoryIndexTrack.DENSITY_SCALE_SPAN = density_scale_span
+
+
+def benchmark_candlestick_ingestion():
+    # Import here because candlestick requires Qt
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import numpy as np
+    import pandas as pd
+    from Utility.candlestick import CandlestickSeries, Candlestick
+
+    df = pd.read_csv(os.path.join('res', '000001.SSE.CSV'))
+
+    def build_by_rows():
+        upper = -(-np.nanmax(df['high']) // 1)
+        return [Candlestick(0, upper, HistoryTime.time_str_to_tick(row['trade_date']),
+                            row['open'], row['close'], row['high'], row['low']) for _, row in df.iterrows()]
+
+    before = time_it(build_by_rows, 1)
+    after = time_it(lambda: CandlestickSeries.from_csv(os.path.join('res', '000001.SSE.CSV')), 3)
+    print_compare('Load %d daily bars' % len(df), before, after)
+
+    # A decade of minute bars: 240 minutes per day, 250 days per year
+    days = pd.bdate_range('2010-01-01', periods=2500)
+    minutes = (days.values[:, None] + np.timedelta64(570, 'm') + np.arange(240) * np.timedelta64(1, 'm')).ravel()
+    prices = 3000 + np.cumsum(np.random.default_rng(0).normal(0, 1, len(minutes)))
+    minute_df = pd.DataFrame({'trade_date': pd.DatetimeIndex(minutes).strftime('%Y-%m-%d %H:%M:%S'),
+                              'open': prices, 'close': prices + 0.5, 'high': prices + 1, 'low': prices - 1})
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file = os.path.join(temp_dir, 'minutes.csv')
+        minute_df.to_csv(file, index=False)
+        elapsed = time_it(lambda: CandlestickSeries.from_csv(file), 3)
+    print('Load %d minute bars: %.3fs' % (len(minute_df), elapsed))
+
+
+def benchmark_candlestick_levels():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtGui import QImage, QPainter
+    from PyQt5.QtWidgets import QApplication
+    from Utility.candlestick import CandlestickSeries, AxisMetrics, LAYOUT_HORIZON
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    series = CandlestickSeries.from_csv(os.path.join('res', '000001.SSE.CSV'))
+    metrics = AxisMetrics()
+    metrics.set_layout(LAYOUT_HORIZON)
+    metrics.set_transverse_limit(0, 300)
+    metrics.set_longitudinal_range(0, 1000)
+    metrics.set_scale_range(HistoryTime.years_to_tick(1990), HistoryTime.years_to_tick(2021))
+    series.arrange_item(metrics)
+    series.get_levels()
+    image = QImage(1000, 300, QImage.Format_RGB32)
+
+    def paint():
+        qp = QPainter(image)
+        series.paint(qp)
+        qp.end()
+
+    min_bar_pixel = CandlestickSeries.MIN_BAR_PIXEL
+    try:
+        CandlestickSeries.MIN_BAR_PIXEL = 0
+        before = time_it(paint, 3)
+        CandlestickSeries.MIN_BAR_PIXEL = min_bar_pixel
+        after = time_it(paint, 3)
+        print_compare('Paint 30 years of daily bars', before, after)
+    finally:
+        CandlestickSeries.MIN_BAR_PIXEL = min_bar_pixel
+
+
+def benchmark_track_layout():
+    from viewer_ex import layout_track_items_by_scan
+
+    track = synthetic_thread(20000, True)
+    track_count = len(track._HistoryIndexTrack__thread_tracks)
+    before = time_it(lambda: layout_track_items_by_scan(track), 1)
+    after = time_it(track._HistoryIndexTrack__layout_track_items, 3)
+    print_compare('Layout 20k records on %d tracks' % track_count, before, after)
+
+    track = synthetic_thread(50000, True)
+    elapsed = time_it(track._HistoryIndexTrack__layout_track_items, 3)
+    print('Layout 50k records: %.3fs' % elapsed)
+
+
+def benchmark_incremental_layout():
+    track = synthetic_thread(20000, True)
+    records = track.get_all_index_items()
+
+    random.seed(0)
+    edits = []
+    for i in range(100):
+        since = random.randint(-3000, 2000) * HistoryTime.TICK_YEAR
+        until = since + random.choice([0, random.randint(1, 300)]) * HistoryTime.TICK_YEAR
+        edits.append(HistoryRecord.from_payload(('%08d' % random.randrange(20000), since, until, 'event', 'source', ())))
+
+    before = time_it(lambda: track.set_thread_event_indexes({'source': records}), 1)
+    after = time_it(lambda: [track.update_thread_event_indexes({'source': [edit]}) for edit in edits], 1) / len(edits)
+    print_compare('Edit 1 record in 20k records', before, after)
+
+
+def benchmark_tile_cache():
+    from PyQt5.QtCore import QPoint
+    from viewer_ex import TimeAxis
+
+    thread = synthetic_thread(100000)
+    axis = TimeAxis()
+    axis.add_history_thread(thread)
+    axis.resize(1000, 800)
+    axis.show()
+
+    def hover():
+        for i in range(20):
+            axis.on_pos_updated(QPoint(300 + i, 300 + i))
+            axis.grab()
+
+    def scroll():
+        for i in range(30):
+            axis.offset_scroll(20)
+            axis.grab()
+
+    results = []
+    for enable in [False, True]:
+        axis.enable_tile_cache(enable)
+        axis.grab()
+        axis.on_pos_updated(QPoint(0, 0))
+        results.append((time_it(hover, 1) / 20, time_it(scroll, 1) / 30))
+    print_compare('Hover frame with 100k records', results[0][0], results[1][0])
+    print_compare('Scroll frame with 100k records', results[0][1], results[1][1])
+
+
+def benchmark_scale_marks():
+    # Import here because the viewer requires PyQt5
+    from viewer_ex import TimeAxis, generate_scale_marks
+
+    scales = [TimeAxis.STEP_LIST[20], TimeAxis.STEP_LIST[40], TimeAxis.STEP_LIST[-3]]
+    frames = 300
+
+    def frame_ranges(scale) -> [(int, int)]:
+        # Scroll a page of 10 main marks by 1/20 page each frame
+        page = scale.rough_offset_tick() * 10
+        since = HistoryTime.years_to_tick(1900)
+        return [(since + page * i // 20, since + page * i // 20 + page) for i in range(frames)]
+
+    def before():
+        for scale in scales:
+            for since, until in frame_ranges(scale):
+                generate_scale_marks(scale, since, until)
+
+    def after():
+        for scale in scales:
+            scale_marks = TimeAxis.ScaleMarks(scale)
+            for since, until in frame_ranges(scale):
+                lower, upper = scale_marks.select(since, until)
+                list(zip(scale_marks.ticks[lower:upper], scale_marks.texts[lower:upper]))
+
+    print_compare('Scale marks of %d scrolling frames' % (frames * len(scales)), time_it(before, 3), time_it(after, 3))
+
+
+def benchmark_hit_test():
+    from PyQt5.QtCore import QPoint
+    from viewer_ex import TimeAxis
+
+    random.seed(0)
+    for count in [10000, 100000]:
+        thread = synthetic_thread(count)
+        axis = TimeAxis()
+        axis.add_history_thread(thread)
+        axis.resize(1000, 800)
+        axis.show()
+        axis.grab()
+        axis.axis_item_from_point(QPoint(0, 0))
+
+        points = [QPoint(random.randint(0, 999), random.randint(0, 799)) for _ in range(200)]
+
+        def before():
+            # The same as TimeThreadBase.axis_item_from_point() before the grid
+            for point in points:
+                if thread.get_thread_metrics().contains(point):
+                    for item in thread.get_axis_items():
+                        if item.get_item_metrics().contains(point):
+                            break
+
+        def after():
+            for point in points:
+                axis.axis_item_from_point(point)
+
+        print_compare('Hover hit test with %dk records' % (count // 1000),
+                      time_it(before, 1) / len(points), time_it(after, 3) / len(points))
+
+
+def benchmark_array_tick_conversion():
+    import numpy as np
+
+    random.seed(0)
+    ticks = [random.randint(-HistoryTime.TICK_YEAR * 5000, HistoryTime.TICK_YEAR * 2500) for _ in range(100000)]
+    array_ticks = np.array(ticks, dtype=np.int64)
+    date_times = [HistoryTime.tick_to_date_time_data(tick) for tick in ticks]
+    date_columns = [np.array(column, dtype=np.int64) for column in zip(*date_times)]
+
+    before = time_it(lambda: [HistoryTime.tick_to_date_time_data(tick) for tick in ticks], 3)
+    after = time_it(lambda: HistoryTime.ticks_to_dates(array_ticks), 3)
+    print_compare('100k ticks to dates (array)', before, after)
+
+    before = time_it(lambda: [HistoryTime.date_time_data_to_tick(*date_time) for date_time in date_times], 3)
+    after = time_it(lambda: HistoryTime.dates_to_ticks(*date_columns), 3)
+    print_compare('100k dates to ticks (array)', before, after)
+
+
+# ----------------------------------------------------- File Entry -----------------------------------------------------
+
+def main():
+    benchmark_tokenizer()
+    benchmark_parse_diagnostics()
+    benchmark_iter_file()
+    benchmark_parallel_loading()
+    benchmark_record_cache()
+    benchmark_uuid_index()
+    benchmark_label_tag_index()
+    benchmark_scroll_selection()
+    benchmark_record_table()
+    benchmark_compact_record()
+    benchmark_array_tick_conversion()
+    benchmark_time_text_cache()
+    benchmark_split_time_text()
+    benchmark_time_str_recognizer()
+    benchmark_year_start_table()
+    benchmark_cn_num_to_arab()
+    benchmark_period_overlap()
+    benchmark_density_pyramid()
+    benchmark_candlestick_ingestion()
+    benchmark_candlestick_levels()
+    benchmark_track_layout()
+    benchmark_incremental_layout()
+    benchmark_tile_cache()
+    benchmark_scale_marks()
+    benchmark_hit_test()
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def exception_hook(type, value, tback):
+    # log the exception here
+    print('Exception hook triggered.')
+    print(type)
+    print(value)
+    print(tback)
+    # then call the default handler
+    sys.__excepthook__(type, value, tback)
+
+
+if __name__ == "__main__":
+    sys.excepthook = exception_hook
+    try:
+        main()
+    except Exception as e:
+        print('Error =>', e)
+        print('Error =>', traceback.format_exc())
+        exit()
+    finally:
+        pass
@@ -1,7 +1,12 @@
+import io
 import os
+import re
 import sys
 import uuid
+import pickle
 import ntpath
+import hashlib
+import concurrent.futures
 
 import requests
 import posixpath
@@ -9,6 +14,7 @@ from os import path
 
 from Utility.history_public import *
 from Utility import HistoryTime
+from Utility.interval_index import IntervalIndex
 
 sys.path.append(path.dirname(__file__))
 
@@ -41,7 +47,7 @@ class TokenParser:
         self.__wrapper_index = -1
 
     # ========================================== Config parser ==========================================
-    @suppress_print
+
     def config(self, tokens: list, wrappers: list, escape_symbols: list):
         """
         Function to set tokens, wrappers and escape symbols.
@@ -147,6 +153,16 @@ class TokenParser:
         self.__mark_idx = self.__parse_idx
         return slice_str
 
+    def parse_index(self) -> int:
+        return self.__parse_idx
+
+    def location(self, index: int) -> (int, int):
+        """
+        Get the (line, column) of the text index. Both of them start from 1.
+        """
+        line_start = self.__text.rfind('\n', 0, index) + 1
+        return self.__text.count('\n', 0, index) + 1, index - line_start + 1
+
     # ========================================== Sub Check ==========================================
 
     def __check_meet_token(self) -> str:
@@ -170,6 +186,322 @@ class TokenParser:
         return False
 
 
+# ------------------------------------------------ Compiled Token Parser -----------------------------------------------
+
+class CompiledTokenParser:
+    """
+    The same tokenizer as TokenParser, but it jumps over the plain text instead of stepping char by char:
+        Out of wrapper: One precompiled regex (tokens in config order) finds the next token.
+        In wrapper: str.find() looks for the close symbol of the wrapper.
+
+    The token stream is exactly the same as TokenParser's (including its behaviour at the end of text).
+    See test_compiled_token_parser_*() for the consistency check.
+
+    The text can also be a stream (see attach_stream()). In that case only a window of the text is kept in buffer:
+        The buffer is filled by chunk when a token or a close symbol may cross the end of buffer.
+        The text before the current yield (except the length of escape symbols) is dropped when filling buffer.
+    parse_index() and location() always refer to the index of the whole text.
+    """
+    def __init__(self):
+        self.__text = ''
+        self.__tokens = []
+        self.__wrappers = []                  # [(start, close)]
+        self.__space_tokens = [' ']
+        self.__escape_symbols = ['\\']
+
+        self.__token_pattern = None
+        self.__wrapper_starts = {}            # {start: wrapper index}
+        self.__max_token_len = 1
+        self.__max_escape_len = 1
+
+        self.__mark_idx = 0
+        self.__parse_idx = 0
+
+        self.__stream = None
+        self.__chunk_size = 0
+        self.__stream_end = True
+        self.__dropped_len = 0                # The length of text that has been dropped from buffer
+        self.__dropped_lines = 0              # The count of '\n' in the dropped text
+        self.__dropped_line_start = 0         # The index of the last line start in the dropped text
+
+        self.__meet_token = ''
+
+        self.__in_wrapper = False
+        self.__wrapper_index = -1
+
+    # ========================================== Config parser ==========================================
+
+    def config(self, tokens: list, wrappers: list, escape_symbols: list):
+        """
+        Function to set tokens, wrappers and escape symbols. The token regex is compiled here.
+        """
+        self.__tokens = list(tokens)
+        self.__wrappers = wrappers
+        self.__escape_symbols = escape_symbols
+
+        for wrapper in wrappers:
+            if not isinstance(wrapper, (list, tuple)) or len(wrapper) != 2:
+                print('! Error wrapper format. Its format should be: [(start, close)], ...')
+            for token in wrapper:
+                if token not in self.__tokens:
+                    self.__tokens.append(token)
+
+        # The first wrapper that starts with the token wins, the same as TokenParser.__check_meet_token()
+        self.__wrapper_starts = {}
+        for index in range(len(wrappers)):
+            self.__wrapper_starts.setdefault(wrappers[index][0], index)
+
+        # Regex alternation keeps the config order, so the first token in list wins at the same position.
+        self.__token_pattern = re.compile('|'.join(re.escape(token) for token in self.__tokens if token != ''))
+        self.__max_token_len = max([len(token) for token in self.__tokens] + [1])
+        self.__max_escape_len = max([len(symbol) for symbol in self.__escape_symbols] + [1])
+
+    def reset(self):
+        """
+        Reset parse context (start over).
+        """
+        self.__mark_idx = 0
+        self.__parse_idx = 0
+
+        self.__in_wrapper = False
+        self.__wrapper_index = -1
+
+    def attach(self, text: str):
+        """
+        Set the text to parse.
+        """
+        self.__text = text
+        self.__mark_idx = 0
+        self.__parse_idx = 0
+        self.__detach_stream()
+
+    def attach_stream(self, stream, chunk_size: int = 64 * 1024):
+        """
+        Set the stream to parse. The text is read by stream.read(chunk_size) on demand.
+        :param stream: Any object that has read(size) -> str, like the file opened in text mode.
+        :param chunk_size: The count of chars to read each time.
+        """
+        self.attach('')
+        self.__stream = stream
+        self.__chunk_size = max(chunk_size, 1)
+        self.__stream_end = False
+
+    # ========================================== Parse ==========================================
+
+    def next_token(self) -> str:
+        """
+        Yield the next token. Update parse context.
+        """
+        while not self.reaches_end():
+            if self.__meet_token != '':
+                token = self.__meet_token
+                self.__meet_token = ''
+                self.offset(len(token))
+                if token not in self.__space_tokens:
+                    break
+                else:
+                    self.yield_str()
+                    continue
+            elif self.__in_wrapper:
+                expect_close = self.__wrappers[self.__wrapper_index][1]
+                if not self.__jump_to_close(expect_close):
+                    break
+                if not self.__check_escape_symbol():
+                    self.__in_wrapper = False
+                    self.__meet_token = expect_close
+                    break
+                self.offset(1)
+            else:
+                if self.__jump_to_token():
+                    break
+        return self.yield_str() if self.yield_len() > 0 or self.reaches_end() else self.next_token()
+
+    # ========================================== Text processing ==========================================
+
+    def source_len(self) -> int:
+        return len(self.__text)
+
+    def reaches_end(self, offset: int = 0) -> bool:
+        while self.__parse_idx + offset >= self.source_len():
+            if not self.__fill_buffer():
+                return True
+        return False
+
+    def offset(self, offset):
+        self.__parse_idx += offset
+        if self.__parse_idx < 0:
+            self.__parse_idx = 0
+        elif self.__parse_idx > self.source_len():
+            self.__parse_idx = self.source_len()
+
+    def yield_len(self) -> int:
+        return self.__parse_idx - self.__mark_idx
+
+    def yield_str(self) -> str:
+        slice_str = self.__text[self.__mark_idx: self.__parse_idx]
+        self.__mark_idx = self.__parse_idx
+        return slice_str
+
+    def parse_index(self) -> int:
+        return self.__dropped_len + self.__parse_idx
+
+    def location(self, index: int) -> (int, int):
+        """
+        Get the (line, column) of the text index. Both of them start from 1.
+        For stream, the index should not be before the current yield.
+        """
+        index = max(index - self.__dropped_len, 0)
+        line = self.__dropped_lines + self.__text.count('\n', 0, index) + 1
+        line_start = self.__text.rfind('\n', 0, index) + 1
+        if line_start == 0:
+            return line, self.__dropped_len + index - self.__dropped_line_start + 1
+        return line, index - line_start + 1
+
+    # ========================================== Stream ==========================================
+
+    def __detach_stream(self):
+        self.__stream = None
+        self.__stream_end = True
+        self.__dropped_len = 0
+        self.__dropped_lines = 0
+        self.__dropped_line_start = 0
+
+    def __fill_buffer(self) -> bool:
+        """
+        Read the next chunk from stream to the buffer. The text that has been yielded is dropped,
+        except the chars that __check_escape_symbol() may look back.
+        :return: True if any text is read else False
+        """
+        if self.__stream_end:
+            return False
+        chunk = self.__stream.read(self.__chunk_size)
+        if not chunk:
+            self.__stream_end = True
+            return False
+
+        drop = max(self.__mark_idx - self.__max_escape_len, 0)
+        if drop > 0:
+            dropped = self.__text[:drop]
+            line_feeds = dropped.count('\n')
+            if line_feeds > 0:
+                self.__dropped_lines += line_feeds
+                self.__dropped_line_start = self.__dropped_len + dropped.rfind('\n') + 1
+            self.__dropped_len += drop
+            self.__mark_idx -= drop
+            self.__parse_idx -= drop
+        self.__text = self.__text[drop:] + chunk
+        return True
+
+    # ========================================== Sub Check ==========================================
+
+    def __jump_to_token(self) -> bool:
+        """
+        Move parse index to the next token. Move to the end of text if there's no more token.
+        :return: True if meets a token else False
+        """
+        search_idx = self.__parse_idx
+        while True:
+            match = self.__token_pattern.search(self.__text, search_idx)
+            if match is not None and match.start() + self.__max_token_len <= self.source_len():
+                break
+            # A token may cross the end of buffer. Read more and search again from where it may start.
+            if match is not None:
+                resume_idx = match.start()
+            else:
+                resume_idx = max(self.source_len() - self.__max_token_len + 1, search_idx)
+            resume_idx += self.__dropped_len
+            if not self.__fill_buffer():
+                break
+            search_idx = resume_idx - self.__dropped_len
+        if match is None:
+            self.__parse_idx = self.source_len()
+            return False
+        token = match.group()
+        self.__parse_idx = match.start()
+        self.__meet_token = token
+        self.__wrapper_index = self.__wrapper_starts.get(token, len(self.__wrappers))
+        self.__in_wrapper = token in self.__wrapper_starts
+        return True
+
+    def __jump_to_close(self, close: str) -> bool:
+        """
+        Move parse index to the close symbol of wrapper.
+        Like TokenParser.offset_until(), the close symbol that ends exactly at the end of text is not counted.
+        :return: True if the close symbol is found else False (parse index moves to the end of text).
+        """
+        search_idx = self.__parse_idx
+        while True:
+            close_idx = self.__text.find(close, search_idx, self.source_len() - 1)
+            if close_idx >= 0:
+                break
+            # The close symbol may cross the end of buffer, or the end of buffer is not the end of text.
+            resume_idx = self.__dropped_len + max(self.source_len() - len(close), search_idx)
+            if not self.__fill_buffer():
+                break
+            search_idx = resume_idx - self.__dropped_len
+        if close_idx < 0:
+            self.__parse_idx = self.source_len()
+            return False
+        self.__parse_idx = close_idx
+        return True
+
+    def __check_escape_symbol(self) -> bool:
+        for symbol in self.__escape_symbols:
+            symbol_idx = self.__parse_idx - len(symbol)
+            if symbol_idx >= 0 and self.__text[symbol_idx: self.__parse_idx] == symbol:
+                return True
+        return False
+
+
+# -------------------------------------------------- Parse Diagnostics -------------------------------------------------
+
+class ParseDiagnostics:
+    """
+    The level-gated diagnostics channel of LabelTagParser.
+
+    Errors are always collected as (line, column, message), both line and column start from 1.
+    The handler(level, message, line, column) is called for each message whose level <= the diagnostics level.
+    Trace messages are only formatted when the level is LEVEL_TRACE, so it costs nothing by default.
+    """
+
+    LEVEL_SILENT = 0
+    LEVEL_ERROR = 1
+    LEVEL_TRACE = 2
+
+    def __init__(self, level: int = LEVEL_ERROR, handler=None):
+        self.__level = level
+        self.__handler = handler
+        self.__errors = []
+
+    def get_level(self) -> int:
+        return self.__level
+
+    def get_errors(self) -> [(int, int, str)]:
+        return self.__errors
+
+    def trace_enabled(self) -> bool:
+        return self.__level >= ParseDiagnostics.LEVEL_TRACE
+
+    def error(self, line: int, column: int, message: str):
+        self.__errors.append((line, column, message))
+        if self.__handler is not None and self.__level >= ParseDiagnostics.LEVEL_ERROR:
+            self.__handler(ParseDiagnostics.LEVEL_ERROR, message, line, column)
+
+    def trace(self, message: str):
+        if self.__handler is not None and self.__level >= ParseDiagnostics.LEVEL_TRACE:
+            self.__handler(ParseDiagnostics.LEVEL_TRACE, message, 0, 0)
+
+    def reset(self):
+        self.__errors.clear()
+
+    @staticmethod
+    def print_handler(level: int, message: str, line: int, column: int):
+        if level == ParseDiagnostics.LEVEL_ERROR:
+            print('! %s (line %d, column %d)' % (message, line, column))
+        else:
+            print(message)
+
+
 # ---------------------------------------------------- Token Parser ----------------------------------------------------
 
 LABEL_TAG_TOKENS = [':', ',', ';', '#', '"""', '\n', ' ']
@@ -190,30 +522,79 @@ class LabelTagParser:
           label1: [tag5, tag6, tag7],
           label1: [tag8, tag9],
       }
+
+    Parse errors are reported to the ParseDiagnostics with line and column, see get_parse_errors().
+
+    Use iter_parse() to parse a stream. It yields (label, tags) one by one instead of keeping them all.
     """
-    def __init__(self):
-        self.__last_tags = []
+    def __init__(self, compiled_tokenizer: bool = True, diagnostics: ParseDiagnostics = None):
         self.__label_tags = []
+        self.__compiled_tokenizer = compiled_tokenizer
+        self.__diagnostics = diagnostics if diagnostics is not None else ParseDiagnostics()
 
     def get_label_tags(self) -> list:
         return self.__label_tags
 
-    @suppress_print
+    def get_diagnostics(self) -> ParseDiagnostics:
+        return self.__diagnostics
+
+    def get_parse_errors(self) -> [(int, int, str)]:
+        return self.__diagnostics.get_errors()
+
     def parse(self, text: str) -> bool:
-        parser = TokenParser()
+        self.__diagnostics.reset()
+        parser = CompiledTokenParser() if self.__compiled_tokenizer else TokenParser()
         parser.config(LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
         parser.reset()
         parser.attach(text)
 
+        label_tags = self.__parse_label_tags(parser)
+        while True:
+            try:
+                self.__label_tags.append(next(label_tags))
+            except StopIteration as e:
+                return e.value
+
+    def iter_parse(self, stream, chunk_size: int = 64 * 1024):
+        """
+        Parse the text from stream and yield (label, tags) when the tags of label are complete.
+        The yielded label tags are not kept by this parser (get_label_tags() will not include them).
+        :param stream: Any object that has read(size) -> str, like the file opened in text mode.
+        :param chunk_size: The count of chars to read each time.
+        :return: Generator of (label, [tags])
+        """
+        self.__diagnostics.reset()
+        if self.__compiled_tokenizer:
+            parser = CompiledTokenParser()
+            parser.config(LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
+            parser.reset()
+            parser.attach_stream(stream, chunk_size)
+        else:
+            parser = TokenParser()
+            parser.config(LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
+            parser.reset()
+            parser.attach(stream.read())
+        yield from self.__parse_label_tags(parser)
+
+    def __parse_label_tags(self, parser) -> bool:
+        """
+        Generator of (label, tags) from the tokens of parser. A label is yielded when the next label starts or text ends.
+        :return: The return value of generator (StopIteration.value) is False if there's any error else True.
+        """
+        diagnostics = self.__diagnostics
+        trace = diagnostics.trace_enabled()
+
         ret = True
         until = ''
         expect = []
         next_step = 'label'
+        label_tags = None
 
         while not parser.reaches_end():
             token = parser.next_token()
 
-            print('-> Read token: ' + token)
+            if trace:
+                diagnostics.trace('-> Read token: ' + token)
 
             if until != '':
                 if token == until:
@@ -222,35 +603,35 @@ class LabelTagParser:
             elif len(expect) > 0:
                 if token not in expect:
                     ret = False
-                    print('! Expect token: ' + str(expect) + ' but met: ' + token)
+                    line, column = parser.location(parser.parse_index() - len(token))
+                    diagnostics.error(line, column, 'Expect token: ' + str(expect) + ' but met: ' + token)
                 expect = []
 
             if token == '#':
                 until = '\n'
             elif token in [':', ',', '"""']:
-                print('Drop token: ' + token)
+                if trace:
+                    diagnostics.trace('Drop token: ' + token)
 
             elif token == '\n' or token == ';':
                 next_step = 'label'
             elif next_step == 'label':
                 expect = [':', ';']
                 next_step = 'tag'
-                self.switch_label(token)
+                if label_tags is not None:
+                    yield label_tags
+                label_tags = (token, [])
             elif next_step == 'tag':
                 expect = [',', '\n', '"""', ';']
-                self.append_tag(token)
+                if label_tags is not None and token not in label_tags[1]:
+                    label_tags[1].append(token)
             else:
-                print('Should not reach here.')
+                line, column = parser.location(parser.parse_index())
+                diagnostics.error(line, column, 'Should not reach here.')
+        if label_tags is not None:
+            yield label_tags
         return ret
 
-    def switch_label(self, label: str):
-        self.__last_tags = []
-        self.__label_tags.append((label, self.__last_tags))
-
-    def append_tag(self, tag: str):
-        if self.__last_tags is not None and tag not in self.__last_tags:
-            self.__last_tags.append(tag)
-
     @staticmethod
     def label_tags_to_text(label: str, tags, new_line: str = '\n'):
         if label is None or len(label) == 0:
@@ -513,6 +894,21 @@ class HistoryRecord(LabelTag):
             return
         super(HistoryRecord, self).add_tags(label, tags)
 
+    def dump_payload(self) -> tuple:
+        """
+        Dump the record to a compact and picklable tuple. Use HistoryRecord.from_payload() to restore it.
+        """
+        label_tags = tuple((label, tuple(tags)) for label, tags in self.get_label_tags().items())
+        return self.__uuid, self.__since, self.__until, self.__focus_label, self.__record_source, label_tags
+
+    @staticmethod
+    def from_payload(payload: tuple):
+        record = HistoryRecord()
+        record.__uuid, record.__since, record.__until, record.__focus_label, record.__record_source, label_tags = \
+            payload
+        record.attach(label_tags)
+        return record
+
     def to_index(self):
         record = HistoryRecord()
         record.index_for(self)
@@ -710,6 +1106,333 @@ class HistoryRecord(LabelTag):
                 '---------------------------------------------------------------------------'
 
 
+# -------------------------------------------- class CompactHistoryRecord ----------------------------------------------
+
+class CompactHistoryRecord:
+    """
+    The memory-lean and read-only version of HistoryRecord for keeping a large amount of records:
+        __slots__ instead of per-instance __dict__.
+        Labels, focus label, source and short tags are interned, so the same strings are shared by all records.
+        Label tags are stored as a tuple of (label, (tags)) instead of a dict of lists.
+        The uuid can be stored as 16 bytes if binary_uuid is True and it's a standard uuid string.
+
+    It keeps the read API of HistoryRecord (uuid(), since(), get_tags(), includes(), dump_record(), ...).
+    Use to_record() to get a HistoryRecord for editing.
+    """
+
+    __slots__ = ('__uuid', '__since', '__until', '__focus_label', '__record_source', '__label_tags')
+
+    INTERN_TAG_LENGTH = 32
+
+    def __init__(self, payload: tuple, binary_uuid: bool = False):
+        """
+        :param payload: The same as HistoryRecord.dump_payload()
+        :param binary_uuid: Store the uuid as 16 bytes if possible
+        """
+        _uuid, since, until, focus_label, record_source, label_tags = payload
+        self.__uuid = CompactHistoryRecord.__pack_uuid(_uuid) if binary_uuid else _uuid
+        self.__since = since
+        self.__until = until
+        self.__focus_label = sys.intern(focus_label)
+        self.__record_source = sys.intern(record_source)
+        self.__label_tags = tuple((sys.intern(label), tuple(CompactHistoryRecord.__intern_tag(tag) for tag in tags))
+                                  for label, tags in label_tags)
+
+    @staticmethod
+    def from_record(record: HistoryRecord, binary_uuid: bool = False):
+        return CompactHistoryRecord(record.dump_payload(), binary_uuid)
+
+    def to_record(self) -> HistoryRecord:
+        return HistoryRecord.from_payload(self.dump_payload())
+
+    def dump_payload(self) -> tuple:
+        return self.uuid(), self.__since, self.__until, self.__focus_label, self.__record_source, self.__label_tags
+
+    # ------------------------------------------------------ Gets ------------------------------------------------------
+
+    def uuid(self) -> str:
+        return str(uuid.UUID(bytes=self.__uuid)) if isinstance(self.__uuid, bytes) else self.__uuid
+
+    def since(self) -> HistoryTime.TICK:
+        return self.__since
+
+    def until(self) -> HistoryTime.TICK:
+        return self.__until
+
+    def source(self) -> str:
+        return self.__record_source
+
+    def get_focus_label(self) -> str:
+        return self.__focus_label
+
+    def get_tags(self, label: str) -> (str,):
+        for _label, tags in self.__label_tags:
+            if _label == label:
+                return tags
+        return ()
+
+    def get_labels(self) -> [str]:
+        return [label for label, _ in self.__label_tags]
+
+    def get_label_tags(self) -> dict:
+        return dict(self.__label_tags)
+
+    def time(self) -> (str,):
+        return self.get_tags('time')
+
+    def people(self) -> (str,):
+        return self.get_tags('people')
+
+    def location(self) -> (str,):
+        return self.get_tags('location')
+
+    def organization(self) -> (str,):
+        return self.get_tags('organization')
+
+    def title(self) -> (str,):
+        return self.get_tags('title')
+
+    def brief(self) -> (str,):
+        return self.get_tags('brief')
+
+    def event(self) -> (str,):
+        return self.get_tags('event')
+
+    # ---------------------------------------------------- Features ----------------------------------------------------
+
+    def is_label_empty(self, label: str) -> bool:
+        return LabelTagParser.tags_to_text(self.get_tags(label)) == ''
+
+    def filter(self,
+               include_label_tags: dict, include_all: bool = True,
+               exclude_label_tags: dict = None, exclude_any: bool = True) -> bool:
+        if include_label_tags is not None and len(include_label_tags) > 0 and \
+                not self.includes(include_label_tags, include_all):
+            return False
+        if exclude_label_tags is not None and len(exclude_label_tags) > 0 and \
+                self.includes(exclude_label_tags, not exclude_any):
+            return False
+        return True
+
+    def includes(self, label_tag_dict: dict, include_all: bool = False):
+        # The same as LabelTag.includes()
+        label_tags = dict(self.__label_tags)
+        result = False
+        for key in label_tag_dict:
+            if key not in label_tags:
+                if include_all:
+                    return False
+                else:
+                    continue
+            expect_tags = label_tag_dict[key]
+            exists_tags = label_tags[key]
+            for expect_tag in expect_tags:
+                if expect_tag not in exists_tags:
+                    if include_all:
+                        return False
+                else:
+                    if include_all:
+                        result = True
+                    else:
+                        return True
+        return result
+
+    def period_adapt(self, since: float, until: float):
+        return (self.__since <= until) and (self.__until >= since)
+
+    def to_index(self):
+        return CompactHistoryRecord.from_record(self.to_record().to_index(), isinstance(self.__uuid, bytes))
+
+    def dump_record(self, compact: bool = False) -> str:
+        return self.to_record().dump_record(compact)
+
+    def __str__(self):
+        return str(self.to_record())
+
+    @staticmethod
+    def __intern_tag(tag: str) -> str:
+        # Short tags like people, location and time are shared by many records. Long texts are rarely the same.
+        return sys.intern(tag) if isinstance(tag, str) and len(tag) <= CompactHistoryRecord.INTERN_TAG_LENGTH else tag
+
+    @staticmethod
+    def __pack_uuid(_uuid: str) -> str or bytes:
+        try:
+            uuid_bytes = uuid.UUID(_uuid).bytes
+        except (ValueError, TypeError, AttributeError):
+            return _uuid
+        # Only the standard format can be restored as the same string.
+        return uuid_bytes if str(uuid.UUID(bytes=uuid_bytes)) == _uuid else _uuid
+
+
+# ---------------------------------------------- class HistoryRecordCache ----------------------------------------------
+
+class HistoryRecordCache:
+    """
+    On-disk cache of the parsed records of local files. So the unchanged file can be loaded without parsing.
+
+    Each file has one entry in cache directory. The entry is pickled (version, path, size, mtime, hash, payloads):
+        size and mtime: The file is treated as unchanged if both of them match, without reading the file.
+        hash: If mtime changes but size not, the sha1 of file content decides whether the entry is still valid.
+        payloads: The HistoryRecord.dump_payload() of the records.
+
+    The mtime of entry file is updated when it's hit. The least recently used entries are removed if the total size
+    of entries exceeds the max size. The cache is used by one process: HistoryRecordLoader.from_files() loads and
+    stores the entries in the calling process, the worker processes only parse.
+    """
+
+    VERSION = 1
+    ENTRY_SUFFIX = '.rcache'
+    DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_SIZE):
+        self.__cache_dir = cache_dir if cache_dir is not None else HistoryRecordCache.get_default_cache_dir()
+        self.__max_size = max_size
+
+    def get_cache_dir(self) -> str:
+        return self.__cache_dir
+
+    def get_max_size(self) -> int:
+        return self.__max_size
+
+    def load(self, file: str) -> [HistoryRecord] or None:
+        """
+        Load the records of file from cache.
+        :return: The records list. None if the file is not cached or the cache is invalid.
+        """
+        entry_path = self.__entry_path(file)
+        if not path.isfile(entry_path):
+            return None
+        try:
+            stat = os.stat(file)
+            with open(entry_path, 'rb') as f:
+                version, file_path, size, mtime, digest, payloads = pickle.load(f)
+        except Exception as e:
+            print('Cache entry invalid: ' + str(e))
+            self.__remove_entry(entry_path)
+            return None
+
+        if version != HistoryRecordCache.VERSION or file_path != path.abspath(file) or size != stat.st_size:
+            return None
+        if mtime != stat.st_mtime_ns:
+            content = HistoryRecordCache.__read_content(file)
+            if HistoryRecordCache.content_hash(content) != digest:
+                return None
+            self.__write_entry(file, stat, digest, payloads)
+        else:
+            try:
+                os.utime(entry_path)
+            except OSError:
+                pass
+        return [HistoryRecord.from_payload(payload) for payload in payloads]
+
+    def store(self, file: str, records: [HistoryRecord], digest: str = None, stat=None, evict: bool = True):
+        """
+        Store the records of file to cache. Then remove the least recently used entries if it exceeds the max size.
+        :param digest: The content_hash() of file. Give it if the file is just read, so it's not read again.
+        :param stat: The os.stat() of file when it's read. None to stat it now.
+        :param evict: False to store a batch of files and call evict() once after them.
+        """
+        self.store_payloads(file, [record.dump_payload() for record in records], digest, stat, evict)
+
+    def store_payloads(self, file: str, payloads: [tuple], digest: str = None, stat=None, evict: bool = True):
+        """
+        The same as store() but the records are given by HistoryRecord.dump_payload().
+        """
+        try:
+            if stat is None:
+                stat = os.stat(file)
+            if digest is None:
+                digest = HistoryRecordCache.content_hash(HistoryRecordCache.__read_content(file))
+            self.__write_entry(file, stat, digest, payloads)
+            if evict:
+                self.evict([file])
+        except Exception as e:
+            print('Cache store fail: ' + str(e))
+
+    def evict(self, keep_files: [str] = None):
+        """
+        Remove the least recently used entries until the total size does not exceed the max size.
+        :param keep_files: The files whose entries are not removed.
+        """
+        keep_entries = {self.__entry_path(file) for file in (keep_files or [])}
+        entries = self.__list_entries()
+        total_size = sum(size for _, size, _ in entries)
+        entries.sort(key=lambda entry: entry[2])
+        for entry_path, size, _ in entries:
+            if total_size <= self.__max_size:
+                break
+            if entry_path not in keep_entries:
+                self.__remove_entry(entry_path)
+                total_size -= size
+
+    def invalidate(self, file: str):
+        self.__remove_entry(self.__entry_path(file))
+
+    def clear(self):
+        for entry_path, _, _ in self.__list_entries():
+            self.__remove_entry(entry_path)
+
+    def total_size(self) -> int:
+        return sum(size for _, size, _ in self.__list_entries())
+
+    def entry_count(self) -> int:
+        return len(self.__list_entries())
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return hashlib.sha1(content).hexdigest()
+
+    @staticmethod
+    def get_default_cache_dir() -> str:
+        project_root = path.dirname(path.abspath(__file__))
+        return path.join(project_root, 'cache', 'records')
+
+    # -------------------------------------- Assistance --------------------------------------
+
+    def __entry_path(self, file: str) -> str:
+        name = hashlib.sha1(path.abspath(file).encode('utf-8')).hexdigest()
+        return path.join(self.__cache_dir, name + HistoryRecordCache.ENTRY_SUFFIX)
+
+    def __write_entry(self, file: str, stat, digest: str, payloads: list):
+        os.makedirs(self.__cache_dir, exist_ok=True)
+        entry_path = self.__entry_path(file)
+        temp_path = entry_path + '.' + str(os.getpid())
+        with open(temp_path, 'wb') as f:
+            pickle.dump((HistoryRecordCache.VERSION, path.abspath(file), stat.st_size, stat.st_mtime_ns,
+                         digest, payloads), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, entry_path)
+
+    def __list_entries(self) -> [(str, int, int)]:
+        """
+        :return: [(entry path, size, mtime)]
+        """
+        entries = []
+        if not path.isdir(self.__cache_dir):
+            return entries
+        for name in os.listdir(self.__cache_dir):
+            if not name.endswith(HistoryRecordCache.ENTRY_SUFFIX):
+                continue
+            entry_path = path.join(self.__cache_dir, name)
+            try:
+                stat = os.stat(entry_path)
+            except OSError:
+                continue
+            entries.append((entry_path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    @staticmethod
+    def __remove_entry(entry_path: str):
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def __read_content(file: str) -> bytes:
+        with open(file, 'rb') as f:
+            return f.read()
+
+
 # --------------------------------------------------- class history ----------------------------------------------------
 
 class HistoryRecordLoader:
@@ -725,6 +1448,18 @@ class HistoryRecordLoader:
 
     INVALID_SOURCE = '!@#$%&*?'         # These symbols can't be file name or url
 
+    RECORD_CACHE = None                 # The HistoryRecordCache used by from_file() and from_files(). None for no cache.
+
+    # ---------------------------------------- Cache ----------------------------------------
+
+    @staticmethod
+    def set_record_cache(cache):
+        HistoryRecordLoader.RECORD_CACHE = cache
+
+    @staticmethod
+    def get_record_cache():
+        return HistoryRecordLoader.RECORD_CACHE
+
     # ---------------------------------------- Save ----------------------------------------
 
     @staticmethod
@@ -779,6 +1514,24 @@ class HistoryRecordLoader:
         finally:
             pass
 
+    @staticmethod
+    def from_local_depots(depots: [str], workers: int = 1, chunk_size: int = 1) -> dict:
+        """
+        Load the files of all depots together, see from_files() for workers and chunk_size.
+        """
+        try:
+            files = []
+            for depot in depots:
+                depot_path = HistoryRecordLoader.join_local_depot_path(depot)
+                files.extend(HistoryRecordLoader.enumerate_local_path(depot_path))
+            return HistoryRecordLoader.from_files(files, workers, chunk_size)
+        except Exception as e:
+            print(e)
+            print(traceback.format_exc())
+            return {}
+        finally:
+            pass
+
     @staticmethod
     def from_directory(directory: str) -> dict:
         try:
@@ -799,13 +1552,70 @@ class HistoryRecordLoader:
             return HistoryRecordLoader.from_file(HistoryRecordLoader.source_to_absolute_path(source))
 
     @staticmethod
-    def from_files(files: [str]) -> dict:
+    def from_files(files: [str], workers: int = 1, chunk_size: int = 1) -> dict:
+        """
+        Load records from files. With RECORD_CACHE, the cached files are loaded from cache in this process, and only
+            the others are parsed (by worker processes). Then they're stored to cache here, and evicted once.
+        :param files: The list of file path
+        :param workers: The count of worker process. 1 for loading in current process. 0 or None for cpu count.
+        :param chunk_size: The count of files that a worker process loads in one task.
+        :return: { source: records } dict in the order of files. It's the same whichever the workers is.
+        """
+        cache = HistoryRecordLoader.RECORD_CACHE
+        file_records = {}
+        parse_files = []
+        for file in files:
+            cached_records = cache.load(file) if cache is not None else None
+            if cached_records is not None:
+                print('| => Load record: ' + file)
+                file_records[file] = [(file, cached_records)]
+            else:
+                parse_files.append(file)
+
+        if workers is None or workers <= 0:
+            workers = os.cpu_count() or 1
+        if workers == 1 or len(parse_files) <= 1:
+            file_payloads = HistoryRecordLoader.payloads_from_files(parse_files, cache is not None)
+        else:
+            chunk_size = max(chunk_size, 1)
+            chunks = [parse_files[i:i + chunk_size] for i in range(0, len(parse_files), chunk_size)]
+            file_payloads = []
+            with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+                for chunk_payloads in executor.map(HistoryRecordLoader.payloads_from_files, chunks,
+                                                   [cache is not None] * len(chunks)):
+                    file_payloads.extend(chunk_payloads)
+
+        for file, source_payloads, stat, digest in file_payloads:
+            file_records[file] = [(source, [HistoryRecord.from_payload(payload) for payload in payloads])
+                                  for source, payloads in source_payloads]
+            if cache is not None and stat is not None:
+                for source, payloads in source_payloads:
+                    if source == file:
+                        cache.store_payloads(file, payloads, digest, stat, False)
+        if cache is not None and len(file_payloads) > 0:
+            cache.evict(parse_files)
+
         records = {}
         for file in files:
-            r = HistoryRecordLoader.from_file(file)
-            records.update(r)
+            records.update(file_records[file])
         return records
 
+    @staticmethod
+    def payloads_from_files(files: [str], with_digest: bool = False) -> [(str, [(str, [tuple])], os.stat_result, str)]:
+        """
+        The task of from_files() in worker process. Records are returned as payload to reduce the pickle cost.
+        :param with_digest: Whether to hash the content of files for HistoryRecordCache.
+        :return: [(file, [(source, [record payload])], os.stat() of file, content hash)]
+                 The stat is None if the file fails to load. The content hash is None without with_digest.
+        """
+        file_payloads = []
+        for file in files:
+            print('| => Load record: ' + file)
+            records, stat, digest = HistoryRecordLoader.__parse_file(file, with_digest)
+            file_payloads.append((file, [(source, [record.dump_payload() for record in source_records])
+                                         for source, source_records in records.items()], stat, digest))
+        return file_payloads
+
     @staticmethod
     def from_web(url: str) -> dict:
         try:
@@ -823,8 +1633,14 @@ class HistoryRecordLoader:
     def from_file(file: str) -> dict:
         try:
             print('| => Load record: ' + file)
-            with open(file, 'rt', encoding='utf-8') as f:
-                records = HistoryRecordLoader.from_text(f.read(), file)
+            cache = HistoryRecordLoader.RECORD_CACHE
+            if cache is not None:
+                cached_records = cache.load(file)
+                if cached_records is not None:
+                    return { file: cached_records }
+            records, stat, digest = HistoryRecordLoader.__parse_file(file, cache is not None)
+            if cache is not None and stat is not None:
+                cache.store(file, records.get(file, []), digest, stat)
             return records
         except Exception as e:
             print(e)
@@ -834,41 +1650,80 @@ class HistoryRecordLoader:
             pass
 
     @staticmethod
-    def from_text(text: str, source: str = '') -> dict:
-        error_list = []
+    def __parse_file(file: str, with_digest: bool) -> (dict, os.stat_result, str):
+        """
+        Read and parse a file. The content is read once for both parsing and hashing.
+        :return: ({ source: records }, os.stat() of file, content hash). ({}, None, None) if fail.
+        """
+        try:
+            stat = os.stat(file)
+            with open(file, 'rb') as f:
+                content = f.read()
+            # Decode as the text mode: utf-8 and universal newlines
+            text = io.TextIOWrapper(io.BytesIO(content), encoding='utf-8').read()
+            digest = HistoryRecordCache.content_hash(content) if with_digest else None
+            return HistoryRecordLoader.from_text(text, file), stat, digest
+        except Exception as e:
+            print(e)
+            print(traceback.format_exc())
+            return {}, None, None
+        finally:
+            pass
 
+    @staticmethod
+    def from_text(text: str, source: str = '') -> dict:
         parser = LabelTagParser()
         parser.parse(text)
+        records = list(HistoryRecordLoader.iter_label_tags(parser.get_label_tags(), source))
+        return { source: records }
 
+    @staticmethod
+    def iter_file(file: str, chunk_size: int = 64 * 1024):
+        """
+        Read the file by chunk and yield the HistoryRecord as soon as it's closed by its focus label.
+        Only the current record is kept in memory. Unlike from_file(), exceptions are not caught here.
+        :param file: The path of the .his file
+        :param chunk_size: The count of chars to read each time.
+        :return: Generator of HistoryRecord
+        """
+        with open(file, 'rt', encoding='utf-8') as f:
+            label_tags = LabelTagParser().iter_parse(f, chunk_size)
+            yield from HistoryRecordLoader.iter_label_tags(label_tags, file)
+
+    @staticmethod
+    def iter_label_tags(label_tags, source: str = ''):
+        """
+        Build HistoryRecord from the (label, tags) sequence. A record starts with the [START] label and ends with its
+        focus label (or the next [START] label, or the end of sequence).
+        :param label_tags: Iterable of (label, [tags]), like the list of LabelTagParser or the generator of iter_parse()
+        :param source: The source of the records
+        :return: Generator of HistoryRecord
+        """
         focus = ''
         record = None
-        records = []
-        label_tags = parser.get_label_tags()
+        record_source = HistoryRecordLoader.normalize_source(source)
 
         for label, tags in label_tags:
             if label == '[START]':
                 if record is not None:
-                    records.append(record)
+                    yield record
                 record = None
                 focus = ''
-                if len(tags) == 0:
-                    error_list.append('Missing start section.')
-                else:
+                if len(tags) > 0:
                     focus = tags[0]
                 continue
 
             if record is None:
-                record = HistoryRecord(HistoryRecordLoader.normalize_source(source))
+                record = HistoryRecord(record_source)
                 record.set_focus_label(focus)
             record.set_label_tags(label, tags)
 
             if focus != '' and label == focus and record is not None:
-                records.append(record)
+                yield record
                 record = None
                 focus = ''
         if record is not None:
-            records.append(record)
-        return { source: records }
+            yield record
 
     # -------------------------------------- Assistance --------------------------------------
 
@@ -964,10 +1819,31 @@ class History:
     Every loaded history record will be organized as { source: [records] }
         You can get records by specifying a source.
         Or do map or filter to all the records.
+
+    The uuid of records is indexed:
+        __uuid_table: { uuid: (source, record) } The first record of the uuid (in the order of source and position).
+        __position_table: { source: { uuid: position } } The position of the first record of the uuid in source list.
+    They're updated on load, upsert, remove and source changes. So a lookup by uuid is O(1).
+
+    The label tags of the records in __uuid_table are also indexed for select_records():
+        __label_table: { label: { uuid } } The records that have the label.
+        __tag_table: { label: { tag: { uuid } } } The records that have the tag in the label.
+        __indexed_label_tags: { uuid: { label: [tags] } } The copy of label tags that the uuid is indexed by.
+    A record should be upserted again if its label tags are changed after it's added to History.
+
+    The period (since, until) of records is indexed by __period_index for select_in_range(). It's rebuilt on the next
+    query after the records changed.
     """
 
     def __init__(self):
         self.__source_records_table = { }       # { Source: [Records] }
+        self.__uuid_table = { }                 # { uuid: (Source, Record) }
+        self.__position_table = { }             # { Source: { uuid: position } }
+        self.__label_table = { }                # { label: { uuid } }
+        self.__tag_table = { }                  # { label: { tag: { uuid } } }
+        self.__indexed_label_tags = { }         # { uuid: { label: [tags] } }
+        self.__period_index = IntervalIndex()   # (since, until) -> (Source, Record)
+        self.__period_index_dirty = True
 
     # -------------------------------------- Gets / Sets --------------------------------------
 
@@ -977,41 +1853,64 @@ class History:
     # --------------------------------------- Management ---------------------------------------
 
     def remove_record(self, record_uuid: str):
-        pop_records = self.pop(lambda _, r: r.uuid() == record_uuid)
+        pop_records = self.__remove_uuids({record_uuid})
         print('Removed records: \n' + '\n'.join([r.uuid() for r in pop_records]))
 
     def remove_records(self, records: [HistoryRecord]):
-        for record in records:
-            self.remove_record(record.uuid())
+        pop_records = self.__remove_uuids({record.uuid() for record in records})
+        print('Removed records: \n' + '\n'.join([r.uuid() for r in pop_records]))
 
     def upsert_records(self, source: str, records: [HistoryRecord]):
         if isinstance(records, HistoryRecord):
             records = [records]
-        for record in records:
-            # Remove exists records, which means upsert is doing a replacement update.
-            self.remove_record(record.uuid())
 
-            # Append to the end of records list. Because records will be sorted by its time before layout.
-            # So we don't care about the order of records in upsert.
-            if source not in self.__source_records_table:
-                self.__source_records_table[source] = [record]
-            else:
-                self.__source_records_table[source].append(record)
+        # Remove exists records in other sources, which means upsert is doing a replacement update.
+        self.__remove_uuids({record.uuid() for record in records}, except_source=source)
 
-            print(f'Add record {record.uuid()}')
+        if source not in self.__source_records_table:
+            self.__source_records_table[source] = []
+            self.__position_table[source] = {}
+        source_records = self.__source_records_table[source]
+        positions = self.__position_table[source]
+
+        for record in records:
+            _uuid = record.uuid()
+            position = positions.get(_uuid)
+            if position is not None:
+                # The record exists in this source. Replace it in place.
+                source_records[position] = record
+            else:
+                # Append to the end of records list. Because records will be sorted by its time before layout.
+                # So we don't care about the order of records in upsert.
+                positions[_uuid] = len(source_records)
+                source_records.append(record)
+            if _uuid not in self.__uuid_table or self.__uuid_table[_uuid][0] == source:
+                self.__set_uuid_entry(_uuid, (source, record))
+            else:
+                self.__refresh_uuid(_uuid)
+        print(f'Upsert {len(records)} records to {source}')
 
     def change_source(self, old_source: str, new_source: str) -> bool:
         if old_source in self.__source_records_table and new_source not in self.__source_records_table:
+            self.__unindex_source(old_source)
             self.__source_records_table[new_source] = self.__source_records_table.pop(old_source)
+            self.__index_source(new_source)
             return True
         return False
 
     def remove_source(self, source: str):
         if source in self.__source_records_table:
+            self.__unindex_source(source)
             del self.__source_records_table[source]
 
     def reset_history(self):
         self.__source_records_table.clear()
+        self.__uuid_table.clear()
+        self.__position_table.clear()
+        self.__label_table.clear()
+        self.__tag_table.clear()
+        self.__indexed_label_tags.clear()
+        self.__period_index_dirty = True
 
     # --------------------------------- Higher-order function ---------------------------------
 
@@ -1029,12 +1928,16 @@ class History:
     def pop(self, pop_selector) -> list:
         pop_list = []
         for source, records in self.__source_records_table.items():
-            i = 0
-            while i < len(records):
-                if pop_selector(source, records[i]):
-                    pop_list.append(records.pop(i))
+            keep_list = []
+            for record in records:
+                if pop_selector(source, record):
+                    pop_list.append(record)
                 else:
-                    i += 1
+                    keep_list.append(record)
+            if len(keep_list) != len(records):
+                # Update in place. The list may be referenced by the caller of get_record_by_source().
+                records[:] = keep_list
+                self.__index_source(source)
         return pop_list
 
     def filter(self, filter_func) -> dict:
@@ -1060,9 +1963,30 @@ class History:
     # --------------------------------------- Select ---------------------------------------
 
     def get_record_by_uuid(self, _uuid: str) -> HistoryRecord or None:
-        collection = self.filter(lambda _, r: r.uuid() == _uuid)
-        records = [item for sublist in collection.values() for item in sublist]
-        return records[0] if len(records) > 0 else None
+        source_record = self.__uuid_table.get(_uuid)
+        if source_record is not None and source_record[1].uuid() != _uuid:
+            # The uuid of record has been changed outside. Rebuild the index.
+            self.__rebuild_index()
+            source_record = self.__uuid_table.get(_uuid)
+        return source_record[1] if source_record is not None else None
+
+    def select_in_range(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> [HistoryRecord]:
+        """
+        Select the records that overlap [since, until], the same as HistoryRecord.period_adapt().
+        :return: The records in the order of source and position.
+        """
+        if self.__has_duplicate_uuid():
+            collection = self.filter(lambda _, r: r.period_adapt(since, until))
+            return [item for sublist in collection.values() for item in sublist]
+        if self.__period_index_dirty:
+            self.__period_index.clear()
+            for source, record in self.__uuid_table.values():
+                self.__period_index.add(record.since(), record.until(), (source, record))
+            self.__period_index_dirty = False
+        source_orders = {source: order for order, source in enumerate(self.__source_records_table.keys())}
+        source_records = self.__period_index.query(since, until)
+        source_records.sort(key=lambda sr: (source_orders[sr[0]], self.__position_table[sr[0]][sr[1].uuid()]))
+        return [record for _, record in source_records]
 
     def get_record_by_source(self, source: str) -> list:
         return self.__source_records_table.get(source, [])
@@ -1080,14 +2004,12 @@ class History:
                        include_label_tags: dict = None, include_all: bool = True,
                        exclude_label_tags: dict = None, exclude_any: bool = True) ->[HistoryRecord]:
 
-        # Step 1: Filter by UUID
+        # Step 1: Filter by UUID. The candidates are picked from uuid index.
         if _uuid is not None and len(_uuid) != 0:
-            if isinstance(_uuid, (list, set, tuple)):
-                uuid_filter = lambda _, r: r.uuid() in _uuid
-            else:
-                uuid_filter = lambda _, r: r.uuid() == _uuid
+            uuids = _uuid if isinstance(_uuid, (list, set, tuple)) else [_uuid]
+            candidates = self.__source_records_of_uuids(uuids)
         else:
-            uuid_filter = lambda _, __: True
+            candidates = None
 
         # Step 2: Filter by sources
         if sources is not None and len(sources) != 0:
@@ -1104,18 +2026,44 @@ class History:
         else:
             focus_label_filter = lambda _, __: True
 
-        # Step 4: Filter by label tags
+        # Step 4: Filter by label tags. The include and exclude are selected by the label tags index if possible.
+        include_uuids = None
+        exclude_uuids = None
+        if not self.__has_duplicate_uuid():
+            if include_label_tags is not None and len(include_label_tags) > 0:
+                include_uuids = self.__select_uuids(include_label_tags, include_all)
+                if include_uuids is not None:
+                    include_label_tags = None
+            if exclude_label_tags is not None and len(exclude_label_tags) > 0:
+                exclude_uuids = self.__select_uuids(exclude_label_tags, not exclude_any)
+                if exclude_uuids is not None:
+                    exclude_label_tags = None
+
         if include_label_tags is not None or exclude_label_tags is not None:
             include_label_tags_fiter = lambda _, r: r.filter(
                 include_label_tags, include_all, exclude_label_tags, exclude_any)
         else:
             include_label_tags_fiter = lambda _, __: True
 
-        collection = self.filter(lambda s, r:
-                                 uuid_filter(s, r) and
-                                 source_filter(s, r) and
-                                 focus_label_filter(s, r) and
-                                 include_label_tags_fiter(s, r))
+        if exclude_uuids is not None and len(exclude_uuids) > 0:
+            exclude_uuids_filter = lambda _, r: r.uuid() not in exclude_uuids
+        else:
+            exclude_uuids_filter = lambda _, __: True
+
+        select_filter = lambda s, r: source_filter(s, r) and focus_label_filter(s, r) and \
+            exclude_uuids_filter(s, r) and include_label_tags_fiter(s, r)
+
+        if candidates is None and include_uuids is not None:
+            candidates = self.__source_records_of_uuids(include_uuids)
+        elif candidates is None and sources is not None and len(sources) != 0:
+            candidates = [(s, r) for s, records in self.__source_records_table.items() if source_filter(s, None)
+                          for r in records if r is not None]
+        elif candidates is not None and include_uuids is not None:
+            candidates = [(s, r) for s, r in candidates if r.uuid() in include_uuids]
+
+        if candidates is not None:
+            return [r for s, r in candidates if select_filter(s, r)]
+        collection = self.filter(select_filter)
         return [item for sublist in collection.values() for item in sublist]
 
     # ------------------------------------- Load -------------------------------------
@@ -1126,7 +2074,7 @@ class History:
         Return the new added { source: records } dict.
         """
         records = HistoryRecordLoader.from_source(source)
-        self.__source_records_table.update(records)
+        self.__update_sources(records)
         return records
 
     def load_depot(self, depot: str) -> dict:
@@ -1135,7 +2083,17 @@ class History:
         Return the new added { source: records } dict.
         """
         records = HistoryRecordLoader.from_local_depot(depot)
-        self.__source_records_table.update(records)
+        self.__update_sources(records)
+        return records
+
+    def load_depots(self, depots: [str], workers: int = 1, chunk_size: int = 1) -> dict:
+        """
+        Load from depots and add records to History.__records_table.
+        The files of all depots are loaded together, see HistoryRecordLoader.from_files() for workers and chunk_size.
+        Return the new added { source: records } dict.
+        """
+        records = HistoryRecordLoader.from_local_depots(depots, workers, chunk_size)
+        self.__update_sources(records)
         return records
 
     def load_path(self, _path: str) -> dict:
@@ -1144,7 +2102,7 @@ class History:
         Return the new added { source: records } dict.EE
         """
         records = HistoryRecordLoader.from_directory(_path)
-        self.__source_records_table.update(records)
+        self.__update_sources(records)
         return records
 
     # ------------------------------------- Save -------------------------------------
@@ -1154,6 +2112,169 @@ class History:
             return HistoryRecordLoader.E_SOURCE_NOT_EXISTS
         return HistoryRecordLoader.to_source(source, self.__source_records_table[source])
 
+    # ----------------------------------- Index -----------------------------------
+
+    def __update_sources(self, source_records: dict):
+        for source, records in source_records.items():
+            if source in self.__source_records_table:
+                self.__unindex_source(source)
+            self.__source_records_table[source] = records
+            self.__index_source(source)
+
+    def __remove_uuids(self, uuids: set, except_source: str = None) -> [HistoryRecord]:
+        """
+        Remove all records of the uuids. Each source that has these uuids is scanned only once.
+        """
+        pop_list = []
+        for source, positions in self.__position_table.items():
+            if source == except_source or not any(_uuid in positions for _uuid in uuids):
+                continue
+            records = self.__source_records_table[source]
+            keep_list = []
+            for record in records:
+                if record.uuid() in uuids:
+                    pop_list.append(record)
+                else:
+                    keep_list.append(record)
+            records[:] = keep_list
+            self.__index_source(source)
+        return pop_list
+
+    def __index_source(self, source: str):
+        """
+        (Re)build the position table of source and update the uuid table for it.
+        """
+        old_positions = self.__position_table.get(source, {})
+        records = self.__source_records_table[source]
+        positions = {}
+        for position in range(len(records)):
+            positions.setdefault(records[position].uuid(), position)
+        self.__position_table[source] = positions
+
+        for _uuid, position in positions.items():
+            source_record = self.__uuid_table.get(_uuid)
+            if source_record is None or source_record[0] == source:
+                self.__set_uuid_entry(_uuid, (source, records[position]))
+            else:
+                self.__refresh_uuid(_uuid)
+        for _uuid in old_positions.keys():
+            if _uuid not in positions:
+                self.__refresh_uuid(_uuid)
+
+    def __source_records_of_uuids(self, uuids) -> [(str, HistoryRecord)]:
+        """
+        Get the records of uuids in the order of source and position.
+        """
+        uuids = uuids if isinstance(uuids, (set, dict)) else set(uuids)
+        source_records = []
+        for source, records in self.__source_records_table.items():
+            positions = self.__position_table.get(source, {})
+            if len(uuids) < len(positions):
+                source_positions = sorted(positions[_uuid] for _uuid in uuids if _uuid in positions)
+            else:
+                source_positions = sorted(position for _uuid, position in positions.items() if _uuid in uuids)
+            source_records.extend((source, records[position]) for position in source_positions)
+        return source_records
+
+    def __unindex_source(self, source: str):
+        positions = self.__position_table.pop(source, {})
+        for _uuid in positions.keys():
+            self.__refresh_uuid(_uuid)
+
+    def __refresh_uuid(self, _uuid: str):
+        """
+        Point the uuid to its first record in the order of sources. Remove it if no record has this uuid.
+        """
+        for source, records in self.__source_records_table.items():
+            position = self.__position_table.get(source, {}).get(_uuid)
+            if position is not None:
+                self.__set_uuid_entry(_uuid, (source, records[position]))
+                return
+        self.__set_uuid_entry(_uuid, None)
+
+    def __rebuild_index(self):
+        self.__uuid_table.clear()
+        self.__position_table.clear()
+        self.__label_table.clear()
+        self.__tag_table.clear()
+        self.__indexed_label_tags.clear()
+        self.__period_index_dirty = True
+        for source in self.__source_records_table.keys():
+            self.__index_source(source)
+
+    def __set_uuid_entry(self, _uuid: str, source_record: (str, HistoryRecord) or None):
+        """
+        Update the uuid table and the label tags index of the uuid. source_record is None for removing the uuid.
+        """
+        self.__period_index_dirty = True
+        # The record may be the indexed one with its label tags changed in place, so unindex by the indexed copy.
+        self.__unindex_label_tags(_uuid)
+        if source_record is not None:
+            self.__uuid_table[_uuid] = source_record
+            self.__index_label_tags(_uuid, source_record[1])
+        else:
+            self.__uuid_table.pop(_uuid, None)
+
+    def __index_label_tags(self, _uuid: str, record: HistoryRecord):
+        label_tags = {label: list(tags) for label, tags in record.get_label_tags().items()}
+        self.__indexed_label_tags[_uuid] = label_tags
+        for label, tags in label_tags.items():
+            self.__label_table.setdefault(label, set()).add(_uuid)
+            tag_table = self.__tag_table.setdefault(label, {})
+            for tag in tags:
+                tag_table.setdefault(tag, set()).add(_uuid)
+
+    def __unindex_label_tags(self, _uuid: str):
+        for label, tags in self.__indexed_label_tags.pop(_uuid, {}).items():
+            uuids = self.__label_table.get(label)
+            if uuids is not None:
+                uuids.discard(_uuid)
+                if len(uuids) == 0:
+                    del self.__label_table[label]
+            tag_table = self.__tag_table.get(label, {})
+            for tag in tags:
+                uuids = tag_table.get(tag)
+                if uuids is not None:
+                    uuids.discard(_uuid)
+                    if len(uuids) == 0:
+                        del tag_table[tag]
+            if label in self.__tag_table and len(tag_table) == 0:
+                del self.__tag_table[label]
+
+    def __has_duplicate_uuid(self) -> bool:
+        return len(self.__uuid_table) != sum(len(records) for records in self.__source_records_table.values())
+
+    def __select_uuids(self, label_tag_dict: dict, include_all: bool) -> set or None:
+        """
+        The set version of LabelTag.includes(). The result should be the same as:
+            { uuid for uuid, (_, record) in __uuid_table.items() if record.includes(label_tag_dict, include_all) }
+        :return: The set of uuid. None if label_tag_dict is not supported by index.
+        """
+        for expect_tags in label_tag_dict.values():
+            if not isinstance(expect_tags, (list, tuple, set, str)) or \
+                    not all(isinstance(expect_tag, str) for expect_tag in expect_tags):
+                return None
+
+        if include_all:
+            # Every label exists, every expected tag exists, and at least one tag is expected.
+            if sum(len(expect_tags) for expect_tags in label_tag_dict.values()) == 0:
+                return set()
+            uuid_sets = []
+            for label, expect_tags in label_tag_dict.items():
+                uuid_sets.append(self.__label_table.get(label, set()))
+                tag_table = self.__tag_table.get(label, {})
+                uuid_sets.extend(tag_table.get(expect_tag, set()) for expect_tag in expect_tags)
+            uuid_sets.sort(key=len)
+            return set(uuid_sets[0]).intersection(*uuid_sets[1:])
+        else:
+            # Any expected tag exists.
+            selected = set()
+            for label, expect_tags in label_tag_dict.items():
+                tag_table = self.__tag_table.get(label, {})
+                for expect_tag in expect_tags:
+                    selected.update(tag_table.get(expect_tag, ()))
+            return selected
+
     # ----------------------------------- Print -----------------------------------
 
     def print_records(self):
@@ -1228,6 +2349,226 @@ def test_token_parser_case_escape_symbol():
     pass
 
 
+def check_compiled_token_parser(text: str, expects: [str], tokens: list, wrappers: list, escape_symbols: list):
+    """
+    Check CompiledTokenParser gets the expected tokens, the same as TokenParser.
+    """
+    parsers = []
+    for parser in [CompiledTokenParser(), TokenParser()]:
+        parser.config(tokens, wrappers, escape_symbols)
+        parser.reset()
+        parser.attach(text)
+        parsers.append(parser)
+    for expect in expects:
+        compiled_token, token = parsers[0].next_token(), parsers[1].next_token()
+        assert compiled_token == token == expect
+
+
+def test_compiled_token_parser():
+    text = '''
+    line1:abc            # text in: comments
+    line2
+    line3:"""text in :wrapper"""
+    '''
+    expects = [
+        '\n',
+        'line1',
+        ':',
+        'abc',
+        '#',
+        ' text in: comments',
+        '\n',
+        'line2',
+        '\n',
+        'line3',
+        ':',
+        '"""',
+        'text in :wrapper',
+        '"""',
+        '\n',
+        ''
+    ]
+    check_compiled_token_parser(text, expects, LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
+
+
+def collect_tokens(parser, text: str) -> [str]:
+    parser.config(LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
+    parser.reset()
+    parser.attach(text)
+    tokens = []
+    while not parser.reaches_end():
+        tokens.append(parser.next_token())
+    return tokens
+
+
+def test_compiled_token_parser_case_consistency():
+    texts = [
+        '',
+        'label',
+        'label: tag1, tag2; label2: tag3',
+        'title:"""wrapped ending at eof"""',
+        'title:"""escaped \\""" quote"""\n',
+        '# comment ending with new line\n',
+        '# comment without new line',
+        '""""""x',
+        'a\\"""b:  c  ,, d\n\n;',
+    ]
+    depot_root = HistoryRecordLoader.get_local_depot_root()
+    for file in HistoryRecordLoader.enumerate_local_path(depot_root, ['.his']):
+        with open(file, 'rt', encoding='utf-8') as f:
+            texts.append(f.read())
+    for text in texts:
+        assert collect_tokens(CompiledTokenParser(), text) == collect_tokens(TokenParser(), text)
+
+
+def test_label_tag_parser_diagnostics():
+    parser = LabelTagParser()
+    assert parser.parse('label1: tag1, tag2\nlabel2: tag3\n')
+    assert not parser.parse('label1: tag1\nlabel2 tag3\n')
+    assert parser.get_parse_errors() == [(2, 8, "Expect token: [':', ';'] but met: tag3")]
+    assert parser.parse('label3: tag4\n') and parser.get_parse_errors() == []
+
+    messages = []
+    diagnostics = ParseDiagnostics(ParseDiagnostics.LEVEL_TRACE, lambda *args: messages.append(args))
+    parser = LabelTagParser(diagnostics=diagnostics)
+    parser.parse('label: tag')
+    assert (ParseDiagnostics.LEVEL_TRACE, '-> Read token: tag', 0, 0) in messages
+
+
+def test_compiled_token_parser_case_stream():
+    texts = [
+        'title:"""wrapped ending at eof"""',
+        'title:"""escaped \\""" quote"""\n',
+        'a\\"""b:  c  ,, d\n\n;',
+    ]
+    depot_root = HistoryRecordLoader.get_local_depot_root()
+    for file in HistoryRecordLoader.enumerate_local_path(depot_root, ['.his'])[:3]:
+        with open(file, 'rt', encoding='utf-8') as f:
+            texts.append(f.read())
+    for text in texts:
+        expects = collect_tokens(TokenParser(), text)
+        for chunk_size in [1, 2, 3, 7, 1024]:
+            parser = CompiledTokenParser()
+            parser.config(LABEL_TAG_TOKENS, LABEL_TAG_WRAPPERS, LABEL_TAG_ESCAPES_SYMBOLS)
+            parser.reset()
+            parser.attach_stream(io.StringIO(text), chunk_size)
+            tokens = []
+            while not parser.reaches_end():
+                tokens.append(parser.next_token())
+            assert tokens == expects
+
+    parser = LabelTagParser()
+    label_tags = list(parser.iter_parse(io.StringIO('label1: tag1\nlabel2 tag3\n'), 3))
+    assert label_tags == [('label1', ['tag1']), ('label2', ['tag3'])]
+    assert parser.get_parse_errors() == [(2, 8, "Expect token: [':', ';'] but met: tag3")]
+
+
+def test_history_record_loader_iter_file():
+    depot_root = HistoryRecordLoader.get_local_depot_root()
+    for file in HistoryRecordLoader.enumerate_local_path(depot_root, ['.his']):
+        expects = HistoryRecordLoader.from_file(file)[file]
+        records = list(HistoryRecordLoader.iter_file(file, 100))
+        assert len(records) == len(expects)
+        for record, expect in zip(records, expects):
+            # The uuid is generated if the record has no uuid label
+            record.copy_uuid_from(expect)
+        assert [r.dump_record() for r in records] == [r.dump_record() for r in expects]
+
+
+def test_history_record_loader_parallel():
+    depot_root = HistoryRecordLoader.get_local_depot_root()
+    files = HistoryRecordLoader.enumerate_local_path(depot_root, ['.his'])
+    expects = HistoryRecordLoader.from_files(files)
+    records = HistoryRecordLoader.from_files(files, workers=2, chunk_size=3)
+    assert list(records.keys()) == list(expects.keys())
+    for source in expects.keys():
+        assert [r.dump_payload() for r in records[source]] == \
+               [HistoryRecord.from_payload(r.dump_payload()).dump_payload() for r in records[source]]
+        assert [r.dump_payload()[1:] for r in records[source]] == [r.dump_payload()[1:] for r in expects[source]]
+
+
+def test_history_record_cache():
+    import shutil
+    import tempfile
+
+    temp_dir = tempfile.mkdtemp()
+    try:
+        depot_root = HistoryRecordLoader.get_local_depot_root()
+        files = HistoryRecordLoader.enumerate_local_path(depot_root, ['.his'])[:3]
+        file = path.join(temp_dir, 'test.his')
+        shutil.copyfile(files[0], file)
+
+        cache = HistoryRecordCache(path.join(temp_dir, 'cache'))
+        assert cache.load(file) is None
+
+        HistoryRecordLoader.set_record_cache(cache)
+        expects = HistoryRecordLoader.from_file(file)[file]
+        records = cache.load(file)
+        assert [r.dump_payload() for r in records] == [r.dump_payload() for r in expects]
+        assert [r.dump_payload() for r in HistoryRecordLoader.from_file(file)[file]] == \
+               [r.dump_payload() for r in expects]
+
+        # Touch only: the content hash keeps the entry valid
+        stat = os.stat(file)
+        os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert cache.load(file) is not None
+
+        # Content changes: the entry is invalid
+        with open(file, 'at', encoding='utf-8') as f:
+            f.write('\n[START]: event\ntime: 2000\nevent: cache test\n')
+        assert cache.load(file) is None
+        assert len(HistoryRecordLoader.from_file(file)[file]) == len(expects) + 1
+        assert len(cache.load(file)) == len(expects) + 1
+
+        # Parallel loading: The entries are stored and loaded in this process, the workers only parse
+        HistoryRecordLoader.set_record_cache(None)
+        expects = HistoryRecordLoader.from_files(files)
+        parallel_cache = HistoryRecordCache(path.join(temp_dir, 'parallel_cache'))
+        HistoryRecordLoader.set_record_cache(parallel_cache)
+        records = HistoryRecordLoader.from_files(files, workers=2)
+        assert parallel_cache.entry_count() == len(files)
+        cached_records = HistoryRecordLoader.from_files(files, workers=2)
+        assert list(cached_records.keys()) == list(expects.keys())
+        for source in expects.keys():
+            assert [r.dump_payload() for r in cached_records[source]] == [r.dump_payload() for r in records[source]]
+            assert [r.dump_payload()[1:] for r in records[source]] == [r.dump_payload()[1:] for r in expects[source]]
+        HistoryRecordLoader.set_record_cache(cache)
+
+        # Size cap: Only the latest entry is kept
+        small_cache = HistoryRecordCache(path.join(temp_dir, 'small_cache'), 1)
+        for f in files:
+            small_cache.store(f, HistoryRecordLoader.from_file(f)[f])
+        assert small_cache.entry_count() == 1
+        assert small_cache.load(files[-1]) is not None
+
+        cache.clear()
+        assert cache.entry_count() == 0
+    finally:
+        HistoryRecordLoader.set_record_cache(None)
+        shutil.rmtree(temp_dir)
+
+
+def test_compact_history_record():
+    depot_root = HistoryRecordLoader.get_local_depot_root()
+    files = HistoryRecordLoader.enumerate_local_path(depot_root, ['.his'])
+    for records in HistoryRecordLoader.from_files(files).values():
+        for record in records:
+            for binary_uuid in [False, True]:
+                compact = CompactHistoryRecord.from_record(record, binary_uuid)
+                assert not hasattr(compact, '__dict__')
+                assert compact.to_record().dump_payload() == record.dump_payload()
+                assert compact.uuid() == record.uuid()
+                assert (compact.since(), compact.until()) == (record.since(), record.until())
+                assert compact.dump_record() == record.dump_record()
+                for label in record.get_labels():
+                    assert list(compact.get_tags(label)) == record.get_tags(label)
+                    assert compact.includes({label: record.get_tags(label)[:1]}, True) == \
+                        record.includes({label: record.get_tags(label)[:1]}, True)
+
+    compact = CompactHistoryRecord(('not-a-uuid', 0, 0, 'event', '', ()), True)
+    assert compact.uuid() == 'not-a-uuid'
+
+
 # -------------------------------- History --------------------------------
 
 def test_history_basic():
@@ -1265,6 +2606,126 @@ def test_history_filter():
     assert len(records) == 4
 
 
+def test_history_uuid_index():
+    def make_record(_uuid: str, title: str) -> HistoryRecord:
+        record = HistoryRecord()
+        record.set_label_tags('uuid', _uuid)
+        record.set_label_tags('title', title)
+        return record
+
+    def check_index(history: History):
+        for record in history.select_records():
+            expects = history.filter(lambda _, r: r.uuid() == record.uuid())
+            assert history.get_record_by_uuid(record.uuid()) is list(expects.values())[0][0]
+
+    history = History()
+    history.upsert_records('a', [make_record('%04d' % i, 'a') for i in range(100)])
+    history.upsert_records('b', [make_record('%04d' % i, 'b') for i in range(50, 150)])
+    check_index(history)
+    assert len(history.get_record_by_source('a')) == 50
+    assert history.get_record_by_uuid('0060').title() == ['b']
+
+    # Replace in place
+    history.upsert_records('b', make_record('0060', 'b2'))
+    assert history.get_record_by_source('b')[10].title() == ['b2']
+    assert [r.title() for r in history.select_records(_uuid=['0060', '0001'])] == [['a'], ['b2']]
+
+    history.remove_record('0010')
+    history.remove_records([history.get_record_by_uuid('0100')])
+    assert history.get_record_by_uuid('0010') is None and history.get_record_by_uuid('0100') is None
+    check_index(history)
+
+    assert history.change_source('a', 'c')
+    assert history.get_record_by_uuid('0000') is history.get_record_by_source('c')[0]
+    history.remove_source('c')
+    assert history.get_record_by_uuid('0001') is None
+    assert history.get_record_by_uuid('0060') is not None
+    check_index(history)
+
+
+def test_history_select_records_index():
+    import random
+
+    history = History()
+    history.load_depots(['China_CN', 'World_CN', 'example'])
+    records = history.select_records()
+    sources = history.get_source_list()
+
+    def select_by_scan(sources_, focus_label, include_label_tags, include_all, exclude_label_tags, exclude_any):
+        collection = history.filter(lambda s, r:
+                                    (len(sources_) == 0 or s in sources_) and
+                                    (focus_label == '' or r.get_focus_label() == focus_label) and
+                                    r.filter(include_label_tags, include_all, exclude_label_tags, exclude_any))
+        return [item for sublist in collection.values() for item in sublist]
+
+    def random_label_tags() -> dict:
+        label_tags = {}
+        for _ in range(random.randint(0, 3)):
+            record = random.choice(records)
+            label = random.choice(record.get_labels() + ['no_such_label'])
+            tags = record.get_tags(label)
+            expect_tags = random.sample(tags, random.randint(0, min(2, len(tags))))
+            if random.random() < 0.2:
+                expect_tags.append('no_such_tag')
+            label_tags[label] = expect_tags
+        return label_tags
+
+    random.seed(0)
+    for _ in range(300):
+        args = (random.sample(sources, random.randint(0, 2)),
+                random.choice(['', '', 'event', 'people']),
+                random_label_tags(), random.random() < 0.5,
+                random_label_tags(), random.random() < 0.5)
+        assert history.select_records(sources=args[0], focus_label=args[1],
+                                      include_label_tags=args[2], include_all=args[3],
+                                      exclude_label_tags=args[4], exclude_any=args[5]) == select_by_scan(*args)
+
+    # The string value is treated as a sequence of chars, the same as LabelTag.includes()
+    assert history.select_records(include_label_tags={'people': 'x'}) == select_by_scan([], '', {'people': 'x'}, True,
+                                                                                      None, True)
+
+    # The record is upserted again after its label tags are changed in place
+    record = HistoryRecord()
+    record.set_label_tags('uuid', 'in_place_edit')
+    record.set_label_tags('in_place_tags', 'a')
+    history.upsert_records('in_place', [record])
+    assert history.select_records(include_label_tags={'in_place_tags': ['a']}) == [record]
+    record.set_label_tags('in_place_tags', 'b')
+    history.upsert_records('in_place', [record])
+    for label_tags in [{'in_place_tags': ['a']}, {'in_place_tags': ['b']}, {'in_place_tags': []}]:
+        assert history.select_records(include_label_tags=label_tags) == select_by_scan([], '', label_tags, True,
+                                                                                        None, True)
+    assert history.select_records(include_label_tags={'in_place_tags': ['b']}) == [record]
+
+
+def test_history_select_in_range():
+    history = History()
+    history.load_depots(['China_CN', 'World_CN', 'example'])
+    for since, until in [(0, 0), (-HistoryTime.TICK_YEAR * 1000, 0), (0, HistoryTime.TICK_YEAR * 2020),
+                         (HistoryTime.TICK_YEAR * 200, HistoryTime.TICK_YEAR * 300)]:
+        collection = history.filter(lambda _, r: r.period_adapt(since, until))
+        expects = [item for sublist in collection.values() for item in sublist]
+        assert history.select_in_range(since, until) == expects
+
+    record = history.select_in_range(0, HistoryTime.TICK_YEAR * 2020)[0]
+    history.remove_record(record.uuid())
+    assert record not in history.select_in_range(0, HistoryTime.TICK_YEAR * 2020)
+
+
+def test_split_time_text_corpus():
+    time_texts = []
+    for file in HistoryRecordLoader.enumerate_local_path(HistoryRecordLoader.get_local_depot_root(), ['.his']):
+        with open(file, 'rt', encoding='utf-8') as f:
+            parser = LabelTagParser()
+            parser.parse(f.read())
+            for label, tags in parser.get_label_tags():
+                if label == 'time':
+                    time_texts.append(','.join(tags))
+    assert len(time_texts) > 0
+    for text in time_texts:
+        assert HistoryTime.split_time_text(text) == HistoryTime.__split_natural_language_time_text(text)
+
+
 # -------------------------------- Indexer --------------------------------
 
 def test_generate_index():
@@ -1290,8 +2751,20 @@ def main():
     # test_time_text_to_history_times()
     test_token_parser_case_normal()
     test_token_parser_case_escape_symbol()
+    test_compiled_token_parser()
+    test_compiled_token_parser_case_consistency()
+    test_label_tag_parser_diagnostics()
+    test_compiled_token_parser_case_stream()
+    test_history_record_loader_iter_file()
+    test_history_record_loader_parallel()
+    test_history_record_cache()
+    test_compact_history_record()
     test_history_basic()
     test_history_filter()
+    test_history_uuid_index()
+    test_history_select_records_index()
+    test_history_select_in_range()
+    test_split_time_text_corpus()
     test_generate_index()
     # test_load_index()
     print('All test passed.')
@@ -1,5 +1,6 @@
 import sys
 import traceback
+import multiprocessing
 from PyQt5.QtWidgets import QApplication, QScrollBar, QSlider, QMenu
 
 from PyQt5 import QtWidgets, QtCore
@@ -191,6 +192,9 @@ class AppearanceEditor(QWidget):
 
 class HistoryUi(QMainWindow):
 
+    # The max worker process count of loading all depots. Each worker starts an interpreter and imports the modules.
+    LOAD_WORKERS_MAX = 4
+
     def __init__(self):
         super(HistoryUi, self).__init__()
 
@@ -313,8 +317,8 @@ class HistoryUi(QMainWindow):
 
     def on_menu_load_all(self):
         depots = HistoryRecordBrowser.enumerate_local_depot()
-        for depot in depots:
-            self.__history.load_depot(depot)
+        workers = min(os.cpu_count() or 1, HistoryUi.LOAD_WORKERS_MAX)
+        self.__history.load_depots(depots, workers=workers)
 
     def on_menu_record_editor(self):
         editor = HistoryEditorDialog(self.__history)
@@ -562,6 +566,8 @@ class HistoryUi(QMainWindow):
 # ----------------------------------------------------------------------------------------------------------------------
 
 def main():
+    HistoryRecordLoader.set_record_cache(HistoryRecordCache())
+    HistoryTime.build_year_start_table()
     app = QApplication(sys.argv)
     app.setAttribute(Qt.AA_EnableHighDpiScaling)
     main_wnd = HistoryUi()
@@ -582,6 +588,8 @@ def exception_hook(type, value, tback):
 
 
 if __name__ == "__main__":
+    # The frozen (PyInstaller) app starts the worker processes of depot loading by itself
+    multiprocessing.freeze_support()
     sys.excepthook = exception_hook
     try:
         main()
@@ -0,0 +1,82 @@
+import sys
+import traceback
+
+from core import *
+
+
+USAGE = '''Usage:
+    python record_cache.py warm [depot or path ...]     Parse the files and store them to cache. All depots by default.
+    python record_cache.py clear                         Remove all cache entries.
+    python record_cache.py info                          Show the cache directory and its size.'''
+
+
+def warm_cache(cache: HistoryRecordCache, targets: [str]):
+    if len(targets) == 0:
+        depot_root = HistoryRecordLoader.get_local_depot_root()
+        targets = [item for item in os.listdir(depot_root) if path.isdir(path.join(depot_root, item))]
+
+    files = []
+    for target in targets:
+        if path.isfile(target):
+            files.append(target)
+        elif path.isdir(target):
+            files.extend(HistoryRecordLoader.enumerate_local_path(target))
+        else:
+            files.extend(HistoryRecordLoader.enumerate_local_path(HistoryRecordLoader.join_local_depot_path(target)))
+
+    parse_files = [file for file in files if cache.load(file) is None]
+    HistoryRecordLoader.set_record_cache(cache)
+    try:
+        HistoryRecordLoader.from_files(parse_files, workers=0)
+    finally:
+        HistoryRecordLoader.set_record_cache(None)
+    print('Warm cache: %d files, %d updated.' % (len(files), len(parse_files)))
+
+
+def print_cache_info(cache: HistoryRecordCache):
+    print('Cache directory: ' + cache.get_cache_dir())
+    print('Entries: %d, size: %.2f MB, max size: %.2f MB' %
+          (cache.entry_count(), cache.total_size() / 1024 / 1024, cache.get_max_size() / 1024 / 1024))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(USAGE)
+        return
+
+    cache = HistoryRecordCache()
+    command = sys.argv[1]
+    if command == 'warm':
+        warm_cache(cache, sys.argv[2:])
+        print_cache_info(cache)
+    elif command == 'clear':
+        cache.clear()
+        print_cache_info(cache)
+    elif command == 'info':
+        print_cache_info(cache)
+    else:
+        print(USAGE)
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def exception_hook(type, value, tback):
+    # log the exception here
+    print('Exception hook triggered.')
+    print(type)
+    print(value)
+    print(tback)
+    # then call the default handler
+    sys.__excepthook__(type, value, tback)
+
+
+if __name__ == "__main__":
+    sys.excepthook = exception_hook
+    try:
+        main()
+    except Exception as e:
+        print('Error =>', e)
+        print('Error =>', traceback.format_exc())
+        exit()
+    finally:
+        pass
@@ -0,0 +1,282 @@
+import sys
+import traceback
+import numpy as np
+
+from core import *
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+#                                                   class RecordTable
+# ----------------------------------------------------------------------------------------------------------------------
+
+class RecordTable:
+    """
+    A columnar (read-only) view of records for analytics and bulk filtering. Build it by RecordTable.from_history().
+
+    Columns (one row for one record, in the order of History.select_records()):
+        uuids: The uuid of records.
+        since / until: The time ticks of records, int64.
+        source_ids / focus_ids: int32 ids of source and focus label. See get_sources() and get_focus_labels().
+
+    The label tags are stored in CSR (compressed sparse row) layout:
+        label_indptr / label_indices: The label ids of record i are label_indices[label_indptr[i]:label_indptr[i + 1]]
+        tag_indptr / tag_indices: The (label, tag) ids of record i, in the same way.
+
+    The select_*() functions return a bool mask of rows. Combine masks by & | ~ then get uuids by uuids_of().
+    """
+
+    def __init__(self):
+        self.uuids = []
+        self.since = np.zeros(0, dtype=np.int64)
+        self.until = np.zeros(0, dtype=np.int64)
+        self.source_ids = np.zeros(0, dtype=np.int32)
+        self.focus_ids = np.zeros(0, dtype=np.int32)
+
+        self.label_indptr = np.zeros(1, dtype=np.int64)
+        self.label_indices = np.zeros(0, dtype=np.int32)
+        self.tag_indptr = np.zeros(1, dtype=np.int64)
+        self.tag_indices = np.zeros(0, dtype=np.int32)
+
+        self.__sources = []                 # [source], indexed by source id
+        self.__focus_labels = []            # [focus label], indexed by focus id
+        self.__labels = []                  # [label], indexed by label id
+        self.__label_tags = []              # [(label, tag)], indexed by tag id
+
+        self.__source_id_table = {}
+        self.__focus_id_table = {}
+        self.__label_id_table = {}
+        self.__label_tag_id_table = {}
+
+        self.__label_rows = None            # The row of each item in label_indices
+        self.__tag_rows = None              # The row of each item in tag_indices
+
+    def __len__(self):
+        return len(self.uuids)
+
+    # ------------------------------------------ Build ------------------------------------------
+
+    @staticmethod
+    def from_history(history: History):
+        records = []
+        history.map(lambda source, record: records.append((source, record)))
+        return RecordTable.from_records(records)
+
+    @staticmethod
+    def from_records(source_records: [(str, HistoryRecord)]):
+        table = RecordTable()
+        count = len(source_records)
+
+        since = np.empty(count, dtype=np.int64)
+        until = np.empty(count, dtype=np.int64)
+        source_ids = np.empty(count, dtype=np.int32)
+        focus_ids = np.empty(count, dtype=np.int32)
+        label_indptr = np.empty(count + 1, dtype=np.int64)
+        tag_indptr = np.empty(count + 1, dtype=np.int64)
+        label_indptr[0] = 0
+        tag_indptr[0] = 0
+        label_indices = []
+        tag_indices = []
+
+        for row in range(count):
+            source, record = source_records[row]
+            table.uuids.append(record.uuid())
+            since[row] = record.since()
+            until[row] = record.until()
+            source_ids[row] = RecordTable.__get_id(table.__source_id_table, table.__sources, source)
+            focus_ids[row] = RecordTable.__get_id(table.__focus_id_table, table.__focus_labels,
+                                                  record.get_focus_label())
+            for label, tags in record.get_label_tags().items():
+                label_indices.append(RecordTable.__get_id(table.__label_id_table, table.__labels, label))
+                for tag in tags:
+                    tag_indices.append(RecordTable.__get_id(table.__label_tag_id_table, table.__label_tags,
+                                                            (label, tag)))
+            label_indptr[row + 1] = len(label_indices)
+            tag_indptr[row + 1] = len(tag_indices)
+
+        table.since, table.until = since, until
+        table.source_ids, table.focus_ids = source_ids, focus_ids
+        table.label_indptr = label_indptr
+        table.label_indices = np.array(label_indices, dtype=np.int32)
+        table.tag_indptr = tag_indptr
+        table.tag_indices = np.array(tag_indices, dtype=np.int32)
+        table.__label_rows = np.repeat(np.arange(count), np.diff(label_indptr))
+        table.__tag_rows = np.repeat(np.arange(count), np.diff(tag_indptr))
+        return table
+
+    # ------------------------------------------ Gets ------------------------------------------
+
+    def get_sources(self) -> [str]:
+        return self.__sources
+
+    def get_focus_labels(self) -> [str]:
+        return self.__focus_labels
+
+    def get_labels(self) -> [str]:
+        return self.__labels
+
+    def get_label_tags(self) -> [(str, str)]:
+        return self.__label_tags
+
+    def uuids_of(self, mask: np.ndarray) -> [str]:
+        return [self.uuids[row] for row in np.flatnonzero(mask)]
+
+    # ------------------------------------------ Filter ------------------------------------------
+
+    def select_all(self) -> np.ndarray:
+        return np.ones(len(self), dtype=bool)
+
+    def select_in_range(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> np.ndarray:
+        """
+        The same as HistoryRecord.period_adapt()
+        """
+        return (self.since <= until) & (self.until >= since)
+
+    def select_sources(self, sources: str or [str]) -> np.ndarray:
+        if isinstance(sources, str):
+            sources = [sources]
+        source_ids = [self.__source_id_table[source] for source in sources if source in self.__source_id_table]
+        return np.isin(self.source_ids, source_ids)
+
+    def select_focus_label(self, focus_label: str) -> np.ndarray:
+        focus_id = self.__focus_id_table.get(focus_label, -1)
+        return self.focus_ids == focus_id
+
+    def select_label_tags(self, label_tag_dict: dict, include_all: bool = False) -> np.ndarray:
+        """
+        The same as LabelTag.includes()
+        """
+        if include_all:
+            # Every label exists, every expected tag exists, and at least one tag is expected.
+            expect_count = sum(len(expect_tags) for expect_tags in label_tag_dict.values())
+            label_ids = {self.__label_id_table.get(label, -1) for label in label_tag_dict.keys()}
+            tag_ids = {self.__label_tag_id_table.get((label, expect_tag), -1)
+                       for label, expect_tags in label_tag_dict.items() for expect_tag in expect_tags}
+            if expect_count == 0 or -1 in label_ids or -1 in tag_ids:
+                return np.zeros(len(self), dtype=bool)
+            label_mask = self.__count_rows(self.label_indices, self.__label_rows, label_ids) == len(label_ids)
+            tag_mask = self.__count_rows(self.tag_indices, self.__tag_rows, tag_ids) == len(tag_ids)
+            return label_mask & tag_mask
+        else:
+            # Any expected tag exists.
+            tag_ids = {self.__label_tag_id_table[(label, expect_tag)]
+                       for label, expect_tags in label_tag_dict.items() for expect_tag in expect_tags
+                       if (label, expect_tag) in self.__label_tag_id_table}
+            return self.__count_rows(self.tag_indices, self.__tag_rows, tag_ids) > 0
+
+    # ------------------------------------------ Report ------------------------------------------
+
+    def count_by_period(self, period: HistoryTime.TICK, mask: np.ndarray = None) -> (np.ndarray, np.ndarray):
+        """
+        Count records by the period of since. For example, use HistoryTime.TICK_YEAR * 100 for events per century.
+        :return: (The start tick of periods, The count of records in each period)
+        """
+        since = self.since if mask is None else self.since[mask]
+        periods, counts = np.unique(np.floor_divide(since, period), return_counts=True)
+        return periods * period, counts
+
+    def time_range_by_source(self, mask: np.ndarray = None) -> dict:
+        """
+        :return: { source: (min since, max until) }
+        """
+        source_ids = self.source_ids if mask is None else self.source_ids[mask]
+        since = self.since if mask is None else self.since[mask]
+        until = self.until if mask is None else self.until[mask]
+
+        source_count = len(self.__sources)
+        min_since = np.full(source_count, np.iinfo(np.int64).max, dtype=np.int64)
+        max_until = np.full(source_count, np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(min_since, source_ids, since)
+        np.maximum.at(max_until, source_ids, until)
+        exists = np.bincount(source_ids, minlength=source_count) > 0
+        return {self.__sources[i]: (int(min_since[i]), int(max_until[i])) for i in np.flatnonzero(exists)}
+
+    # ------------------------------------------------------------------------------------------
+
+    def __count_rows(self, indices: np.ndarray, rows: np.ndarray, ids: set) -> np.ndarray:
+        """
+        Count the items in ids for each row.
+        """
+        hits = np.isin(indices, np.fromiter(ids, dtype=np.int32, count=len(ids)))
+        return np.bincount(rows[hits], minlength=len(self))
+
+    @staticmethod
+    def __get_id(id_table: dict, values: list, value) -> int:
+        _id = id_table.get(value)
+        if _id is None:
+            _id = len(values)
+            id_table[value] = _id
+            values.append(value)
+        return _id
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def test_record_table():
+    import random
+
+    history = History()
+    history.load_depots(['China_CN', 'World_CN', 'example'])
+    records = history.select_records()
+    table = RecordTable.from_history(history)
+    assert table.uuids == [r.uuid() for r in records]
+
+    def uuids_where(func) -> [str]:
+        return [r.uuid() for r in records if func(r)]
+
+    for since, until in [(0, 0), (-HistoryTime.TICK_YEAR * 1000, 0), (0, HistoryTime.TICK_YEAR * 2020)]:
+        assert table.uuids_of(table.select_in_range(since, until)) == uuids_where(lambda r: r.period_adapt(since, until))
+    assert table.uuids_of(table.select_focus_label('people')) == uuids_where(lambda r: r.get_focus_label() == 'people')
+    source = history.get_source_list()[1]
+    assert table.uuids_of(table.select_sources(source)) == [r.uuid() for r in history.get_record_by_source(source)]
+
+    random.seed(0)
+    for _ in range(200):
+        label_tags = {}
+        for _ in range(random.randint(0, 3)):
+            record = random.choice(records)
+            label = random.choice(record.get_labels() + ['no_such_label'])
+            tags = record.get_tags(label)
+            label_tags[label] = random.sample(tags, random.randint(0, min(2, len(tags))))
+        for include_all in [True, False]:
+            assert table.uuids_of(table.select_label_tags(label_tags, include_all)) == \
+                   uuids_where(lambda r: r.includes(label_tags, include_all))
+
+    time_range = table.time_range_by_source()
+    for source in history.get_source_list():
+        source_records = history.get_record_by_source(source)
+        if len(source_records) > 0:
+            assert time_range[source] == (min(r.since() for r in source_records), max(r.until() for r in source_records))
+
+    periods, counts = table.count_by_period(HistoryTime.TICK_YEAR * 100)
+    assert counts.sum() == len(records)
+
+
+# ----------------------------------------------------- File Entry -----------------------------------------------------
+
+def main():
+    test_record_table()
+    print('All test passed.')
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+
+def exception_hook(type, value, tback):
+    # log the exception here
+    print('Exception hook triggered.')
+    print(type)
+    print(value)
+    print(tback)
+    # then call the default handler
+    sys.__excepthook__(type, value, tback)
+
+
+if __name__ == "__main__":
+    sys.excepthook = exception_hook
+    try:
+        main()
+    except Exception as e:
+        print('Error =>', e)
+        print('Error =>', traceback.format_exc())
+        exit()
+    finally:
+        pass
@@ -1,16 +1,20 @@
+import os
 import copy
+import bisect
 import itertools
 import time
 import random
 import traceback, math
 
 from PyQt5.QtCore import QRect, QPoint, QSize, QTimer
-from PyQt5.QtGui import QPainter, QColor, QFont, QPen, QPolygon, QFontMetrics
+from PyQt5.QtGui import QPainter, QColor, QFont, QPen, QPolygon, QFontMetrics, QPixmap, QImage
 
 from editor import *
 from Utility.ui_utility import *
 from Utility.viewer_utility import *
 from Utility.history_public import *
+from Utility.interval_index import IntervalIndex
+from Utility.density_pyramid import DensityPyramid
 
 
 # ------------------------------------------------------- Clock --------------------------------------------------------
@@ -81,7 +85,8 @@ class AxisItem:
 
     def arrange_item(self, outer_metrics: AxisMetrics):
         self.outer_metrics = outer_metrics
-        self.item_metrics = copy.deepcopy(outer_metrics)
+        self.item_metrics = AxisMetrics()
+        self.item_metrics.copy(outer_metrics)
 
         if self.index is not None:
             since_pixel = outer_metrics.value_to_pixel(self.index.since())
@@ -103,19 +108,35 @@ class TimeThreadBase:
         Members:
             __axis_items: All items that can be painted
             __paint_items: Based on current display time range, select the items that to be painted.
+            __item_index: The interval index of the scale range of __axis_items. It's rebuilt after clear(),
+                          and updated by add_axis_items() and remove_axis_items().
             __metrics: The metrics of this thread, which is set outside.
+            __view_scale_range: The scale range of the whole paint area, which is set outside. It's different from
+                                the scale range of __metrics when a tile is painted. None for the one of __metrics.
             __paint_color: The background color of this thread, which is set outside.
             __min_track_width: The minimal track width. The width of this thread divides track width is the track count.
+            __paint_version: Increased when the painting of this thread may change, except its metrics.
+                             The painted result of a thread can be cached by (metrics, paint version).
+            __hit_items: The paint items in the order of adding, for hit test.
+            __hit_grid: The uniform grid of __hit_items by their item rect: { (column, row): [hit item order] }.
+                        It's built on the first hit test after the items are arranged.
     """
 
     REFERENCE_TRACK_WIDTH = 50
+    HIT_GRID_CELL_PIXEL = 64
 
     def __init__(self):
         self.__axis_items = []
         self.__paint_items = []
+        self.__item_index = IntervalIndex()
+        self.__item_index_dirty = True
         self.__metrics = AxisMetrics()
+        self.__view_scale_range = None
         self.__paint_color = QColor(255, 255, 255)
         self.__min_track_width = TimeThreadBase.REFERENCE_TRACK_WIDTH
+        self.__paint_version = 0
+        self.__hit_items = []
+        self.__hit_grid = None
 
     def paint(self, qp: QPainter):
         qp.setBrush(self.get_thread_color())
@@ -127,45 +148,111 @@ class TimeThreadBase:
 
     def clear(self):
         self.__axis_items.clear()
+        self.__item_index_dirty = True
+        self.__hit_items.clear()
+        self.__hit_grid = None
+        self.__paint_version += 1
 
     def refresh(self):
         self.__paint_items.clear()
         since, until = self.get_thread_metrics().get_scale_range()
-        for item in self.__axis_items:
-            item_since, item_until = item.get_item_metrics().get_scale_range()
-            if (item_since <= until) and (item_until >= since):
-                self.__paint_items.append(item)
+        self.__paint_items.extend(self.select_axis_items(since, until))
+        # The arrange_items() of sub class may re-order the paint items
+        self.__hit_items[:] = self.__paint_items
+        self.__hit_grid = None
         self.arrange_items()
 
+    def select_axis_items(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> [AxisItem]:
+        """
+        Select the items that overlap [since, until] by their scale range. In the order of adding.
+        """
+        if self.__item_index_dirty:
+            self.__item_index.clear()
+            for item in self.__axis_items:
+                self.__item_index.add(*item.get_item_metrics().get_scale_range(), item)
+            self.__item_index_dirty = False
+        return self.__item_index.query(since, until)
+
     def arrange_items(self):
         for item in self.__paint_items:
             item.arrange_item(self.get_thread_metrics())
+        self.__hit_grid = None
 
     def add_axis_items(self, items: AxisItem or [AxisItem]):
         if isinstance(items, AxisItem):
-            self.__axis_items.append(items)
-        else:
-            self.__axis_items.extend(items)
+            items = [items]
+        self.__axis_items.extend(items)
+        if not self.__item_index_dirty:
+            for item in items:
+                self.__item_index.add(*item.get_item_metrics().get_scale_range(), item)
+        self.__paint_version += 1
+
+    def remove_axis_items(self, items: AxisItem or [AxisItem]):
+        if isinstance(items, AxisItem):
+            items = [items]
+        remove_items = set(items)
+        self.__axis_items[:] = [item for item in self.__axis_items if item not in remove_items]
+        self.__paint_items[:] = [item for item in self.__paint_items if item not in remove_items]
+        self.__hit_items[:] = [item for item in self.__hit_items if item not in remove_items]
+        self.__hit_grid = None
+        if not self.__item_index_dirty:
+            for item in items:
+                self.__item_index.remove(item)
+        self.__paint_version += 1
+
+    def increase_paint_version(self):
+        """
+        Call it if the items are changed in place.
+        """
+        self.__paint_version += 1
+        self.__hit_grid = None
 
     def axis_item_from_point(self, point: QPoint) -> AxisItem or None:
+        """
+        Hit test the paint items by the grid cell of point.
+        :return: The first item (in the order of adding) that contains point, or None.
+        """
         if not self.get_thread_metrics().contains(point):
             return None
-        for item in self.__axis_items:
+        if self.__hit_grid is None:
+            self.__build_hit_grid()
+        cell_pixel = TimeThreadBase.HIT_GRID_CELL_PIXEL
+        for order in self.__hit_grid.get((point.x() // cell_pixel, point.y() // cell_pixel), []):
+            item = self.__hit_items[order]
             if item.get_item_metrics().contains(point):
                 return item
         return None
 
+    def __build_hit_grid(self):
+        self.__hit_grid = {}
+        cell_pixel = TimeThreadBase.HIT_GRID_CELL_PIXEL
+        thread_rect = self.get_thread_metrics().rect().normalized()
+        for order, item in enumerate(self.__hit_items):
+            # The rect may be not normalized. Extend it by a pixel and leave the exact test to contains().
+            rect = item.get_item_metrics().rect().normalized().adjusted(-1, -1, 1, 1).intersected(thread_rect)
+            if rect.isEmpty():
+                continue
+            for column in range(rect.left() // cell_pixel, rect.right() // cell_pixel + 1):
+                for row in range(rect.top() // cell_pixel, rect.bottom() // cell_pixel + 1):
+                    self.__hit_grid.setdefault((column, row), []).append(order)
+
     # ------------------------------------------ Sets ------------------------------------------
 
     def set_thread_color(self, color: QColor):
         self.__paint_color = color
+        self.__paint_version += 1
 
     def set_thread_metrics(self, metrics: AxisMetrics):
         # Use copy instead of assignment.
         self.__metrics.copy(metrics)
+        self.__hit_grid = None
+
+    def set_view_scale_range(self, since: HistoryTime.TICK, until: HistoryTime.TICK):
+        self.__view_scale_range = (since, until)
 
     def set_thread_min_track_width(self, width: int):
         self.__min_track_width = width
+        self.__paint_version += 1
 
     # ------------------------------------------ Gets ------------------------------------------
 
@@ -181,9 +268,17 @@ class TimeThreadBase:
     def get_thread_metrics(self) -> AxisMetrics:
         return self.__metrics
 
+    def get_view_scale_range(self) -> (HistoryTime.TICK, HistoryTime.TICK):
+        if self.__view_scale_range is None:
+            return self.get_thread_metrics().get_scale_range()
+        return self.__view_scale_range
+
     def get_thread_min_track_width(self) -> int:
         return self.__min_track_width
 
+    def get_paint_version(self) -> int:
+        return self.__paint_version
+
 
 # ----------------------------------------------------------------------------------------------------------------------
 #                                                  class HistoryIndexBar
@@ -356,23 +451,43 @@ class HistoryIndexTrack(TimeThreadBase):
         __event_indexes: The record index that need to display (only using the index, not full record).
                          20250126 - Change it from list to dict, which is { source: indices }
         __index_bar_table: For each index, build a HistoryIndexBar for it.
+        __uuid_index_table: { uuid: (source, index) } of __event_indexes, for update_thread_event_indexes().
         __thread_tracks: Each track has a TrackContext. See the comments in TrackContext.
+        __track_periods: The sorted (sinces, untils) of the periods on each track. See __layout_track_items().
+        __bar_tracks: { bar: track index } of the laid out bars.
 
         __thread_track_count: The track count depends on thread's width ad track width.
         __thread_track_width: Track width.
 
+        __density: The density pyramid of all indexes. If the scale range is longer than DENSITY_SCALE_SPAN,
+                   the density bands are painted instead of the bars, so the paint cost is bounded by pixels.
+        __density_bands: The (rect, count) of density bands to paint. Updated in refresh().
+        __density_max_count: The max bucket count of the density level of bands over all indexes. The bands are
+                             shaded by it, so the same density has the same shade wherever it's scrolled to.
+
         __flag_*: Layout calculation step flag.
     """
 
     REFERENCE_TRACK_WIDTH = 50
 
+    DENSITY_SCALE_SPAN = HistoryTime.TICK_YEAR * 20000
+    DENSITY_BAND_MIN_PIXEL = 4
+
     def __init__(self):
         super(HistoryIndexTrack, self).__init__()
         
         self.__event_indexes = {}
         self.__index_bar_table = {}
+        self.__uuid_index_table = {}
+
+        self.__density = DensityPyramid(HistoryTime.TICK_YEAR * 100, 10, 5)
+        self.__density_mode = False
+        self.__density_bands = []
+        self.__density_max_count = 1
 
         self.__thread_tracks = []
+        self.__track_periods = []
+        self.__bar_tracks = {}
         self.__thread_track_count = 0
         self.__thread_track_width = 50
 
@@ -385,17 +500,84 @@ class HistoryIndexTrack(TimeThreadBase):
 
     def set_thread_event_indexes(self, indexes: dict):
         self.clear()
-        self.__event_indexes = indexes
+        self.__event_indexes = {source: list(indices) for source, indices in indexes.items()}
         self.__index_bar_table.clear()
+        self.__uuid_index_table.clear()
+        self.__density.clear()
 
         for source, indices in indexes.items():
             for index in indices:
                 bar = HistoryIndexBar(index)
                 self.add_axis_items(bar)
                 self.__index_bar_table[index] = bar
+                self.__uuid_index_table[index.uuid()] = (source, index)
+                self.__density.add(index.since(), index.until())
         self.__flag_layout_items = True
         self.refresh()
 
+    def update_thread_event_indexes(self, upsert_indexes: dict = None, remove_uuids: [str] = None):
+        """
+        Apply the record changes without re-laying out the whole thread.
+        The bars of other indexes are kept on their tracks. A new or period changed index is laid out on the first
+            track that has space for it now. So the layout may be different from set_thread_event_indexes().
+        :param upsert_indexes: { source: [index] }. The index replaces the one with the same uuid in this thread.
+                               If the uuid is not in this thread, the index is added only if the source is displayed.
+        :param remove_uuids: The uuids of indexes to remove.
+        """
+        remove_bars = []
+        place_bars = []
+
+        for _uuid in (remove_uuids or []):
+            source_index = self.__uuid_index_table.pop(_uuid, None)
+            if source_index is not None:
+                source, index = source_index
+                self.__event_indexes[source].remove(index)
+                remove_bars.append(self.__index_bar_table.pop(index))
+
+        for source, indices in (upsert_indexes or {}).items():
+            for index in indices:
+                source_index = self.__uuid_index_table.get(index.uuid())
+                if source_index is None:
+                    if source not in self.__event_indexes:
+                        continue
+                    self.__event_indexes[source].append(index)
+                    self.__uuid_index_table[index.uuid()] = (source, index)
+                    bar = HistoryIndexBar(index)
+                    self.__index_bar_table[index] = bar
+                    self.__density.add(index.since(), index.until())
+                    self.add_axis_items(bar)
+                    place_bars.append(bar)
+                    continue
+
+                exist_source, exist_index = source_index
+                indices_of_source = self.__event_indexes[exist_source]
+                indices_of_source[indices_of_source.index(exist_index)] = index
+                self.__uuid_index_table[index.uuid()] = (exist_source, index)
+                bar = self.__index_bar_table.pop(exist_index)
+                self.__index_bar_table[index] = bar
+                bar.index = index
+                if (exist_index.since(), exist_index.until()) != (index.since(), index.until()):
+                    # Re-place the bar as a new one
+                    self.__density.remove(exist_index.since(), exist_index.until())
+                    self.__density.add(index.since(), index.until())
+                    self.remove_axis_items(bar)
+                    self.__displace_bar(bar, exist_index)
+                    bar.get_item_metrics().set_scale_range(index.since(), index.until())
+                    self.add_axis_items(bar)
+                    place_bars.append(bar)
+
+        for bar in remove_bars:
+            index = bar.get_index()
+            self.__density.remove(index.since(), index.until())
+            self.__displace_bar(bar, index)
+        self.remove_axis_items(remove_bars)
+
+        if not self.__flag_layout_items:
+            for bar in place_bars:
+                self.__place_bar(bar)
+        self.increase_paint_version()
+        self.refresh()
+
     # ------------------------------------------ Gets ------------------------------------------
 
     def get_display_sources(self) -> [str]:
@@ -413,6 +595,32 @@ class HistoryIndexTrack(TimeThreadBase):
 
     # ------------------------------------------- Operations -------------------------------------------
 
+    def paint(self, qp: QPainter):
+        if not self.__density_mode:
+            super(HistoryIndexTrack, self).paint(qp)
+            return
+        qp.setBrush(self.get_thread_color())
+        qp.drawRect(self.get_thread_metrics().rect())
+        for rect, count in self.__density_bands:
+            qp.setBrush(self.get_thread_color().darker(100 + 100 * count // self.__density_max_count))
+            qp.drawRect(rect)
+
+    def refresh(self):
+        since, until = self.get_thread_metrics().get_scale_range()
+        # Decide by the whole paint area, so the tiles and the hit test are in the same mode
+        view_since, view_until = self.get_view_scale_range()
+        self.__density_mode = view_until - view_since > HistoryIndexTrack.DENSITY_SCALE_SPAN
+        if self.__density_mode:
+            self.get_paint_items().clear()
+            self.__refresh_density_bands(since, until)
+        else:
+            self.__density_bands.clear()
+            super(HistoryIndexTrack, self).refresh()
+
+    def axis_item_from_point(self, point: QPoint) -> AxisItem or None:
+        # The bars are not laid out in density mode
+        return None if self.__density_mode else super(HistoryIndexTrack, self).axis_item_from_point(point)
+
     # def paint(self, qp: QPainter):
     #     qp.setBrush(self.get_thread_color())
     #     qp.drawRect(self.get_thread_metrics().rect())
@@ -460,6 +668,23 @@ class HistoryIndexTrack(TimeThreadBase):
     #     # Sort method2: The longer index has higher priority -> The bar layout should be more stable.
     #     self.__paint_indexes.sort(key=lambda item: item.until() - item.since(), reverse=True)
 
+    def __refresh_density_bands(self, since: HistoryTime.TICK, until: HistoryTime.TICK):
+        self.__density_bands.clear()
+        metrics = self.get_thread_metrics()
+        if metrics.long() == 0:
+            return
+        tick_per_pixel = (until - since) / metrics.long()
+        level = self.__density.select_level(tick_per_pixel * HistoryIndexTrack.DENSITY_BAND_MIN_PIXEL)
+        self.__density_max_count = max(self.__density.max_count(level), 1)
+
+        band_metrics = AxisMetrics()
+        band_metrics.copy(metrics)
+        longitudinal_since, longitudinal_until = metrics.get_longitudinal_range()
+        for bucket_since, bucket_until, count in self.__density.query(level, since, until):
+            band_metrics.set_longitudinal_range(max(metrics.value_to_pixel(bucket_since), longitudinal_since),
+                                                min(metrics.value_to_pixel(bucket_until), longitudinal_until))
+            self.__density_bands.append((band_metrics.rect(), count))
+
     def __update_paint_parameters(self):
         if self.__flag_build_track:
             self.__build_track()
@@ -503,49 +728,110 @@ class HistoryIndexTrack(TimeThreadBase):
             self.__thread_tracks[track_index].set_metrics(track_metrics)
 
     def __layout_track_items(self):
+        """
+        The longest index has the highest priority. The single time events are laid out on the first track.
+        Each period is laid out on the first track (except the first one) that has space for it,
+            or the last track if no track has space.
+
+        Because the longer period is laid out earlier, the periods on a track never cross each other
+            (has_space() only rejects a period whose since or until is inside another one).
+        So each track keeps the sorted periods in __track_periods, and it's O(log N) to check space on a track.
+        """
         layout_indexes = self.get_all_index_items()
         layout_indexes.sort(key=lambda item: item.until() - item.since(), reverse=True)
 
+        self.__track_periods = [([], []) for _ in self.__thread_tracks]
+        self.__bar_tracks.clear()
+        track_indexes = [[] for _ in self.__thread_tracks]
+
+        for index in layout_indexes:
+            track_index = self.__select_track(index.since(), index.until())
+            if track_index >= 0:
+                self.__take_track_period(track_index, index.since(), index.until())
+                track_indexes[track_index].append(index)
+
+        # Take space in the order of tracks, so the overlapped bars are shifted in the same order as before.
         overlap_count = 0
         prev_index_area = None
 
-        for i in range(len(self.__thread_tracks)):
-            track = self.__thread_tracks[i]
-            processing_indexes = layout_indexes.copy()
-
-            for index in processing_indexes:
+        for track_index in range(len(self.__thread_tracks)):
+            track = self.__thread_tracks[track_index]
+            track.clear()
+            for index in track_indexes[track_index]:
                 bar = self.get_index_axis_item(index)
-                # If this index is a single time event, it should layout at the first track
-                # If track has space for this index, layout on it
-                # If it's the last track, we have to layout on it
-                if i == 0 and index.since() != index.until():
-                    continue
-                if (index.since() == index.until()) or \
-                        track.has_space(*bar.get_item_metrics().get_scale_range()) or \
-                        (i == len(self.__thread_tracks) - 1):
-                    track.take_space_for(bar)
-                    layout_indexes.remove(index)
-                    bar.arrange_item(track.get_metrics())
-                    index_rect = bar.get_item_metrics().rect()
-                    if prev_index_area is not None and index_rect == prev_index_area:
-                        overlap_count += 1
-                    else:
-                        overlap_count = 0
-                    prev_index_area = index_rect
-                    bar.shift_item(-3 * overlap_count, 0)
+                track.take_space_for(bar)
+                self.__bar_tracks[bar] = track_index
+                bar.arrange_item(track.get_metrics())
+                index_rect = bar.get_item_metrics().rect()
+                if prev_index_area is not None and index_rect == prev_index_area:
+                    overlap_count += 1
                 else:
-                    pass
+                    overlap_count = 0
+                prev_index_area = index_rect
+                bar.shift_item(-3 * overlap_count, 0)
+
+    def __select_track(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> int:
+        """
+        :return: The track index to lay out the period. -1 if no track for it.
+        """
+        track_count = len(self.__thread_tracks)
+        if since == until:
+            return 0 if track_count > 0 else -1
+        for track_index in range(1, track_count):
+            sinces, untils = self.__track_periods[track_index]
+            if track_index == track_count - 1:
+                return track_index
+            # The last period that starts before until should end before since, or be the same period.
+            position = bisect.bisect_left(sinces, until) - 1
+            if position < 0 or untils[position] <= since or (sinces[position] == since and untils[position] == until):
+                return track_index
+        return -1
+
+    def __take_track_period(self, track_index: int, since: HistoryTime.TICK, until: HistoryTime.TICK):
+        if since == until:
+            return
+        sinces, untils = self.__track_periods[track_index]
+        position = bisect.bisect_right(sinces, since)
+        sinces.insert(position, since)
+        untils.insert(position, until)
+
+    def __place_bar(self, bar: HistoryIndexBar):
+        index = bar.get_index()
+        track_index = self.__select_track(index.since(), index.until())
+        if track_index < 0:
+            return
+        self.__take_track_period(track_index, index.since(), index.until())
+        track = self.__thread_tracks[track_index]
+        track.take_space_for(bar)
+        self.__bar_tracks[bar] = track_index
+        bar.arrange_item(track.get_metrics())
+
+    def __displace_bar(self, bar: HistoryIndexBar, index: HistoryRecord):
+        """
+        Remove the bar from its track. The index is the one that the bar was laid out for.
+        """
+        track_index = self.__bar_tracks.pop(bar, None)
+        if track_index is None:
+            return
+        self.__thread_tracks[track_index].remove_bar(bar)
+        if index.since() == index.until():
+            return
+        sinces, untils = self.__track_periods[track_index]
+        position = bisect.bisect_left(sinces, index.since())
+        while sinces[position] != index.since() or untils[position] != index.until():
+            position += 1
+        del sinces[position]
+        del untils[position]
 
     def __arrange_track_items(self):
         # for item in self.get_paint_items():
         #     item_metrics = item.get_item_metrics()
         #     item_metrics.set_scale_range(*self.get_thread_metrics().get_scale_range())
         #     item.arrange_item(item_metrics)
-        paint_items = self.get_paint_items()
-        for track in self.__thread_tracks:
-            for bar in track.get_layout_bars():
-                if bar in paint_items:
-                    bar.arrange_item(track.get_metrics())
+        for bar in self.get_paint_items():
+            track_index = self.__bar_tracks.get(bar)
+            if track_index is not None:
+                bar.arrange_item(self.__thread_tracks[track_index].get_metrics())
 
 
 # ----------------------------------------------------------------------------------------------------------------------
@@ -629,6 +915,79 @@ class TimeAxis(QWidget):
 
             return date_time_text
 
+    class ScaleMarks:
+        """
+        The main and sub marks of a scale, generated once and cached. The marks only depend on the scale offsets.
+        The cached marks cover a continuous tick range, which is extended by the marks entering it when scrolling.
+        """
+
+        MAX_MARK_COUNT = 100000
+
+        def __init__(self, scale):
+            self.scale = scale
+            self.ticks = []                 # The ticks of marks, ascending
+            self.texts = []                 # The text of main mark, or None for sub mark
+            self.__next_main_tick = 0       # The main mark after the cached ones
+
+        def select(self, since: HistoryTime.TICK, until: HistoryTime.TICK) -> (int, int):
+            """
+            Get the marks to paint [since, until). Only the marks that not cached are generated.
+            The marks start from estimate_closest_scale(since) as painting without cache. The main marks after it
+                are not always on the cached ones (e.g. the year 0 is estimated as 1), then the cache starts over.
+            :return: The index range [lower, upper) of ticks and texts. The first one is the estimated main mark.
+            """
+            main_tick = self.scale.estimate_closest_scale(int(since))
+
+            if len(self.ticks) > TimeAxis.ScaleMarks.MAX_MARK_COUNT or \
+                    (len(self.ticks) > 0 and (until < self.ticks[0] or main_tick > self.__next_main_tick)):
+                # Jumped away from the cached range. Start over instead of generating the marks in between.
+                self.ticks, self.texts = [], []
+
+            if len(self.ticks) > 0:
+                if main_tick < self.ticks[0]:
+                    ticks, texts, next_main_tick = self.__generate(main_tick, self.ticks[0] - 1)
+                    if next_main_tick == self.ticks[0]:
+                        self.ticks[:0] = ticks
+                        self.texts[:0] = texts
+                    else:
+                        self.ticks, self.texts = [], []
+                elif main_tick < self.__next_main_tick:
+                    position = bisect.bisect_left(self.ticks, main_tick)
+                    if position == len(self.ticks) or self.ticks[position] != main_tick or \
+                            self.texts[position] is None:
+                        self.ticks, self.texts = [], []
+
+            if len(self.ticks) == 0:
+                self.ticks, self.texts, self.__next_main_tick = self.__generate(main_tick, until)
+            elif until >= self.__next_main_tick:
+                ticks, texts, self.__next_main_tick = self.__generate(self.__next_main_tick, until)
+                self.ticks.extend(ticks)
+                self.texts.extend(texts)
+
+            return bisect.bisect_left(self.ticks, main_tick), bisect.bisect_left(self.ticks, until)
+
+        def __generate(self, main_tick: HistoryTime.TICK, until: HistoryTime.TICK) -> ([int], [str or None], int):
+            """
+            Generate the marks from main_tick, until the main mark is after until.
+            :return: (ticks, texts, the main tick after the generated marks)
+            """
+            ticks, texts = [], []
+            while main_tick <= until:
+                next_main_tick = self.scale.next_main_scale(main_tick)
+                ticks.append(main_tick)
+                texts.append(self.scale.format_main_scale_text(main_tick))
+
+                sub_tick = main_tick
+                while True:
+                    prev_sub_tick = sub_tick
+                    sub_tick = self.scale.next_sub_scale(sub_tick)
+                    if sub_tick >= next_main_tick or (next_main_tick - sub_tick) / (sub_tick - prev_sub_tick) < 0.5:
+                        break
+                    ticks.append(sub_tick)
+                    texts.append(None)
+                main_tick = next_main_tick
+            return ticks, texts, main_tick
+
     STEP_LIST = [
         # 10000 yeas ++
         Scale((10000000, 0, 0, 0, 0, 0), (1000000, 0, 0, 0, 0, 0), 10),
@@ -715,6 +1074,12 @@ class TimeAxis(QWidget):
     DEFAULT_MARGIN_PIXEL = 0
     MAIN_SCALE_MIN_PIXEL = 50
 
+    # The axis (background, scale and threads) is painted by tiles along the time direction and cached.
+    # A tile is painted with a margin, so the items across the tile edge (like event bar and scale text) are complete.
+    TILE_PIXEL = 256
+    TILE_MARGIN_PIXEL = 128
+    TILE_CACHE_SIZE = 64
+
     def __init__(self):
         super(TimeAxis, self).__init__()
 
@@ -763,8 +1128,8 @@ class TimeAxis(QWidget):
         self.__layout_updated = True
         self.__scroll_updated = True
 
-        # Strictly mapping special scale to tick
-        self.__optimise_pixel = {}
+        # Scale marks: { (main scale offset, sub scale offset): ScaleMarks }
+        self.__scale_marks = {}
 
         self.__l_pressing = False
         self.__l_down_point = None
@@ -775,6 +1140,10 @@ class TimeAxis(QWidget):
         self.__tip_font.setPointSize(8)
 
         self.__enable_real_time_tips = True
+        self.__enable_tile_cache = True
+        self.__tile_cache = LruCache(TimeAxis.TILE_CACHE_SIZE)     # { tile index: QPixmap }
+        self.__tile_cache_key = None
+        self.__thread_scale_dirty = False
         self.__mouse_on_item = AxisItem(None, {})
         self.__mouse_on_scale_value = 0.0
         self.__mouse_on_coordinate = QPoint(0, 0)
@@ -792,6 +1161,7 @@ class TimeAxis(QWidget):
 
         self.__history_core = None
         self.__history_editor = None
+        self.__history_editing_uuid = ''
         self.__history_threads = []
         self.__left_history_threads = []
         self.__right_history_threads = []
@@ -914,6 +1284,11 @@ class TimeAxis(QWidget):
     def enable_real_time_tips(self, enable: bool):
         self.__enable_real_time_tips = enable
 
+    def enable_tile_cache(self, enable: bool):
+        self.__enable_tile_cache = enable
+        self.__tile_cache.clear()
+        self.__tile_cache_key = None
+
     def align_from_point(self, pos: QPoint) -> ALIGN_TYPE:
         if self.__layout == LAYOUT_HORIZON:
             return ALIGN_LEFT if pos.y() >= (self.__coordinate_metrics.get_transverse_length() - self.__axis_mid) else ALIGN_RIGHT
@@ -934,10 +1309,14 @@ class TimeAxis(QWidget):
             pixel = pos.x()
         else:
             pixel = pos.y()
-        if pixel in self.__optimise_pixel.keys():
-            mouse_on_scale_value = self.__optimise_pixel[pixel]
-        else:
-            mouse_on_scale_value = self.__coordinate_metrics.pixel_to_value(pixel)
+        mouse_on_scale_value = self.__coordinate_metrics.pixel_to_value(pixel)
+
+        # Strictly mapping the pixel of scale mark to its tick
+        scale_marks = self.__get_scale_marks()
+        index = bisect.bisect_left(scale_marks.ticks, mouse_on_scale_value)
+        for mark_tick in scale_marks.ticks[max(index - 1, 0):index + 1]:
+            if int(self.__coordinate_metrics.value_to_pixel(mark_tick)) == pixel:
+                return mark_tick
         return mouse_on_scale_value
 
     # --------------------------------------------------- UI Event ----------------------------------------------------
@@ -1033,6 +1412,7 @@ class TimeAxis(QWidget):
 
         self.__history_editor = HistoryEditorDialog(self.__history_core, editor_agent=self)
         self.__history_editor.get_history_editor().edit_source(index.source(), index.uuid())
+        self.__history_editing_uuid = index.uuid()
         self.__history_editor.show_browser(False)
 
         # # To avoid losing focus
@@ -1045,6 +1425,7 @@ class TimeAxis(QWidget):
     def popup_editor_for_new_record(self, source: str):
         self.__history_editor = HistoryEditorDialog(self.__history_core, editor_agent=self)
         self.__history_editor.get_history_editor().edit_source(source, '')
+        self.__history_editing_uuid = ''
         # self.__history_editor.show_browser(False)
 
         self.__history_editor.exec_()
@@ -1065,7 +1446,11 @@ class TimeAxis(QWidget):
             # print('Update thread layout: %sms' % clock.elapsed_ms())
         if self.__scale_updated or self.__scroll_updated:
             clock.reset()
-            self.update_thread_scale()
+            if self.__enable_tile_cache:
+                # Threads are painted by tiles. Arrange them for the paint area only when hit testing.
+                self.__thread_scale_dirty = True
+            else:
+                self.update_thread_scale()
             # print('Update thread scale: %sms' % clock.elapsed_ms())
 
         self.__scale_updated = False
@@ -1112,7 +1497,8 @@ class TimeAxis(QWidget):
             self.__scroll = self.__tick_offset_mapping.a_to_b(self.__seeking)
             self.__offset = 0
             self.__seeking = None
-        current_offset = self.__scroll + self.__offset
+        # Tiles are drawn at whole pixels, so the paint area scrolls by whole pixels too
+        current_offset = round(self.__scroll + self.__offset)
 
         # Calculate limit
         if self.__time_range_limit_upper is not None:
@@ -1213,7 +1599,9 @@ class TimeAxis(QWidget):
     def update_thread_scale(self):
         for thread in self.__history_threads:
             thread.get_thread_metrics().set_scale_range(*self.__coordinate_metrics.get_scale_range())
+            thread.set_view_scale_range(*self.__coordinate_metrics.get_scale_range())
             thread.refresh()
+        self.__thread_scale_dirty = False
 
     # ----------------------------------------------------- Paint ------------------------------------------------------
 
@@ -1229,16 +1617,19 @@ class TimeAxis(QWidget):
         self.check_update_paint()
 
         clock.reset()
-        self.paint_background(qp)
-        if self.__layout == LAYOUT_HORIZON:
-            self.paint_horizon_scale(qp)
+        if self.__enable_tile_cache:
+            self.paint_tiles(qp)
         else:
-            self.paint_vertical_scale(qp)
-        # print('Paint axis: %sms' % clock.elapsed_ms())
-
-        clock.reset()
-        self.paint_threads(qp)
-        # print('Paint threads: %sms' % clock.elapsed_ms())
+            if self.__thread_scale_dirty:
+                # The threads are arranged for tiles or not arranged since scrolling
+                self.update_thread_scale()
+            self.paint_background(qp)
+            if self.__layout == LAYOUT_HORIZON:
+                self.paint_horizon_scale(qp)
+            else:
+                self.paint_vertical_scale(qp)
+            self.paint_threads(qp)
+        # print('Paint axis and threads: %sms' % clock.elapsed_ms())
 
         clock.reset()
         self.paint_real_time_tips(qp)
@@ -1253,13 +1644,49 @@ class TimeAxis(QWidget):
         #        self.__mouse_on_coordinate.y(), self.__mouse_on_scale_value))
         # print('------------------- Axis paint spends time: %ss -------------------' % (end - start))
 
+    def paint_tiles(self, qp: QPainter):
+        """
+        Paint the cached tiles that cover the paint area. Only the tiles not in cache are painted.
+        The tile i covers the pixel offset [i * TILE_PIXEL, (i + 1) * TILE_PIXEL), so scrolling just moves tiles.
+        """
+        tile_cache_key = self.__get_tile_cache_key()
+        if tile_cache_key != self.__tile_cache_key:
+            self.__tile_cache.clear()
+            self.__tile_cache_key = tile_cache_key
+
+        offset = self.__total_pixel_offset
+        first_tile = int(offset // TimeAxis.TILE_PIXEL)
+        last_tile = int((offset + self.__coordinate_metrics.get_longitudinal_length()) // TimeAxis.TILE_PIXEL)
+
+        tile_painted = False
+        for tile in range(first_tile, last_tile + 1):
+            pixmap = self.__tile_cache.get(tile)
+            if pixmap is None:
+                pixmap = self.__paint_tile(tile)
+                self.__tile_cache.put(tile, pixmap)
+                tile_painted = True
+            tile_pixel = int(round(tile * TimeAxis.TILE_PIXEL - offset))
+            if self.__layout == LAYOUT_HORIZON:
+                qp.drawPixmap(tile_pixel, 0, pixmap)
+            else:
+                qp.drawPixmap(0, tile_pixel, pixmap)
+
+        if tile_painted:
+            # Painting tiles arranges thread items for tiles. They should be arranged for the paint area again.
+            self.__thread_scale_dirty = True
+
     def paint_background(self, qp: QPainter):
+        longitudinal_since, longitudinal_until = self.__coordinate_metrics.get_longitudinal_range()
         qp.setBrush(AXIS_BACKGROUND_COLORS[2])
-        qp.drawRect(self.__paint_area)
+        if self.__layout == LAYOUT_HORIZON:
+            qp.drawRect(QRect(longitudinal_since, 0, longitudinal_until - longitudinal_since, self.__paint_area.height()))
+        else:
+            qp.drawRect(QRect(0, longitudinal_since, self.__paint_area.width(), longitudinal_until - longitudinal_since))
 
     def paint_horizon_scale(self, qp: QPainter):
-        qp.drawLine(0, self.__paint_area.height() - self.__axis_mid,
-                    self.__paint_area.width(), self.__paint_area.height() - self.__axis_mid)
+        longitudinal_since, longitudinal_until = self.__coordinate_metrics.get_longitudinal_range()
+        qp.drawLine(longitudinal_since, self.__paint_area.height() - self.__axis_mid,
+                    longitudinal_until, self.__paint_area.height() - self.__axis_mid)
 
         # self.__coordinate_metrics.get_longitudinal_range()
 
@@ -1268,49 +1695,27 @@ class TimeAxis(QWidget):
         sub_scale_start = self.__paint_area.height() - int(self.__axis_mid + 5)
         sub_scale_end = self.__paint_area.height() - int(self.__axis_mid - 5)
 
-        self.__optimise_pixel.clear()
-
         tick_since, tick_until = self.__coordinate_metrics.get_scale_range()
-        paint_tick = self.__scale.estimate_closest_scale(int(tick_since))
-        assert paint_tick <= tick_since
+        scale_marks = self.__get_scale_marks()
+        lower, upper = scale_marks.select(tick_since, tick_until)
 
         font = qp.font()
         font_metrics = QFontMetrics(font)
         text_height = font_metrics.height()
 
-        while paint_tick < tick_until:
-            next_paint_tick = self.__scale.next_main_scale(paint_tick)
-
-            x_main = int(self.__coordinate_metrics.value_to_pixel(int(paint_tick)))
-            self.__optimise_pixel[x_main] = paint_tick
-            main_scale_text = self.__scale.format_main_scale_text(paint_tick)
+        for mark_tick, main_scale_text in zip(scale_marks.ticks[lower:upper], scale_marks.texts[lower:upper]):
+            x_mark = int(self.__coordinate_metrics.value_to_pixel(int(mark_tick)))
+            if main_scale_text is None:
+                qp.drawLine(x_mark, sub_scale_start, x_mark, sub_scale_end)
+                continue
 
             text_width = font_metrics.width(main_scale_text)
-            text_x = x_main - (text_width // 2)  # 水平居中
+            text_x = x_mark - (text_width // 2)  # 水平居中
             text_y = main_scale_end + (text_height // 2)  # 垂直居中
 
-            qp.drawLine(x_main, main_scale_start, x_main, main_scale_end)
+            qp.drawLine(x_mark, main_scale_start, x_mark, main_scale_end)
             qp.drawText(text_x, text_y, main_scale_text)
 
-            # print("Main: " + str(HistoryTime.seconds_to_date_time(paint_tick)))
-
-            # clock = Clock()
-            while True:
-                prev_paint_tick = paint_tick
-                paint_tick = self.__scale.next_sub_scale(paint_tick)
-                delta_paint_tick = paint_tick - prev_paint_tick
-
-                if paint_tick >= next_paint_tick or (next_paint_tick - paint_tick) / delta_paint_tick < 0.5:
-                    break
-
-                # print("    Sub: " + str(HistoryTime.seconds_to_date_time(paint_tick)))
-                x_sub = int(self.__coordinate_metrics.value_to_pixel(int(paint_tick)))
-                self.__optimise_pixel[x_sub] = paint_tick
-                qp.drawLine(x_sub, sub_scale_start, x_sub, sub_scale_end)
-            # print('Paint sub scale: %sms' % clock.elapsed_ms())
-
-            paint_tick = next_paint_tick
-
         # for i in range(0, 12):
         #     time_main = self.__paint_start_tick + i * self.__main_scale
         #     x_main = int(self.__coordinate_metrics.value_to_pixel(int(time_main)))
@@ -1332,59 +1737,39 @@ class TimeAxis(QWidget):
         #         qp.drawLine(x_sub, sub_scale_start, x_sub, sub_scale_end)
 
     def paint_vertical_scale(self, qp: QPainter):
-        qp.drawLine(self.__axis_mid, 0, self.__axis_mid, self.__paint_area.height())
+        longitudinal_since, longitudinal_until = self.__coordinate_metrics.get_longitudinal_range()
+        qp.drawLine(self.__axis_mid, longitudinal_since, self.__axis_mid, longitudinal_until)
 
         main_scale_start = int(self.__axis_mid - 15)
         main_scale_end = int(self.__axis_mid + 15)
         sub_scale_start = int(self.__axis_mid - 5)
         sub_scale_end = int(self.__axis_mid + 5)
 
-        self.__optimise_pixel.clear()
-
         tick_since, tick_until = self.__coordinate_metrics.get_scale_range()
-        paint_tick = self.__scale.estimate_closest_scale(int(tick_since))
-        assert paint_tick <= tick_since
+        scale_marks = self.__get_scale_marks()
+        lower, upper = scale_marks.select(tick_since, tick_until)
 
         font_metrics = QFontMetrics(qp.font())
         text_height = font_metrics.height()
 
-        while paint_tick < tick_until:
-            next_paint_tick = self.__scale.next_main_scale(paint_tick)
-
-            y_main = int(self.__coordinate_metrics.value_to_pixel(paint_tick))
-            self.__optimise_pixel[y_main] = paint_tick
-            main_scale_text = self.__scale.format_main_scale_text(paint_tick)
+        for mark_tick, main_scale_text in zip(scale_marks.ticks[lower:upper], scale_marks.texts[lower:upper]):
+            y_mark = int(self.__coordinate_metrics.value_to_pixel(int(mark_tick)))
+            if main_scale_text is None:
+                qp.drawLine(sub_scale_start, y_mark, sub_scale_end, y_mark)
+                continue
 
             text_width = font_metrics.width(main_scale_text)
 
             text_rect = QRect(
                 main_scale_end - text_width - 30,  # X起点
-                y_main - text_height // 2,  # Y起点
+                y_mark - text_height // 2,  # Y起点
                 text_width,  # 宽度
                 text_height  # 高度
             )
 
-            qp.drawLine(main_scale_start, y_main, main_scale_end, y_main)
-            # qp.drawText(main_scale_end - x_offset, y_main + y_offset, main_scale_text)
+            qp.drawLine(main_scale_start, y_mark, main_scale_end, y_mark)
             qp.drawText(text_rect, Qt.AlignLeft, main_scale_text)
 
-            # print("Main: " + str(HistoryTime.seconds_to_date_time(paint_tick)))
-
-            while True:
-                prev_paint_tick = paint_tick
-                paint_tick = self.__scale.next_sub_scale(paint_tick)
-                delta_paint_tick = paint_tick - prev_paint_tick
-
-                if paint_tick >= next_paint_tick or (next_paint_tick - paint_tick) / delta_paint_tick < 0.5:
-                    break
-
-                # print("    Sub: " + str(HistoryTime.seconds_to_date_time(paint_tick)))
-                y_sub = int(self.__coordinate_metrics.value_to_pixel(int(paint_tick)))
-                self.__optimise_pixel[y_sub] = paint_tick
-                qp.drawLine(sub_scale_start, y_sub, sub_scale_end, y_sub)
-
-            paint_tick = next_paint_tick
-
         # for i in range(0, 12):
         #     time_main = self.__paint_start_tick + i * self.__main_scale
         #     y_main = int(self.__coordinate_metrics.value_to_pixel(int(time_main)))
@@ -1415,6 +1800,74 @@ class TimeAxis(QWidget):
         for thread in self.__history_threads:
             thread.paint(qp)
 
+    def __get_scale_marks(self):
+        key = (self.__scale.main_scale_offset, self.__scale.sub_scale_offset)
+        scale_marks = self.__scale_marks.get(key)
+        if scale_marks is None:
+            scale_marks = TimeAxis.ScaleMarks(self.__scale)
+            self.__scale_marks[key] = scale_marks
+        return scale_marks
+
+    def __get_tile_cache_key(self) -> tuple:
+        """
+        The tiles are valid only if all of these are not changed. The scroll offset is not included.
+        """
+        return (self.__layout, self.__paint_area.width(), self.__paint_area.height(), self.__axis_align_offset,
+                self.__scale_selection, self.__pixel_per_scale, self.__page_tick,
+                tuple((id(thread), thread.get_paint_version()) for thread in self.__left_history_threads),
+                tuple((id(thread), thread.get_paint_version()) for thread in self.__right_history_threads))
+
+    def __paint_tile(self, tile: int) -> QPixmap:
+        """
+        Paint the background, scale and threads of a tile. The metrics are in the pixels of the paint range of tile,
+            which start from 0 since AxisMetrics truncates the pixels towards 0. The painter is translated to the tile.
+        """
+        tile_since = tile * TimeAxis.TILE_PIXEL
+        paint_since = tile_since - TimeAxis.TILE_MARGIN_PIXEL
+        paint_until = tile_since + TimeAxis.TILE_PIXEL + TimeAxis.TILE_MARGIN_PIXEL
+        tick_since = int(self.__tick_offset_mapping.b_to_a(paint_since))
+        tick_until = int(self.__tick_offset_mapping.b_to_a(paint_until))
+
+        if self.__layout == LAYOUT_HORIZON:
+            pixmap = QPixmap(TimeAxis.TILE_PIXEL, self.__paint_area.height())
+        else:
+            pixmap = QPixmap(self.__paint_area.width(), TimeAxis.TILE_PIXEL)
+        qp = QPainter(pixmap)
+        qp.setFont(self.font())
+        if self.__layout == LAYOUT_HORIZON:
+            qp.translate(-TimeAxis.TILE_MARGIN_PIXEL, 0)
+        else:
+            qp.translate(0, -TimeAxis.TILE_MARGIN_PIXEL)
+
+        coordinate_metrics = self.__coordinate_metrics
+        self.__coordinate_metrics = AxisMetrics()
+        self.__coordinate_metrics.copy(coordinate_metrics)
+        self.__coordinate_metrics.set_longitudinal_range(0, paint_until - paint_since)
+        self.__coordinate_metrics.set_scale_range(tick_since, tick_until)
+        try:
+            self.paint_background(qp)
+            if self.__layout == LAYOUT_HORIZON:
+                self.paint_horizon_scale(qp)
+            else:
+                self.paint_vertical_scale(qp)
+
+            for thread in self.__history_threads:
+                thread_metrics = AxisMetrics()
+                thread_metrics.copy(thread.get_thread_metrics())
+                tile_metrics = AxisMetrics()
+                tile_metrics.copy(thread_metrics)
+                tile_metrics.set_longitudinal_range(0, paint_until - paint_since)
+                tile_metrics.set_scale_range(tick_since, tick_until)
+                thread.set_thread_metrics(tile_metrics)
+                thread.set_view_scale_range(*coordinate_metrics.get_scale_range())
+                thread.refresh()
+                thread.paint(qp)
+                thread.set_thread_metrics(thread_metrics)
+        finally:
+            self.__coordinate_metrics = coordinate_metrics
+            qp.end()
+        return pixmap
+
     def paint_real_time_tips(self, qp: QPainter):
         if not self.__enable_real_time_tips or self.__l_pressing:
             return
@@ -1473,6 +1926,8 @@ class TimeAxis(QWidget):
         # self.__main_scale = min(self.__main_scale, self.__main_scale_limit_upper)
 
     def axis_item_from_point(self, point: QPoint) -> AxisItem or None:
+        if self.__thread_scale_dirty:
+            self.update_thread_scale()
         thread = self.thread_from_point(point)
         if thread is not None:
             return thread.axis_item_from_point(point)
@@ -1531,8 +1986,23 @@ class TimeAxis(QWidget):
         self.__history_editor.on_apply()
         self.__history_editor.close()
 
+        self.__update_threads_for_edit()
         self.repaint()
 
+    def __update_threads_for_edit(self):
+        """
+        Pass the edited record to threads as a delta, so the threads needn't re-lay out all items.
+        """
+        record = self.__history_editor.get_history_editor().get_current_record()
+        upsert_indexes = {record.source(): [record.to_index()]} if record is not None else {}
+        remove_uuids = []
+        if self.__history_editing_uuid != '' and self.__history_core is not None and \
+                self.__history_core.get_record_by_uuid(self.__history_editing_uuid) is None:
+            remove_uuids.append(self.__history_editing_uuid)
+        for thread in self.__history_threads:
+            if isinstance(thread, HistoryIndexTrack):
+                thread.update_thread_event_indexes(upsert_indexes, remove_uuids)
+
     def on_cancel(self):
         if self.__history_editor is not None:
             self.__history_editor.close()
@@ -1561,10 +2031,433 @@ class HistoryViewerDialog(QDialog):
         return self.time_axis
 
 
+# ----------------------------------------------------- Test Code ------------------------------------------------------
+
+application_for_test = None
+
+
+def prepare_test_application() -> QApplication:
+    global application_for_test
+    if QApplication.instance() is None:
+        # Run the widget tests without a display
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        application_for_test = QApplication(sys.argv)
+    HistoryTime.build_year_start_table()
+    return QApplication.instance()
+
+
+def build_test_records(count: int, since_year: int = 1100, step_year: int = 20) -> [HistoryRecord]:
+    """
+    Build records of separated events and periods, the odd ones are periods.
+    """
+    records = []
+    for i in range(count):
+        since = HistoryTime.years_to_tick(since_year + i * step_year)
+        until = since if i % 2 == 0 else since + HistoryTime.TICK_YEAR * (5 + i)
+        records.append(HistoryRecord.from_payload(('%08d' % i, since, until, 'event %d' % i, 'source', ())))
+    return records
+
+
+def build_test_axis(records: [HistoryRecord], layout: int) -> (TimeAxis, HistoryIndexTrack):
+    thread = HistoryIndexTrack()
+    thread.set_thread_color(THREAD_BACKGROUND_COLORS[0])
+    thread.set_thread_event_indexes({'source': records})
+
+    axis = TimeAxis()
+    axis.add_history_thread(thread)
+    axis.set_axis_layout(layout)
+    axis.resize(800, 600)
+    axis.show()
+    axis.set_time_range(HistoryTime.years_to_tick(1000), HistoryTime.years_to_tick(2000))
+    return axis, thread
+
+
+def build_random_records(count: int, seed: int = 0) -> [HistoryRecord]:
+    """
+    Build records of random events and periods. The half of them are events.
+    """
+    rand = random.Random(seed)
+    records = []
+    for i in range(count):
+        since = rand.randint(-3000, 2000) * HistoryTime.TICK_YEAR
+        until = since + rand.choice([0, 0, rand.randint(1, 30), rand.randint(1, 300)]) * HistoryTime.TICK_YEAR
+        records.append(HistoryRecord.from_payload(('%08d' % i, since, until, 'event', 'source', ())))
+    return records
+
+
+def build_test_track(records: [HistoryRecord]) -> HistoryIndexTrack:
+    """
+    Build a track with fixed metrics, so it can be laid out without TimeAxis.
+    """
+    metrics = AxisMetrics()
+    metrics.set_layout(LAYOUT_VERTICAL)
+    metrics.set_align(ALIGN_RIGHT)
+    metrics.set_transverse_limit(0, 300)
+    metrics.set_longitudinal_range(0, 800)
+    metrics.set_scale_range(0, 10 * HistoryTime.TICK_YEAR)
+
+    track = HistoryIndexTrack()
+    track.set_thread_metrics(metrics)
+    track.set_thread_event_indexes({'source': records})
+    return track
+
+
+def layout_track_items_by_scan(track: HistoryIndexTrack):
+    """
+    The track-major layout before first fit, as the reference of HistoryIndexTrack.__layout_track_items().
+    """
+    layout_indexes = track.get_all_index_items()
+    layout_indexes.sort(key=lambda item: item.until() - item.since(), reverse=True)
+    thread_tracks = track._HistoryIndexTrack__thread_tracks
+    overlap_count = 0
+    prev_index_area = None
+    for i in range(len(thread_tracks)):
+        thread_tracks[i].clear()
+    for i in range(len(thread_tracks)):
+        context = thread_tracks[i]
+        for index in layout_indexes.copy():
+            bar = track.get_index_axis_item(index)
+            if i == 0 and index.since() != index.until():
+                continue
+            if (index.since() == index.until()) or \
+                    context.has_space(*bar.get_item_metrics().get_scale_range()) or \
+                    (i == len(thread_tracks) - 1):
+                context.take_space_for(bar)
+                layout_indexes.remove(index)
+                bar.arrange_item(context.get_metrics())
+                index_rect = bar.get_item_metrics().rect()
+                if prev_index_area is not None and index_rect == prev_index_area:
+                    overlap_count += 1
+                else:
+                    overlap_count = 0
+                prev_index_area = index_rect
+                bar.shift_item(-3 * overlap_count, 0)
+
+
+def track_layout_snapshot(track: HistoryIndexTrack) -> [[(str, tuple)]]:
+    return [[(bar.get_index().uuid(), bar.get_item_metrics().rect().getRect()) for bar in context.get_layout_bars()]
+            for context in track._HistoryIndexTrack__thread_tracks]
+
+
+def track_assignment(track: HistoryIndexTrack) -> {str: int}:
+    return {bar.get_index().uuid(): track_index
+            for track_index, context in enumerate(track._HistoryIndexTrack__thread_tracks)
+            for bar in context.get_layout_bars()}
+
+
+def check_track_layout(track: HistoryIndexTrack):
+    """
+    Check that each index has one bar on one track, and the track periods are the periods of the bars on it.
+    """
+    thread_tracks = track._HistoryIndexTrack__thread_tracks
+    track_periods = track._HistoryIndexTrack__track_periods
+    bar_tracks = track._HistoryIndexTrack__bar_tracks
+
+    bars = [track.get_index_axis_item(index) for index in track.get_all_index_items()]
+    layout_bars = [(bar, track_index) for track_index, context in enumerate(thread_tracks)
+                   for bar in context.get_layout_bars()]
+    assert len(layout_bars) == len(bars)
+    assert dict(layout_bars) == bar_tracks
+    assert set(bar_tracks.keys()) == set(bars)
+
+    for track_index, context in enumerate(thread_tracks):
+        periods = sorted((bar.get_index().since(), bar.get_index().until()) for bar in context.get_layout_bars()
+                         if bar.get_index().since() != bar.get_index().until())
+        sinces, untils = track_periods[track_index]
+        assert sinces == sorted(sinces)
+        assert sorted(zip(sinces, untils)) == periods
+        if 0 < track_index < len(thread_tracks) - 1:
+            # The periods never cross each other, except the last track
+            assert all(prev == period or prev[1] <= period[0] for prev, period in zip(periods, periods[1:]))
+
+
+def generate_scale_marks(scale, since: HistoryTime.TICK, until: HistoryTime.TICK) -> [(int, str or None)]:
+    """
+    The marks that TimeAxis.paint_horizon_scale() painted before caching, as the reference of TimeAxis.ScaleMarks.
+    """
+    marks = []
+    paint_tick = scale.estimate_closest_scale(since)
+    while paint_tick < until:
+        next_paint_tick = scale.next_main_scale(paint_tick)
+        marks.append((paint_tick, scale.format_main_scale_text(paint_tick)))
+        while True:
+            prev_paint_tick = paint_tick
+            paint_tick = scale.next_sub_scale(paint_tick)
+            if paint_tick >= next_paint_tick or (next_paint_tick - paint_tick) / (paint_tick - prev_paint_tick) < 0.5:
+                break
+            marks.append((paint_tick, None))
+        paint_tick = next_paint_tick
+    return marks
+
+
+def scan_item_from_point(thread: TimeThreadBase, point: QPoint) -> AxisItem or None:
+    """
+    The hit test before the grid but only for the paint items, as the reference of TimeThreadBase.axis_item_from_point().
+    """
+    if not thread.get_thread_metrics().contains(point):
+        return None
+    paint_items = set(thread.get_paint_items())
+    for item in thread.get_axis_items():
+        if item in paint_items and item.get_item_metrics().contains(point):
+            return item
+    return None
+
+
+def grab_fresh_tiles(axis: TimeAxis) -> QImage:
+    # Enabling the tile cache clears it
+    axis.enable_tile_cache(True)
+    return axis.grab().toImage()
+
+
+def inner_paint_rect(image: QImage, layout: int) -> QRect:
+    # The text and shapes crossing the paint area edges are clipped differently by tiles
+    if layout == LAYOUT_HORIZON:
+        return QRect(64, 0, image.width() - 128, image.height())
+    else:
+        return QRect(0, 64, image.width(), image.height() - 128)
+
+
+# ---------------------------- Track Layout --------------------------
+
+def test_track_layout():
+    prepare_test_application()
+    records = build_random_records(3000)
+    # The records of the same period are shifted on the same track
+    records += [HistoryRecord.from_payload(('dup%05d' % i, record.since(), record.until(), 'event', 'source', ()))
+                for i, record in enumerate(records[:300])]
+
+    for count in [0, 1, 10, 300, len(records)]:
+        track = build_test_track(records[-count:] if count else [])
+        layout_track_items_by_scan(track)
+        expect = track_layout_snapshot(track)
+        track._HistoryIndexTrack__layout_track_items()
+        assert track_layout_snapshot(track) == expect
+        assert sum(len(bars) for bars in expect) == count
+
+
+def test_incremental_layout():
+    prepare_test_application()
+    rand = random.Random(1)
+    records = build_random_records(2000)
+    track = build_test_track(records)
+    check_track_layout(track)
+
+    # Adding and removing an index restores the layout
+    snapshot = track_layout_snapshot(track)
+    for since, until in [(0, 0), (0, 100), (-1000, 1000), (-3000, 2500)]:
+        add = HistoryRecord.from_payload(('new', since * HistoryTime.TICK_YEAR, until * HistoryTime.TICK_YEAR,
+                                          'event', 'source', ()))
+        track.update_thread_event_indexes({'source': [add]})
+        check_track_layout(track)
+        assert 'new' in track_assignment(track)
+        track.update_thread_event_indexes(remove_uuids=['new'])
+        check_track_layout(track)
+        assert track_layout_snapshot(track) == snapshot
+
+    # Upserting the same period keeps the layout
+    track.update_thread_event_indexes({'source': [HistoryRecord.from_payload(
+        (records[1].uuid(), records[1].since(), records[1].until(), 'edited', 'source', ()))]})
+    check_track_layout(track)
+    assert track_layout_snapshot(track) == snapshot
+
+    # The events are on the first track, so editing events lays out the periods the same as a full layout
+    events = [record for record in records if record.since() == record.until()]
+    upserts = [HistoryRecord.from_payload((record.uuid(), record.since() + HistoryTime.TICK_YEAR,
+                                           record.since() + HistoryTime.TICK_YEAR, 'event', 'source', ()))
+               for record in events[:50]]
+    upserts += [HistoryRecord.from_payload(('event%04d' % i, i * HistoryTime.TICK_YEAR, i * HistoryTime.TICK_YEAR,
+                                            'event', 'source', ())) for i in range(50)]
+    track.update_thread_event_indexes({'source': upserts}, [record.uuid() for record in events[50:100]])
+    check_track_layout(track)
+    assert track_assignment(track) == track_assignment(build_test_track(track.get_all_index_items()))
+
+    # Editing periods keeps the other bars on their tracks
+    assignment = track_assignment(track)
+    edit_records = rand.sample(track.get_all_index_items(), 200)
+    upserts = []
+    for record in edit_records[:100]:
+        since = rand.randint(-3000, 2000) * HistoryTime.TICK_YEAR
+        until = since + rand.choice([0, rand.randint(1, 300)]) * HistoryTime.TICK_YEAR
+        upserts.append(HistoryRecord.from_payload((record.uuid(), since, until, 'event', 'source', ())))
+    removes = [record.uuid() for record in edit_records[100:]]
+    track.update_thread_event_indexes({'source': upserts}, removes)
+    check_track_layout(track)
+
+    edit_uuids = {record.uuid() for record in upserts} | set(removes)
+    new_assignment = track_assignment(track)
+    assert all(new_assignment[_uuid] == track_index for _uuid, track_index in assignment.items()
+               if _uuid not in edit_uuids)
+    assert new_assignment.keys() == track_assignment(build_test_track(track.get_all_index_items())).keys()
+    assert len(new_assignment) == len(assignment) - len(removes)
+
+
+# ---------------------------- Scale Marks ---------------------------
+
+def test_scale_marks():
+    prepare_test_application()
+    for scale in [TimeAxis.STEP_LIST[3], TimeAxis.STEP_LIST[20], TimeAxis.STEP_LIST[40], TimeAxis.STEP_LIST[-3]]:
+        page = scale.rough_offset_tick() * 10
+        since = HistoryTime.years_to_tick(1900)
+        # Scroll forward and backward by 1/20 page, jump away and back
+        frames = [since + page * i // 20 for i in range(40)]
+        frames += [since + page * i // 20 for i in range(40, -40, -3)]
+        frames += [since + page * 1000, since + page * 1000 - page // 3, since, since - page * 1000]
+
+        scale_marks = TimeAxis.ScaleMarks(scale)
+        for frame_since in frames:
+            frame_until = frame_since + page
+            lower, upper = scale_marks.select(frame_since, frame_until)
+            expects = [mark for mark in generate_scale_marks(scale, frame_since, frame_until) if mark[0] < frame_until]
+            assert list(zip(scale_marks.ticks[lower:upper], scale_marks.texts[lower:upper])) == expects
+            assert all(prev < tick for prev, tick in zip(scale_marks.ticks, scale_marks.ticks[1:]))
+
+
+# ---------------------------- Tile Cache ----------------------------
+
+def test_tile_cache():
+    prepare_test_application()
+    records = build_test_records(40)
+
+    for layout in [LAYOUT_VERTICAL, LAYOUT_HORIZON]:
+        axis, thread = build_test_axis(records, layout)
+
+        for step in range(4):
+            painted = grab_fresh_tiles(axis)
+            assert len(axis._TimeAxis__tile_cache) > 0
+            assert axis.grab().toImage() == painted
+
+            axis.enable_tile_cache(False)
+            direct = axis.grab().toImage()
+            inner = inner_paint_rect(painted, layout)
+            assert painted.copy(inner) == direct.copy(inner)
+
+            axis.enable_tile_cache(True)
+            axis.offset_scroll(53)
+            assert axis.grab().toImage() == grab_fresh_tiles(axis)
+
+        # Changing the painting of thread
+        painted = grab_fresh_tiles(axis)
+        key = axis._TimeAxis__get_tile_cache_key()
+        thread.set_thread_color(THREAD_BACKGROUND_COLORS[1])
+        assert axis._TimeAxis__get_tile_cache_key() != key
+        cached = axis.grab().toImage()
+        assert cached != painted
+        assert cached == grab_fresh_tiles(axis)
+
+        # Changing the scale
+        key = axis._TimeAxis__get_tile_cache_key()
+        axis.select_step_scale(axis._TimeAxis__scale_selection + 1)
+        axis.grab()
+        assert axis._TimeAxis__get_tile_cache_key() != key
+        assert axis.grab().toImage() == grab_fresh_tiles(axis)
+
+        # Adding and removing thread
+        key = axis._TimeAxis__get_tile_cache_key()
+        other_thread = HistoryIndexTrack()
+        other_thread.set_thread_color(THREAD_BACKGROUND_COLORS[2])
+        other_thread.set_thread_event_indexes({'source': records[:10]})
+        axis.add_history_thread(other_thread)
+        axis.grab()
+        assert axis._TimeAxis__get_tile_cache_key() != key
+        assert axis.grab().toImage() == grab_fresh_tiles(axis)
+
+        axis.remove_history_thread(other_thread)
+        axis.grab()
+        assert axis._TimeAxis__get_tile_cache_key() == key
+        assert axis.grab().toImage() == grab_fresh_tiles(axis)
+        axis.close()
+
+def test_tile_cache_density_mode():
+    prepare_test_application()
+    rand = random.Random(0)
+    density_span = HistoryIndexTrack.DENSITY_SCALE_SPAN
+    # The density bands are across the tiles
+    records = build_random_records(3000)
+    for i in range(3000):
+        since = rand.randint(-density_span, 0)
+        records.append(HistoryRecord.from_payload(('dense%05d' % i, since, since, 'event', 'source', ())))
+    tile_pixel = TimeAxis.TILE_PIXEL + TimeAxis.TILE_MARGIN_PIXEL * 2
+
+    for layout in [LAYOUT_VERTICAL, LAYOUT_HORIZON]:
+        axis, thread = build_test_axis(records, layout)
+        axis.set_time_range(-density_span, 0)
+        coordinate_metrics = axis._TimeAxis__coordinate_metrics
+
+        for step in range(3):
+            # The paint area is just longer than the density span, but a tile is not
+            axis.grab()
+            since, until = coordinate_metrics.get_scale_range()
+            assert density_span < until - since
+            assert (until - since) * tile_pixel / coordinate_metrics.get_longitudinal_length() < density_span
+
+            axis.enable_tile_cache(False)
+            direct = axis.grab().toImage()
+            painted = grab_fresh_tiles(axis)
+            inner = inner_paint_rect(painted, layout)
+            assert painted.copy(inner) == direct.copy(inner)
+
+            # The bars are neither painted nor hit
+            points = [QPoint(rand.randint(0, axis.width() - 1), rand.randint(0, axis.height() - 1)) for _ in range(200)]
+            assert all(axis.axis_item_from_point(point) is None for point in points)
+            assert len(thread.get_paint_items()) == 0
+
+            axis.offset_scroll(300)
+        axis.close()
+
+# ---------------------------- Hit Test ------------------------------
+
+def test_hit_grid():
+    prepare_test_application()
+    rand = random.Random(0)
+    records = build_random_records(3000)
+
+    for layout in [LAYOUT_VERTICAL, LAYOUT_HORIZON]:
+        axis, thread = build_test_axis(records, layout)
+
+        def check_hits():
+            axis.grab()
+            axis.axis_item_from_point(QPoint(0, 0))
+            # The random points and the points on items
+            points = [QPoint(rand.randint(0, axis.width() - 1), rand.randint(0, axis.height() - 1)) for _ in range(200)]
+            points += [item.get_item_metrics().rect().center() for item in thread.get_paint_items()[::10]]
+            hits = [axis.axis_item_from_point(point) for point in points]
+            assert hits == [scan_item_from_point(thread, point) for point in points]
+            assert any(hit is not None for hit in hits)
+
+        check_hits()
+
+        edit_records = rand.sample(records, 200)
+        upserts = [HistoryRecord.from_payload((record.uuid(), record.since() + HistoryTime.TICK_YEAR * 3,
+                                               record.until() + HistoryTime.TICK_YEAR * 5, 'event', 'source', ()))
+                   for record in edit_records[:100]]
+        thread.update_thread_event_indexes({'source': upserts}, [record.uuid() for record in edit_records[100:]])
+        check_hits()
+
+        axis.offset_scroll(137)
+        check_hits()
+
+        axis.enable_tile_cache(True)
+        check_hits()
+        axis.offset_scroll(-300)
+        check_hits()
+
+        thread_rect = thread.get_thread_metrics().rect().normalized()
+        for point in [thread_rect.topLeft() - QPoint(1, 1), thread_rect.bottomRight() + QPoint(1, 1)]:
+            assert thread.axis_item_from_point(point) is None
+        axis.close()
+
+
 # ----------------------------------------------------- File Entry -----------------------------------------------------
 
 def main():
-    app = QApplication(sys.argv)
+    app = prepare_test_application()
+
+    test_track_layout()
+    test_incremental_layout()
+    test_scale_marks()
+    test_tile_cache()
+    test_tile_cache_density_mode()
+    test_hit_grid()
 
     # Indexer
     indices = HistoryRecordIndexer.load_from_file('depot/history.index')